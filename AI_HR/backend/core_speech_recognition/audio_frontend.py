@@ -0,0 +1,109 @@
+import math
+
+import numpy as np
+
+from . import settings
+
+INT16_MAX = 32767.0
+INT16_MIN = -32768.0
+
+
+class AudioFrontEnd:
+    """Incremental DC removal + automatic gain control for PCM chunks.
+
+    All work happens in a float32 scratch buffer that is reused between
+    calls (grown only when a longer chunk arrives), so a steady stream
+    allocates nothing per chunk. The gain follows the smoothed peak with a
+    fast attack and a slow release and is ramped linearly across each
+    chunk, so the level does not jump at chunk boundaries. Neither end of the
+    ramp may push the chunk's peak past int16: on a loud onset the ramp
+    starts from the safe gain right away. The result is still clipped to
+    int16 before conversion instead of wrapping around.
+
+    `process` accepts int16 or float32 samples. float32 input is scaled in
+    place; int16 results go to `out` (may be the input itself) or to an
+    internal buffer that stays valid until the next call.
+    """
+
+    def __init__(self, sample_rate: int = settings.SAMPLE_RATE,
+                 target_peak: float = settings.AUDIO_AMPLIFICATION_THRESHOLD, max_gain: float = settings.AGC_MAX_GAIN,
+                 attack_ms: float = settings.AGC_ATTACK_MS, release_ms: float = settings.AGC_RELEASE_MS,
+                 dc_ms: float = settings.DC_REMOVAL_MS, agc: bool = settings.AGC_ENABLED):
+        self.sample_rate = sample_rate
+        self.target_peak = float(target_peak)
+        self.max_gain = float(max_gain)
+        self.attack = attack_ms * sample_rate / 1000.0  # постоянные времени в отсчётах
+        self.release = release_ms * sample_rate / 1000.0
+        self.dc_time = dc_ms * sample_rate / 1000.0
+        self.agc = agc
+        self._work = np.zeros(0, dtype=np.float32)
+        self._ramp = np.zeros(0, dtype=np.float32)
+        self._scale = np.zeros(0, dtype=np.float32)
+        self._out = np.zeros(0, dtype=np.int16)
+        self.reset()
+
+    def reset(self) -> None:
+        self.dc = 0.0
+        self.peak = 0.0
+        self.gain = 1.0
+
+    def _reserve(self, n: int) -> None:
+        if len(self._work) < n:
+            size = max(n, 2 * len(self._work))
+            self._work = np.empty(size, dtype=np.float32)
+            self._ramp = np.arange(1, size + 1, dtype=np.float32)  # 1..n, шаблон для линейного перехода усиления
+            self._scale = np.empty(size, dtype=np.float32)
+            self._out = np.empty(size, dtype=np.int16)
+
+    def _smooth(self, state: float, value: float, n: int, time_const: float) -> float:
+        # Экспоненциальное сглаживание, не зависящее от длины чанка
+        if time_const <= 0:
+            return value
+        return state + (value - state) * (1.0 - math.exp(-n / time_const))
+
+    def process(self, audio: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        n = len(audio)
+        if n == 0:
+            return audio
+        self._reserve(n)
+        if audio.dtype == np.float32:
+            work = audio
+        else:
+            work = self._work[:n]
+            np.copyto(work, audio, casting="unsafe")
+
+        if self.dc_time > 0:
+            self.dc = self._smooth(self.dc, float(work.mean()), n, self.dc_time)
+            work -= self.dc
+
+        if self.agc:
+            chunk_peak = max(float(work.max()), -float(work.min()))
+            # Пик растёт быстро (attack) и спадает медленно (release), как прежний peak_level * 0.95
+            time_const = self.attack if chunk_peak > self.peak else self.release
+            self.peak = self._smooth(self.peak, chunk_peak, n, time_const)
+            target = min(self.max_gain, self.target_peak / self.peak) if self.peak > 0 else self.gain
+            target = max(1.0, target)  # только усиление, громкий сигнал не ослабляем
+            start = self.gain
+            if chunk_peak > 0:
+                # Ни конец, ни начало перехода не должны выводить пик чанка за int16
+                safe = max(1.0, INT16_MAX / chunk_peak)
+                target = min(target, safe)
+                start = min(start, safe)
+            if target != start:
+                # Линейный переход от прошлого усиления к новому внутри чанка
+                scale = self._scale[:n]
+                np.multiply(self._ramp[:n], (target - start) / n, out=scale)
+                scale += start
+                work *= scale
+            elif start != 1.0:
+                work *= start
+            self.gain = target
+
+        np.clip(work, INT16_MIN, INT16_MAX, out=work)
+        if audio.dtype == np.float32:
+            return work
+        if out is None:
+            out = self._out[:n]
+        np.rint(work, out=work)
+        np.copyto(out, work, casting="unsafe")
+        return out
@@ -0,0 +1,57 @@
+import logging
+from typing import Optional
+
+from . import settings
+
+try:
+    import opuslib  # требует системную libopus
+except Exception:
+    opuslib = None
+
+logger = logging.getLogger(__name__)
+
+# webm идёт через ffmpeg; pcm16 и opus декодируются в процессе, без подпроцесса
+INPUT_FORMATS = ("webm", "pcm16", "opus")
+
+
+class PCM16Input:
+    """Raw little-endian 16-bit mono frames at SAMPLE_RATE, passed through as is."""
+
+    def __init__(self):
+        self._tail = b""
+
+    def decode(self, data: bytes) -> bytes:
+        # A frame may end in the middle of a sample; keep the odd byte for the next one
+        data = self._tail + data if self._tail else data
+        cut = len(data) - len(data) % 2
+        self._tail = data[cut:]
+        return data[:cut]
+
+
+class OpusInput:
+    """One Opus packet per WebSocket message, decoded straight to SAMPLE_RATE mono."""
+
+    def __init__(self, sample_rate: int = settings.SAMPLE_RATE):
+        self._decoder = opuslib.Decoder(sample_rate, 1)
+        self._max_frame = sample_rate * 120 // 1000  # самый длинный пакет Opus - 120 мс
+
+    def decode(self, data: bytes) -> bytes:
+        return self._decoder.decode(data, self._max_frame)
+
+
+def make_input(input_format: str, sample_rate: int = settings.SAMPLE_RATE) -> Optional[object]:
+    """Decoder for an in-process input format, None for webm (ffmpeg).
+
+    Raises ValueError for formats this server cannot take.
+    """
+    if input_format not in INPUT_FORMATS:
+        raise ValueError(f"Unknown input format: {input_format}")
+    if input_format == "webm":
+        return None
+    if input_format == "pcm16":
+        if sample_rate != settings.SAMPLE_RATE:
+            raise ValueError(f"pcm16 input must be {settings.SAMPLE_RATE} Hz mono, got {sample_rate} Hz")
+        return PCM16Input()
+    if opuslib is None:
+        raise ValueError("Opus input is not available (opuslib/libopus not installed)")
+    return OpusInput()
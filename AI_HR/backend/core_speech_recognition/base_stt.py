@@ -1,51 +1,149 @@
-import subprocess
+import asyncio
 import re
 import logging
-from collections import deque
 from fastapi import WebSocket
-import numpy as np
 from . import settings
+from .audio_input import PCM16Input, make_input
+from .ring_buffer import PCMRingBuffer
 
 logger = logging.getLogger(__name__)
 
 class BaseSTT:
-    def __init__(self, chunk_duration=settings.CHUNK_DURATION):
+    def __init__(self, chunk_duration=settings.CHUNK_DURATION, pcm_buffer=None):
         self.ffmpeg_process = None
-        self.pcm_buffer = deque(maxlen=settings.SAMPLE_RATE * settings.BUFFER_DURATION)
+        self.pcm_buffer = pcm_buffer if pcm_buffer is not None else PCMRingBuffer(settings.SAMPLE_RATE * settings.BUFFER_DURATION)
         self.session_active = False
         self.sample_rate = settings.SAMPLE_RATE
         self.chunk_duration = chunk_duration
         self.segments = []
         self.accumulated = ""
         self.improved_text = ""  # Улучшенный текст от Gemini
+        self.input_format = "webm"
+        self.audio_input = None  # декодер pcm16/opus; для webm - ffmpeg
+        self._ffmpeg_input = None
+        self._ffmpeg_tasks = []
+        self.queued_bytes = 0  # байт WebM в очереди на запись в ffmpeg
+        self.dropped_input_bytes = 0
+        self.ffmpeg_error = None  # почему ffmpeg перестал принимать вход (ещё не сообщено клиенту)
         
-    def start_ffmpeg_stream(self):
+    async def start_ffmpeg_stream(self):
         try:
-            self.ffmpeg_process = subprocess.Popen(
-                settings.FFMPEG_ARGS,
-                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+            self.ffmpeg_process = await asyncio.create_subprocess_exec(
+                *settings.FFMPEG_ARGS,
+                stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
             )
-            return True
-        except:
+        except Exception as e:
+            logger.error(f"Failed to start FFmpeg: {e}")
             return False
+        self.ffmpeg_error = None
+        # Ограниченная очередь входа: при заполнении feed_audio ждёт (backpressure), затем отбрасывает
+        self._ffmpeg_input = asyncio.Queue(maxsize=settings.FFMPEG_INPUT_QUEUE)
+        self._ffmpeg_tasks = [
+            asyncio.create_task(self._ffmpeg_writer(self.ffmpeg_process, self._ffmpeg_input)),
+            asyncio.create_task(self._ffmpeg_reader(self.ffmpeg_process)),
+        ]
+        return True
     
     def stop_ffmpeg_stream(self):
-        if self.ffmpeg_process:
+        for task in self._ffmpeg_tasks:
+            task.cancel()
+        self._ffmpeg_tasks = []
+        self._ffmpeg_input = None
+        self.queued_bytes = 0
+        process, self.ffmpeg_process = self.ffmpeg_process, None
+        if process and process.returncode is None:
             try:
-                self.ffmpeg_process.terminate()
-                self.ffmpeg_process.wait(timeout=5)
-            except:
-                self.ffmpeg_process.kill()
-    
-    def read_pcm_stream(self):
+                process.terminate()
+            except ProcessLookupError:
+                return
+            asyncio.ensure_future(self._reap_ffmpeg(process))
+
+    @staticmethod
+    async def _reap_ffmpeg(process):
         try:
-            while self.session_active and self.ffmpeg_process:
-                pcm_chunk = self.ffmpeg_process.stdout.read(settings.PCM_CHUNK_SIZE)
-                if not pcm_chunk:
-                    break
-                self.pcm_buffer.extend(np.frombuffer(pcm_chunk, dtype=np.int16))
-        except:
-            pass
+            await asyncio.wait_for(process.wait(), timeout=5)
+        except asyncio.TimeoutError:
+            process.kill()
+
+    async def _ffmpeg_writer(self, process, queue: asyncio.Queue):
+        try:
+            while True:
+                chunk = await queue.get()
+                self.queued_bytes -= len(chunk)
+                process.stdin.write(chunk)
+                # drain() ждёт, пока ffmpeg заберёт данные из пайпа, не блокируя event loop
+                await process.stdin.drain()
+        except Exception as e:
+            self._ffmpeg_stopped(queue, f"stdin closed: {e!r}")
+
+    def _ffmpeg_stopped(self, queue: asyncio.Queue, reason: str):
+        """ffmpeg no longer takes input: drop further frames at once instead of waiting on a full queue"""
+        if self._ffmpeg_input is not queue:
+            return  # поток уже остановлен или перезапущен
+        logger.error(f"FFmpeg stopped: {reason}")
+        self._ffmpeg_input = None
+        self.ffmpeg_error = reason
+        self.dropped_input_bytes += self.queued_bytes
+        self.queued_bytes = 0
+
+    def pop_input_error(self):
+        """Why the ingest stopped, once (None if it is fine); the client may reconfigure to restart it"""
+        error, self.ffmpeg_error = self.ffmpeg_error, None
+        return error
+
+    async def _ffmpeg_reader(self, process):
+        aligner = PCM16Input()
+        while True:
+            pcm_chunk = await process.stdout.read(settings.PCM_CHUNK_SIZE)
+            if not pcm_chunk:
+                break
+            self.pcm_buffer.write(aligner.decode(pcm_chunk))
+
+    async def configure_input(self, input_format: str, sample_rate: int = settings.SAMPLE_RATE) -> bool:
+        """Switch the ingest format; ffmpeg runs only for webm.
+
+        Raises ValueError for unsupported formats; returns False if ffmpeg could not start.
+        """
+        self.audio_input = make_input(input_format, sample_rate)
+        self.input_format = input_format
+        if input_format != "webm":
+            self.stop_ffmpeg_stream()
+            return True
+        if self._ffmpeg_input is not None:
+            return True
+        # ffmpeg не запущен или умер - поднимаем заново
+        self.stop_ffmpeg_stream()
+        return await self.start_ffmpeg_stream()
+
+    async def feed_audio(self, data: bytes):
+        """Binary WebSocket frame -> PCM buffer (directly or through ffmpeg)"""
+        if self.audio_input is not None:
+            self.pcm_buffer.write(self.audio_input.decode(data))
+            return
+        if self._ffmpeg_input is not None and (self._ffmpeg_tasks[0].done() or self.ffmpeg_process.returncode is not None):
+            self._ffmpeg_stopped(self._ffmpeg_input, f"exited with code {self.ffmpeg_process.returncode}")
+        if self._ffmpeg_input is None:
+            if self.input_format == "webm":
+                self.dropped_input_bytes += len(data)
+            return
+        self.queued_bytes += len(data)
+        try:
+            await asyncio.wait_for(self._ffmpeg_input.put(data), timeout=settings.FFMPEG_WRITE_TIMEOUT)
+        except asyncio.TimeoutError:
+            # ffmpeg не успевает: не держим приём сокета дольше таймаута
+            self.queued_bytes -= len(data)
+            self.dropped_input_bytes += len(data)
+            logger.warning(f"FFmpeg input queue full, dropped {len(data)} bytes")
+
+    def audio_stats(self) -> dict:
+        """Ingest backlog and decoder lag of this session"""
+        return {
+            "input_format": self.input_format,
+            "queued_bytes": self.queued_bytes,
+            "dropped_input_bytes": self.dropped_input_bytes,
+            "audio_lag_ms": round(self.pcm_buffer.pending() * 1000 / self.sample_rate),
+            "dropped_audio_ms": round(self.pcm_buffer.dropped * 1000 / self.sample_rate),
+        }
     
     def clean_russian_text(self, text: str) -> str:
         if not text:
@@ -53,20 +151,6 @@ class BaseSTT:
         text = re.sub(r'[^а-яёА-ЯЁ\d\s\.,!?\-]', '', text)
         return re.sub(r'\s+', ' ', text).strip()
 
-    def deduplicate_text(self, new_text: str, segments: list) -> str:
-        if not segments or not new_text:
-            return new_text
-        
-        last_text = segments[-1].get("text", "")
-        new_words = new_text.split()
-        last_words = last_text.split()
-        max_overlap = min(len(new_words), len(last_words), settings.MAX_OVERLAP_WORDS)
-        
-        for i in range(max_overlap, 0, -1):
-            if last_words[-i:] == new_words[:i]:
-                return " ".join(new_words[i:])
-        return new_text
-    
     def reset_session(self):
         self.session_active = False
         self.segments = []
@@ -88,3 +172,16 @@ class BaseSTT:
             })
         except:
             pass
+
+    async def send_partial(self, websocket: WebSocket, text: str, engine: str):
+        """Промежуточная гипотеза текущей фразы (может меняться до финального result)"""
+        try:
+            await websocket.send_json({
+                "type": "partial",
+                "partial": text,
+                "accumulated": self.accumulated.strip(),
+                "segment_id": len(self.segments) + 1,
+                "engine": engine
+            })
+        except:
+            pass
@@ -0,0 +1,207 @@
+import asyncio
+import io
+import json
+import logging
+import multiprocessing as mp
+import os
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import vosk
+
+from . import settings
+
+logger = logging.getLogger(__name__)
+
+# Модель воркера: при fork наследуется от родителя (общие страницы памяти), иначе грузится в initializer
+_model = None
+
+
+def _init_worker(model_path: str) -> None:
+    global _model
+    if _model is None:
+        _model = vosk.Model(model_path)
+
+
+def _transcribe_piece(pcm: bytes, offset: float, sample_rate: int) -> List[Dict]:
+    """Decode one piece of a file in a pool worker -> segments with absolute times"""
+    recognizer = vosk.KaldiRecognizer(_model, sample_rate)
+    recognizer.SetWords(True)
+    results = []
+    step = sample_rate // 4 * 2  # 0.25 с int16
+    for start in range(0, len(pcm), step):
+        if recognizer.AcceptWaveform(pcm[start:start + step]):
+            results.append(json.loads(recognizer.Result()))
+    results.append(json.loads(recognizer.FinalResult()))
+
+    segments = []
+    for result in results:
+        text = result.get("text", "").strip()
+        if not text:
+            continue
+        words = result.get("result") or []
+        segments.append({
+            "start": round(offset + (words[0]["start"] if words else 0.0), 2),
+            "end": round(offset + (words[-1]["end"] if words else len(pcm) / 2 / sample_rate), 2),
+            "text": text,
+            "confidence": round(sum(w.get("conf", 0.8) for w in words) / len(words), 3) if words else 0.8,
+        })
+    return segments
+
+
+def _read_wav(data: bytes, sample_rate: int) -> Optional[np.ndarray]:
+    """16-bit mono WAV at the model rate is read directly, without ffmpeg"""
+    if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        return None
+    try:
+        with wave.open(io.BytesIO(data)) as wav:
+            if wav.getnchannels() != 1 or wav.getsampwidth() != 2 or wav.getframerate() != sample_rate:
+                return None
+            return np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+    except wave.Error:
+        return None
+
+
+def split_at_silence(audio: np.ndarray, sample_rate: int = settings.SAMPLE_RATE,
+                     piece_seconds: float = settings.TRANSCRIBE_PIECE_SECONDS,
+                     search_seconds: float = settings.TRANSCRIBE_SPLIT_SEARCH) -> List[Tuple[int, int]]:
+    """Sample ranges of about piece_seconds, cut at the quietest frame near each boundary.
+
+    Cutting in pauses keeps words whole, so pieces can be decoded independently.
+    """
+    n = len(audio)
+    piece = int(piece_seconds * sample_rate)
+    if n <= piece + piece // 2:
+        return [(0, n)]
+    frame = sample_rate * settings.VAD_FRAME_MS // 1000
+    frames = n // frame
+    x = audio[:frames * frame].reshape(frames, frame).astype(np.float32)
+    energy = np.einsum("ij,ij->i", x, x)  # энергия кадров без промежуточного квадрата всего файла
+    search = int(search_seconds * sample_rate) // frame
+
+    cuts = [0]
+    while n - cuts[-1] > piece + piece // 2:
+        center = (cuts[-1] + piece) // frame
+        lo, hi = max(cuts[-1] // frame + 1, center - search), min(frames, center + search + 1)
+        cuts.append(int(lo + np.argmin(energy[lo:hi])) * frame)
+    cuts.append(n)
+    return list(zip(cuts[:-1], cuts[1:]))
+
+
+class BatchTranscriber:
+    """Offline transcription of recorded files over a process pool.
+
+    Files are decoded to 16 kHz mono PCM by ffmpeg, split at pauses into
+    pieces of about TRANSCRIBE_PIECE_SECONDS and the pieces of all files
+    are decoded in parallel. With the fork start method the model loaded
+    in this process (`vosk_model`) is inherited by the workers, so it is
+    read from disk once and its pages are shared.
+    """
+
+    def __init__(self, model_path: str = settings.MODEL_PATH, workers: int = settings.TRANSCRIBE_WORKERS,
+                 vosk_model=None, sample_rate: int = settings.SAMPLE_RATE):
+        self.model_path = model_path
+        self.workers = workers or os.cpu_count() or 1
+        self.vosk_model = vosk_model
+        self.sample_rate = sample_rate
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = asyncio.Lock()
+        self.files_done = 0
+        self.audio_seconds = 0.0
+        self.wall_seconds = 0.0
+
+    async def _ensure_pool(self) -> ProcessPoolExecutor:
+        global _model
+        async with self._pool_lock:
+            if self._pool is None:
+                if mp.get_start_method() == "fork":
+                    if self.vosk_model is None:
+                        # Загрузка модели занимает секунды - не в event loop, иначе встанут все WebSocket-сессии
+                        self.vosk_model = await asyncio.to_thread(vosk.Model, self.model_path)
+                    _model = self.vosk_model  # до fork: воркеры получат уже загруженную модель
+                self._pool = ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(self.model_path,))
+                logger.info(f"Transcription pool started with {self.workers} workers")
+        return self._pool
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def decode(self, data: bytes) -> np.ndarray:
+        """Any container/codec ffmpeg reads (WebM, WAV, MP3, ...) -> int16 PCM"""
+        audio = _read_wav(data, self.sample_rate)
+        if audio is not None:
+            return audio
+        process = await asyncio.create_subprocess_exec(
+            *settings.FFMPEG_FILE_ARGS,
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        )
+        pcm, err = await process.communicate(data)
+        if process.returncode != 0:
+            raise ValueError(f"ffmpeg could not decode the file: {err.decode(errors='ignore').strip()[-200:]}")
+        return np.frombuffer(pcm[:len(pcm) - len(pcm) % 2], dtype=np.int16)
+
+    async def transcribe(self, files: List[Tuple[str, bytes]]) -> Dict:
+        """Transcribe (filename, data) pairs -> per-file segments and throughput"""
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        pool = await self._ensure_pool()
+
+        decoded = await asyncio.gather(*[self.decode(data) for _, data in files], return_exceptions=True)
+        jobs = []  # (file index, future)
+        for index, audio in enumerate(decoded):
+            if isinstance(audio, Exception):
+                continue
+            for start, end in split_at_silence(audio, self.sample_rate):
+                future = loop.run_in_executor(pool, _transcribe_piece, audio[start:end].tobytes(),
+                                              start / self.sample_rate, self.sample_rate)
+                jobs.append((index, future))
+        pieces = await asyncio.gather(*[future for _, future in jobs], return_exceptions=True)
+
+        segments: Dict[int, List[Dict]] = {index: [] for index in range(len(files))}
+        errors: Dict[int, str] = {i: str(a) for i, a in enumerate(decoded) if isinstance(a, Exception)}
+        for (index, _), result in zip(jobs, pieces):
+            if isinstance(result, Exception):
+                logger.error(f"Transcription of {files[index][0]} failed: {result}")
+                errors[index] = str(result)
+            else:
+                segments[index].extend(result)
+
+        results = []
+        audio_seconds = 0.0
+        for index, (filename, _) in enumerate(files):
+            entry = {"filename": filename}
+            if index in errors:
+                entry["error"] = errors[index]
+            else:
+                duration = len(decoded[index]) / self.sample_rate
+                audio_seconds += duration
+                ordered = sorted(segments[index], key=lambda s: s["start"])
+                entry.update({
+                    "duration": round(duration, 2),
+                    "segments": ordered,
+                    "text": " ".join(s["text"] for s in ordered),
+                })
+            results.append(entry)
+
+        wall = time.perf_counter() - started
+        self.files_done += len(files) - len(errors)
+        self.audio_seconds += audio_seconds
+        self.wall_seconds += wall
+        return {"files": results, "stats": self._throughput(audio_seconds, wall)}
+
+    def _throughput(self, audio_seconds: float, wall_seconds: float) -> Dict:
+        return {
+            "audio_seconds": round(audio_seconds, 2),
+            "wall_seconds": round(wall_seconds, 3),
+            # аудио-часов за час работы = во сколько раз быстрее реального времени
+            "audio_hours_per_hour": round(audio_seconds / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+            "workers": self.workers,
+        }
+
+    def stats(self) -> Dict:
+        return {"files": self.files_done, **self._throughput(self.audio_seconds, self.wall_seconds)}
@@ -0,0 +1,314 @@
+import asyncio
+import logging
+import multiprocessing as mp
+import queue
+import threading
+import time
+import uuid
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, Optional
+
+from . import settings
+from .ring_buffer import PCMRingBuffer
+from .process_stats import memory_usage
+from .stream_decoder import Event, StreamDecoder, take_audio, warm_up
+
+logger = logging.getLogger(__name__)
+
+# Модель, загруженная до старта воркеров (DecoderPool.preload): при fork они её наследуют
+_model = None
+
+
+def _recover_stream(streams: Dict[str, tuple], stream_id: str, model, results, error: Exception) -> None:
+    """A failing stream gets a fresh decoder (its open phrase is lost) instead of taking the worker down"""
+    logger.error(f"Decoder stream {stream_id} failed: {error}")
+    if stream_id in streams:
+        shm, ring, _ = streams[stream_id]
+        streams[stream_id] = (shm, ring, StreamDecoder(model))
+    results.put(("error", stream_id, str(error)))
+
+
+def _worker_main(worker_id: int, model_path: str, commands, results) -> None:
+    """Decoder process: loads the model once and decodes every stream assigned to it.
+
+    Commands: ("open", stream_id, shm_name, capacity), ("reset", stream_id),
+    ("flush", stream_id), ("close", stream_id), None to exit. Results go to
+    the shared results queue as (kind, stream_id, payload). An error in one
+    stream is reported as ("error", stream_id, message) and only resets
+    that stream.
+    """
+    import vosk
+
+    model = _model if _model is not None else vosk.Model(model_path)
+    warm_up(model)
+    results.put(("ready", worker_id, None))
+    streams: Dict[str, tuple] = {}  # stream_id -> (shm, ring, decoder)
+
+    while True:
+        try:
+            # Без потоков можно блокироваться на командах; иначе только забираем накопившиеся
+            command = commands.get(timeout=1.0) if not streams else commands.get_nowait()
+        except queue.Empty:
+            command = ()
+        if command is None:
+            break
+        if command:
+            kind, stream_id = command[0], command[1]
+            try:
+                if kind == "open":
+                    shm = shared_memory.SharedMemory(name=command[2])
+                    # The parent owns (and unlinks) the segment
+                    resource_tracker.unregister(shm._name, "shared_memory")
+                    streams[stream_id] = (shm, PCMRingBuffer(command[3], buffer=shm.buf), StreamDecoder(model))
+                elif stream_id in streams:
+                    shm, ring, decoder = streams[stream_id]
+                    if kind == "reset":
+                        ring.clear()
+                        decoder.reset()
+                    elif kind == "flush":
+                        events = decoder.feed(take_audio(ring)) + decoder.flush()
+                        for event_kind, payload in events:
+                            results.put((event_kind, stream_id, payload))
+                        results.put(("flushed", stream_id, None))
+                    elif kind == "close":
+                        del streams[stream_id]
+                        ring.release()
+                        shm.close()
+            except Exception as e:
+                _recover_stream(streams, stream_id, model, results, e)
+                if kind == "flush":
+                    results.put(("flushed", stream_id, None))  # сессия не должна ждать таймаут
+            continue
+
+        busy = False
+        for stream_id, (shm, ring, decoder) in list(streams.items()):
+            try:
+                audio = take_audio(ring)
+                if len(audio):
+                    busy = True
+                    for event_kind, payload in decoder.feed(audio):
+                        results.put((event_kind, stream_id, payload))
+            except Exception as e:
+                _recover_stream(streams, stream_id, model, results, e)
+        if not busy:
+            time.sleep(settings.DECODER_POLL_INTERVAL)
+
+
+class RemoteDecoderStream:
+    """Session side of a stream decoded in a worker process.
+
+    The ffmpeg reader writes PCM into `ring`, which lives in shared memory
+    and is consumed by the worker; results arrive through the pool's
+    dispatcher thread. If the worker dies the pool moves the stream to
+    another one (the ring survives, only the open phrase is lost); with no
+    worker left the stream is marked `failed`.
+    """
+
+    def __init__(self, pool: "DecoderPool", worker_id: int, capacity: int):
+        self.pool = pool
+        self.worker_id = worker_id
+        self.stream_id = uuid.uuid4().hex[:16]
+        self._shm = shared_memory.SharedMemory(create=True, size=PCMRingBuffer.nbytes(capacity))
+        self.ring = PCMRingBuffer(capacity, buffer=self._shm.buf)
+        self._events: List[Event] = []
+        self._flushed: Optional[asyncio.Future] = None
+        self.closed = False
+        self.failed = False
+        pool._send(worker_id, ("open", self.stream_id, self._shm.name, capacity))
+
+    def _move(self, worker_id: int) -> None:
+        # Runs on the event loop: reopen the same ring on a live worker
+        self.worker_id = worker_id
+        self.pool._send(worker_id, ("open", self.stream_id, self._shm.name, self.ring.capacity))
+        if self._flushed and not self._flushed.done():
+            self.pool._send(worker_id, ("flush", self.stream_id))
+
+    def _fail(self) -> None:
+        self.failed = True
+        if self._flushed and not self._flushed.done():
+            self._flushed.set_result(None)
+
+    def _deliver(self, kind: str, payload) -> None:
+        # Runs on the event loop (call_soon_threadsafe from the dispatcher)
+        if kind == "flushed":
+            if self._flushed and not self._flushed.done():
+                self._flushed.set_result(None)
+        else:
+            self._events.append((kind, payload))
+
+    async def reset(self) -> None:
+        self._events = []
+        self.pool._send(self.worker_id, ("reset", self.stream_id))
+
+    async def events(self) -> List[Event]:
+        events, self._events = self._events, []
+        return events
+
+    async def flush(self) -> List[Event]:
+        if self.failed:
+            return await self.events()
+        self._flushed = asyncio.get_running_loop().create_future()
+        self.pool._send(self.worker_id, ("flush", self.stream_id))
+        try:
+            await asyncio.wait_for(self._flushed, timeout=settings.DECODER_FLUSH_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"Decoder stream {self.stream_id}: flush timed out")
+        return await self.events()
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        self.pool._send(self.worker_id, ("close", self.stream_id))
+        self.pool._release(self)
+        self.ring.release()
+        self._shm.close()
+        self._shm.unlink()
+
+
+class DecoderPool:
+    """Vosk decoding spread over worker processes (one model copy per worker).
+
+    Streams are placed on the least loaded worker; audio goes through a
+    shared-memory ring per stream, results come back through one queue
+    read by a dispatcher thread that hands them to the event loop.
+    """
+
+    def __init__(self, model_path: str, workers: int, buffer_seconds: int = settings.BUFFER_DURATION):
+        self.model_path = model_path
+        self.workers = workers
+        self.capacity = settings.SAMPLE_RATE * buffer_seconds
+        self._commands: List = []
+        self._processes: List[mp.Process] = []
+        self._results = None
+        self._streams: Dict[str, RemoteDecoderStream] = {}
+        self._load = [0] * workers
+        self._ready = set()
+        self._dead = set()
+        self.reassigned_streams = 0
+        self.failed_streams = 0
+        self.stream_errors = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._dispatcher: Optional[threading.Thread] = None
+
+    def preload(self) -> None:
+        """Load the model in this process so forked workers share its pages instead of loading copies"""
+        global _model
+        import vosk
+
+        _model = vosk.Model(self.model_path)
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._results = mp.Queue()
+        for worker_id in range(self.workers):
+            commands = mp.Queue()
+            process = mp.Process(target=_worker_main, args=(worker_id, self.model_path, commands, self._results),
+                                 name=f"vosk-decoder-{worker_id}", daemon=True)
+            process.start()
+            self._commands.append(commands)
+            self._processes.append(process)
+        self._dispatcher = threading.Thread(target=self._dispatch, name="vosk-decoder-results", daemon=True)
+        self._dispatcher.start()
+        logger.info(f"Decoder pool started with {self.workers} workers")
+
+    def stop(self) -> None:
+        for stream in list(self._streams.values()):
+            stream.close()
+        for commands in self._commands:
+            commands.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        if self._results is not None:
+            self._results.put(None)
+            self._dispatcher.join(timeout=5)
+        self._commands, self._processes = [], []
+
+    def open_stream(self) -> RemoteDecoderStream:
+        alive = self._alive_workers()
+        if not alive:
+            raise RuntimeError("No decoder workers left")
+        worker_id = min(alive, key=lambda w: self._load[w])
+        stream = RemoteDecoderStream(self, worker_id, self.capacity)
+        self._streams[stream.stream_id] = stream
+        self._load[worker_id] += 1
+        return stream
+
+    def failed(self) -> bool:
+        """All workers exited (e.g. the model could not be loaded)"""
+        return bool(self._processes) and not any(p.is_alive() for p in self._processes)
+
+    def stats(self) -> Dict:
+        return {
+            "workers": self.workers,
+            "ready": len(self._ready),
+            "dead_workers": sorted(self._dead),
+            "reassigned_streams": self.reassigned_streams,
+            "failed_streams": self.failed_streams,
+            "stream_errors": self.stream_errors,
+            "streams_per_worker": list(self._load),
+            "memory": [memory_usage(p.pid) for p in self._processes],
+        }
+
+    def _send(self, worker_id: int, command: tuple) -> None:
+        self._commands[worker_id].put(command)
+
+    def _release(self, stream: RemoteDecoderStream) -> None:
+        if self._streams.pop(stream.stream_id, None) is not None and not stream.failed:
+            self._load[stream.worker_id] -= 1
+
+    def _alive_workers(self) -> List[int]:
+        return [w for w in range(len(self._processes)) if w not in self._dead]
+
+    def _check_workers(self, reported: set) -> None:
+        # Dispatcher thread: only detects the death; pool state changes on the event loop (_reassign)
+        for worker_id, process in enumerate(self._processes):
+            if worker_id not in reported and not process.is_alive():
+                reported.add(worker_id)
+                logger.error(f"Decoder worker {worker_id} exited (code {process.exitcode})")
+                self._loop.call_soon_threadsafe(self._reassign, worker_id)
+
+    def _reassign(self, worker_id: int) -> None:
+        self._dead.add(worker_id)
+        self._ready.discard(worker_id)
+        self._load[worker_id] = 0
+        alive = self._alive_workers()
+        for stream in [s for s in self._streams.values() if s.worker_id == worker_id and not s.failed]:
+            if not alive:
+                stream._fail()
+                self.failed_streams += 1
+                continue
+            target = min(alive, key=lambda w: self._load[w])
+            stream._move(target)
+            self._load[target] += 1
+            self.reassigned_streams += 1
+            logger.warning(f"Decoder stream {stream.stream_id} moved from worker {worker_id} to {target}")
+
+    def _dispatch(self) -> None:
+        checked = time.monotonic()
+        reported = set()
+        while True:
+            try:
+                item = self._results.get(timeout=settings.DECODER_HEALTH_INTERVAL)
+            except queue.Empty:
+                item = ()
+            if time.monotonic() - checked >= settings.DECODER_HEALTH_INTERVAL:
+                self._check_workers(reported)
+                checked = time.monotonic()
+            if item is None:
+                break
+            if not item:
+                continue
+            kind, stream_id, payload = item
+            if kind == "ready":
+                self._loop.call_soon_threadsafe(self._ready.add, stream_id)
+                logger.info(f"Decoder worker {stream_id} ready")
+                continue
+            if kind == "error":
+                self.stream_errors += 1
+                continue
+            stream = self._streams.get(stream_id)
+            if stream is not None:
+                self._loop.call_soon_threadsafe(stream._deliver, kind, payload)
@@ -1,11 +1,30 @@
 import asyncio
 import logging
+import re
+import time
+from typing import Dict
 from . import settings
 from .openrouter_processor import OpenRouterProcessor
 from .hr_prompts import HRPrompts
 
 logger = logging.getLogger(__name__)
 
+# Счётчики спекулятивной генерации вопросов по всем сессиям процесса
+_speculation_stats = {"started": 0, "restarted": 0, "hits": 0, "misses": 0, "ready_at_turn_end": 0, "hit_wait_seconds": 0.0}
+
+
+def speculation_stats() -> Dict:
+    stats = dict(_speculation_stats)
+    turns = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / turns, 3) if turns else None
+    stats["avg_hit_wait_ms"] = round(stats["hit_wait_seconds"] / stats["hits"] * 1000, 1) if stats["hits"] else None
+    stats["hit_wait_seconds"] = round(stats["hit_wait_seconds"], 3)
+    return stats
+
+
+def _word_count(text: str) -> int:
+    return len(re.findall(r"\w+", text))
+
 class HRInterviewer:
     def __init__(self):
         self.openrouter = OpenRouterProcessor()
@@ -25,6 +44,8 @@ class HRInterviewer:
         self.questions_in_current_topic = 0
         self.max_questions_per_topic = 2
         self.total_questions = len(self.topics) * self.max_questions_per_topic  # 3 topics * 2 = 6 max
+        self._reviews = set()  # фоновые очистка+оценка ответов
+        self._speculation = None  # следующий вопрос, генерируемый по неполному ответу
     
     def start_interview(self, job_profile: str = "Python Developer"):
         """Start interview with job profile"""
@@ -34,6 +55,7 @@ class HRInterviewer:
         self.job_profile = job_profile
         self.current_topic_index = 0
         self.questions_in_current_topic = 0
+        self.cancel_speculation()
         
         # Generate initial greeting and first question
         initial_greeting = HRPrompts.INITIAL_GREETING.format(job_profile=job_profile)
@@ -68,57 +90,53 @@ class HRInterviewer:
             "question": self.current_question_text
         }
     
-    async def process_answer(self, answer_text: str):
-        """Process candidate answer"""
+    async def process_answer(self, answer_text: str, send=None):
+        """Process candidate answer.
+
+        The turn is a small dependency graph instead of three serial LLM calls:
+        the topic/clarification decision is local (_is_unclear_answer), so the
+        next question is generated right away from the recognized answer, while
+        cleanup -> evaluation runs concurrently and fills in the history entry.
+
+        With `send` (async callable, e.g. websocket.send_json) the next question
+        is sent as soon as it is generated and the evaluation follows as a
+        separate "answer_evaluated" message. Without it the call waits for
+        everything and returns the combined "answer_processed" result.
+        """
         
         if not self.interview_active or self.current_question >= self.total_questions:
             logger.warning("Interview not active or questions exceeded")
             return {"type": "error", "message": "Интервью не активно"}
         
-        # 1. Improve answer through OpenRouter
-        # logger.info("Improving answer via OpenRouter...")
-        try:
-            improved_answer = await self.openrouter.process_text(answer_text)
-            # logger.info(f"Answer improved: '{improved_answer}'")
-        except Exception as e:
-            logger.error(f"Error improving answer: {e}")
-            improved_answer = answer_text
-        
-        # 2. Evaluate answer
-        # logger.info("Evaluating answer...")
-        try:
-            evaluation = await self.openrouter.evaluate_answer(
-                self.current_question_text, 
-                improved_answer, 
-                self.job_profile
-            )
-            # logger.info(f"Answer evaluated: {evaluation}")
-        except Exception as e:
-            logger.error(f"Error evaluating answer: {e}")
-            evaluation = {"score": 50, "feedback": "Не удалось оценить ответ"}
-        
-        # 3. Add to conversation history
-        self.conversation_history.append({
+        # 1. Add to conversation history; cleanup and evaluation fill it in later
+        entry = {
             "question": self.current_question_text,
-            "answer": improved_answer,
+            "answer": answer_text,
             "raw_answer": answer_text,
-            "evaluation": evaluation
-        })
-        # logger.info(f"Added to history: Q{self.current_question + 1}")
+            "evaluation": None
+        }
+        self.conversation_history.append(entry)
+        answered_number = self.current_question + 1
+        review = asyncio.create_task(self._review_answer(entry))
+        self._reviews.add(review)
+        review.add_done_callback(self._reviews.discard)
+        delivered = asyncio.get_running_loop().create_future()
+        if send is not None:
+            asyncio.create_task(self._deliver_review(review, delivered, send, answered_number, entry))
         
-        # 4. SIMPLE TOPIC LOGIC: Each topic = max 2 questions
-        score = evaluation.get('score', 0)
+        # 2. SIMPLE TOPIC LOGIC: Each topic = max 2 questions; clarity is judged locally, without waiting for the LLM score
         feedback_message = ""
-        is_unclear = score < 40 or self._is_unclear_answer(improved_answer)
+        stay_in_topic, _ = self._plan_turn(answer_text)
+        speculated = self._take_speculation(answer_text)
         
         # Increment questions in current topic
         self.questions_in_current_topic += 1
         current_topic_name = self.topics[self.current_topic_index]
         
-        logger.info(f"TOPIC: '{current_topic_name}' - Question {self.questions_in_current_topic}/2 - Score: {score} - Unclear: {is_unclear}")
+        logger.info(f"TOPIC: '{current_topic_name}' - Question {self.questions_in_current_topic}/2 - Clarification: {stay_in_topic}")
         
         # Decision logic
-        if self.questions_in_current_topic == 1 and is_unclear:
+        if stay_in_topic:
             # First question unclear -> stay in topic for question 2
             feedback_message = f"Ответ неясен. Уточняющий вопрос по теме '{current_topic_name}'"
             logger.info(f"STAYING in topic '{current_topic_name}' for question 2")
@@ -128,36 +146,54 @@ class HRInterviewer:
             self.questions_in_current_topic = 0
             logger.info(f"MOVING to next topic. Completed: '{current_topic_name}'")
         
-        # 5. Move to next question
+        # 3. Move to next question
         self.current_question += 1
-        # logger.info(f"Moving to question {self.current_question + 1}/{self.total_questions}")
         
-        # Check if interview should continue (more topics available)
-        if self.current_topic_index < len(self.topics):
-            # 5. Generate next question
-            # logger.info("Generating next question...")
+        try:
+            # Check if interview should continue (more topics available)
+            if self.current_topic_index >= len(self.topics):
+                # Interview finished: the report needs every evaluation, finish_interview waits for them
+                result = await self.finish_interview(send=send)
+                if send is not None:
+                    await send(result)
+                return result
+            
+            # 4. Generate next question (concurrently with cleanup/evaluation)
             try:
                 current_topic = self.topics[self.current_topic_index]
                 is_clarification = self.questions_in_current_topic == 1  # Second question on same topic
+                on_delta = None
+                if send is not None:
+                    # Вопрос показывается по мере генерации; answer_processed затем несёт его целиком
+                    question_number = self.current_question + 1
+                    topic_display = f"Тема {self.current_topic_index + 1}: {current_topic}"
+
+                    async def on_delta(delta: str):
+                        await send({"type": "question_delta", "question_number": question_number,
+                                    "topic_display": topic_display, "delta": delta})
                 
-                next_interaction = await self.openrouter.generate_hr_interaction(
-                    self.job_profile, 
-                    self.conversation_history,
-                    current_topic,
-                    is_clarification
-                )
+                if speculated is not None:
+                    # Вопрос уже сгенерирован (или генерируется) по неполному ответу
+                    waited = time.perf_counter()
+                    if on_delta is not None and not speculated["task"].done():
+                        await self._attach_speculation(speculated, on_delta)
+                    next_interaction = await speculated["task"]
+                    _speculation_stats["hit_wait_seconds"] += time.perf_counter() - waited
+                else:
+                    next_interaction = await self.openrouter.generate_hr_interaction(
+                        self.job_profile, 
+                        self.conversation_history,
+                        current_topic,
+                        is_clarification,
+                        on_delta=on_delta
+                    )
                 self.current_question_text = next_interaction
-                # logger.info(f"Next question generated: '{next_interaction}'")
             except Exception as e:
                 logger.error(f"Error generating next question: {e}")
                 self.current_question_text = f"Расскажите подробнее о вашем опыте (вопрос {self.current_question + 1})"
             
-            # Add topic to question text (check bounds)
-            if self.current_topic_index < len(self.topics):
-                topic_name = self.topics[self.current_topic_index]
-                question_with_topic = f"[ТЕМА: {topic_name}] {self.current_question_text}"
-            else:
-                question_with_topic = self.current_question_text
+            topic_name = self.topics[self.current_topic_index]
+            question_with_topic = f"[ТЕМА: {topic_name}] {self.current_question_text}"
             
             # Simple total calculation: current + remaining topics (max 2 each)
             remaining_topics = len(self.topics) - self.current_topic_index
@@ -165,7 +201,7 @@ class HRInterviewer:
             estimated_total = self.current_question + 1 + max_remaining - self.questions_in_current_topic
             
             # Display as "Тема X: Название темы" instead of "Вопрос X"
-            topic_display = f"Тема {self.current_topic_index + 1}: {topic_name}" if self.current_topic_index < len(self.topics) else f"Вопрос {self.current_question + 1}"
+            topic_display = f"Тема {self.current_topic_index + 1}: {topic_name}"
             
             next_question = {
                 "type": "question", 
@@ -178,22 +214,148 @@ class HRInterviewer:
             
             result = {
                 "type": "answer_processed",
-                "improved_answer": improved_answer,
-                "evaluation": evaluation,
+                "improved_answer": entry["answer"],
+                "evaluation": entry["evaluation"],
+                "evaluation_pending": send is not None,
                 "next_question": next_question,
                 "feedback_message": feedback_message,
                 "total_questions_updated": self.total_questions
             }
-            # logger.info("Returning answer_processed with next question")
+            if send is None:
+                await review
+                result.update(improved_answer=entry["answer"], evaluation=entry["evaluation"])
+            else:
+                await send(result)
             return result
-        else:
-            # Interview finished
-            # logger.info("Interview finished, generating final result")
-            return await self.finish_interview()
+        finally:
+            # Оценка уходит клиенту только после вопроса (или не уходит вовсе, если интервью завершено)
+            delivered.set_result(None)
+    
+    def _plan_turn(self, answer_text: str):
+        """Topic decision for an answer -> (stay in topic for a clarification, next topic index); state is not changed"""
+        stay = self.questions_in_current_topic == 0 and self._is_unclear_answer(answer_text)
+        return stay, self.current_topic_index if stay else self.current_topic_index + 1
+    
+    def _changed_materially(self, speculated_words: int, words: int) -> bool:
+        return words > speculated_words * (1 + settings.SPECULATION_RESTART_RATIO)
     
-    async def finish_interview(self):
-        """Finish interview and generate final feedback"""
+    def speculate(self, partial_answer: str) -> None:
+        """Start generating the next question from the answer so far.
+
+        Called as the transcript grows. Once the answer passes
+        SPECULATION_MIN_WORDS, the follow-up is generated in the background;
+        it is restarted when the topic decision changes or the answer grows by
+        more than SPECULATION_RESTART_RATIO, and process_answer uses it when
+        the final answer still matches.
+        """
+        if not settings.SPECULATION_ENABLED or not self.interview_active or not self.openrouter.client:
+            return
+        words = _word_count(partial_answer)
+        if words < settings.SPECULATION_MIN_WORDS:
+            return
+        plan = self._plan_turn(partial_answer)
+        if plan[1] >= len(self.topics):
+            return  # последний ответ: дальше итоговый отчёт, которому нужны все оценки
+        current = self._speculation
+        if current and current["plan"] == plan and not self._changed_materially(current["words"], words):
+            return
+        if current:
+            current["task"].cancel()
+            _speculation_stats["restarted"] += 1
+        history = self.conversation_history + [
+            {"question": self.current_question_text, "answer": partial_answer, "raw_answer": partial_answer, "evaluation": None}
+        ]
+        # Дельты копятся, пока ответ не закончен; при попадании их получает клиент (_attach_speculation)
+        speculation = {"question_number": self.current_question, "plan": plan, "words": words, "deltas": [], "sink": None}
+
+        async def on_delta(delta: str):
+            speculation["deltas"].append(delta)
+            if speculation["sink"] is not None:
+                await speculation["sink"](delta)
+
+        speculation["task"] = asyncio.create_task(self.openrouter.generate_hr_interaction(
+            self.job_profile, history, self.topics[plan[1]], plan[0], on_delta=on_delta
+        ))
+        self._speculation = speculation
+        _speculation_stats["started"] += 1
+    
+    def _take_speculation(self, answer_text: str):
+        """Speculation (dict with the task) if it still fits the final answer, else None (and cancel it)"""
+        speculation, self._speculation = self._speculation, None
+        if speculation is None:
+            return None
+        if (speculation["question_number"] != self.current_question
+                or speculation["plan"] != self._plan_turn(answer_text)
+                or self._changed_materially(speculation["words"], _word_count(answer_text))):
+            speculation["task"].cancel()
+            _speculation_stats["misses"] += 1
+            return None
+        _speculation_stats["hits"] += 1
+        _speculation_stats["ready_at_turn_end"] += int(speculation["task"].done())
+        return speculation
+    
+    async def _attach_speculation(self, speculation: dict, on_delta) -> None:
+        """Stream a still-running speculative question: replay what it has generated so far, then forward live deltas"""
+        sent = 0
+        while sent < len(speculation["deltas"]):
+            # Пока отправляем накопленное, задача может дописать ещё - досылаем, пока не догоним
+            pending = "".join(speculation["deltas"][sent:])
+            sent = len(speculation["deltas"])
+            await on_delta(pending)
+        speculation["sink"] = on_delta
+    
+    def cancel_speculation(self) -> None:
+        if self._speculation:
+            self._speculation["task"].cancel()
+            self._speculation = None
+    
+    async def _review_answer(self, entry: dict):
+        """Cleanup -> evaluation for one history entry (runs alongside next-question generation)"""
+        # 1. Improve answer through OpenRouter
+        try:
+            entry["answer"] = await self.openrouter.process_text(entry["raw_answer"])
+        except Exception as e:
+            logger.error(f"Error improving answer: {e}")
+        
+        # 2. Evaluate answer
+        try:
+            entry["evaluation"] = await self.openrouter.evaluate_answer(
+                entry["question"], 
+                entry["answer"], 
+                self.job_profile
+            )
+        except Exception as e:
+            logger.error(f"Error evaluating answer: {e}")
+            entry["evaluation"] = {"score": 50, "feedback": "Не удалось оценить ответ"}
+    
+    async def _deliver_review(self, review: asyncio.Task, delivered: asyncio.Future, send, question_number: int, entry: dict):
+        try:
+            await review
+            await delivered
+            if not self.interview_active:
+                return  # итоговый отчёт уже содержит все оценки
+            await send({
+                "type": "answer_evaluated",
+                "question_number": question_number,
+                "improved_answer": entry["answer"],
+                "evaluation": entry["evaluation"]
+            })
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error sending evaluation: {e}")
+    
+    async def finish_interview(self, send=None):
+        """Finish interview and generate final feedback.
+
+        With `send` the report is streamed as "report_delta" messages; the
+        returned "interview_finished" result carries the whole text.
+        """
         self.interview_active = False
+        self.cancel_speculation()
+        if self._reviews:
+            # Отчёт строится по очищенным ответам и оценкам всех вопросов
+            await asyncio.gather(*list(self._reviews), return_exceptions=True)
         
         # Generate closing remarks
         closing_remarks = HRPrompts.CLOSING_REMARKS
@@ -201,9 +363,14 @@ class HRInterviewer:
         # Generate final feedback report
         # logger.info("Generating final feedback report...")
         try:
+            on_delta = None
+            if send is not None:
+                async def on_delta(delta: str):
+                    await send({"type": "report_delta", "delta": delta})
             final_report = await self.openrouter.generate_final_feedback(
                 self.conversation_history, 
-                self.job_profile
+                self.job_profile,
+                on_delta=on_delta
             )
             # logger.info("Final report generated")
         except Exception as e:
@@ -239,13 +406,18 @@ class HRInterviewer:
         return summary
     
     def _is_unclear_answer(self, answer: str) -> bool:
-        """Check if answer is unclear or evasive"""
+        """Check if answer is unclear or evasive.
+
+        Local and instant, so the next-question branch does not wait for
+        the LLM evaluation.
+        """
         unclear_phrases = [
             "не понял", "не поняла", "повторите", "что вы имеете в виду",
             "не знаю", "затрудняюсь ответить", "можете повторить",
             "не расслышал", "не расслышала", "простите", "извините",
-            "что", "а", "хм", "эм", "ну", "это", "да", "нет"
         ]
+        # Слова-паразиты считаются целыми словами: подстрока "а" есть почти в любом ответе
+        fillers = {"что", "а", "хм", "эм", "ну", "это", "да", "нет"}
         
         answer_lower = answer.lower().strip()
         
@@ -258,10 +430,12 @@ class HRInterviewer:
             if phrase in answer_lower:
                 return True
                 
-        # Check if answer is mostly punctuation or single words
-        words = answer_lower.split()
+        # Check if answer is mostly single words or fillers
+        words = re.findall(r"\w+", answer_lower)
         if len(words) < 3:
             return True
+        if sum(word in fillers for word in words) * 2 >= len(words):
+            return True
             
         return False
     
@@ -272,4 +446,7 @@ class HRInterviewer:
         self.interview_active = False
         self.job_profile = ""
         self.current_question_text = ""
-        self.clarification_attempts = {}
\ No newline at end of file
+        self.clarification_attempts = {}
+        for review in list(self._reviews):
+            review.cancel()
+        self.cancel_speculation()
\ No newline at end of file
@@ -0,0 +1,105 @@
+import logging
+from typing import Dict, Optional
+
+from openai import DEFAULT_CONNECTION_LIMITS, APIStatusError, AsyncOpenAI, DefaultAsyncHttpxClient, Timeout
+
+from . import settings
+from .llm_guard import LLMGuard
+
+try:
+    import h2  # noqa: F401  # HTTP/2 для httpx (pip install httpx[http2])
+except Exception:
+    h2 = None
+
+logger = logging.getLogger(__name__)
+
+# Limits/Timeout должны быть из той же HTTP-библиотеки, на которой собран SDK
+Limits = type(DEFAULT_CONNECTION_LIMITS)
+
+# Один async-клиент на процесс: интервью (OpenRouterProcessor) и анализ резюме
+# (resume_analysis получает его через init_llm_client) делят пул соединений
+_client: Optional[AsyncOpenAI] = None
+_guard: Optional[LLMGuard] = None
+
+
+def get_llm_client() -> Optional[AsyncOpenAI]:
+    """Process-wide AsyncOpenAI with a bounded keep-alive pool; None without an API key"""
+    global _client
+    api_key = settings.OPENROUTER_API_KEY
+    if _client is None and api_key and api_key != "your_openrouter_api_key_here":
+        http2 = settings.LLM_HTTP2 and h2 is not None
+        http_client = DefaultAsyncHttpxClient(
+            limits=Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_KEEPALIVE,
+                keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY,
+            ),
+            timeout=Timeout(settings.LLM_TIMEOUTS["default"], connect=settings.LLM_CONNECT_TIMEOUT),
+            http2=http2,
+        )
+        # Повторы делает LLMGuard (общие лимиты, Retry-After, circuit breaker), не SDK
+        _client = AsyncOpenAI(base_url=settings.OPENROUTER_BASE_URL, api_key=api_key,
+                              http_client=http_client, max_retries=0)
+        logger.info(f"LLM client created (max {settings.LLM_MAX_CONNECTIONS} connections, http2={http2})")
+    return _client
+
+
+def get_llm_guard() -> LLMGuard:
+    """Process-wide rate limiter, retry policy and circuit breaker for LLM calls"""
+    global _guard
+    if _guard is None:
+        _guard = LLMGuard(
+            requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+            tokens_per_minute=settings.LLM_TOKENS_PER_MINUTE,
+            max_attempts=settings.LLM_RETRY_ATTEMPTS,
+            base_delay=settings.LLM_RETRY_BASE_DELAY,
+            max_delay=settings.LLM_RETRY_MAX_DELAY,
+            failure_threshold=settings.LLM_BREAKER_FAILURES,
+            reset_seconds=settings.LLM_BREAKER_RESET_SECONDS,
+        )
+    return _guard
+
+
+def llm_timeout(kind: str) -> float:
+    """Per-call timeout in seconds (LLM_TIMEOUTS), e.g. short for a question, long for a report"""
+    return settings.LLM_TIMEOUTS.get(kind, settings.LLM_TIMEOUTS["default"])
+
+
+async def preconnect() -> bool:
+    """Open (and keep alive) the connection to the LLM API before the first request needs it"""
+    client = get_llm_client()
+    if client is None:
+        return False
+    try:
+        await client.with_options(timeout=settings.LLM_PRECONNECT_TIMEOUT, max_retries=0).models.list()
+    except APIStatusError:
+        pass  # ответ получен - соединение установлено
+    except Exception as e:
+        logger.warning(f"LLM pre-connect failed: {e}")
+        return False
+    return True
+
+
+async def close_llm_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+def llm_client_stats() -> Dict:
+    """Connection pool state: stays flat as sessions grow, since every caller shares it"""
+    if _client is None:
+        return {"enabled": False}
+    stats = {
+        "enabled": True,
+        "guard": get_llm_guard().stats(),
+        "max_connections": settings.LLM_MAX_CONNECTIONS,
+        "http2": settings.LLM_HTTP2 and h2 is not None,
+    }
+    pool = getattr(getattr(_client._client, "_transport", None), "_pool", None)
+    connections = getattr(pool, "connections", None)
+    if connections is not None:
+        stats["connections"] = len(connections)
+        stats["idle_connections"] = sum(1 for c in connections if c.is_idle())
+    return stats
@@ -0,0 +1,288 @@
+import asyncio
+import email.utils
+import logging
+import random
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from openai import APIConnectionError, APIStatusError, APITimeoutError, RateLimitError
+
+logger = logging.getLogger(__name__)
+
+
+class LLMUnavailable(RuntimeError):
+    """The circuit breaker is open: the LLM provider keeps failing, calls are shed"""
+
+
+class TokenBucket:
+    """Refills `per_minute` units per minute up to `burst`.
+
+    acquire() reserves immediately and returns how long the caller must
+    wait for its share; the balance may go negative, so concurrent callers
+    queue up in arrival order instead of racing for each refill.
+    """
+
+    def __init__(self, per_minute: float, burst: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = float(burst or per_minute)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        now = time.monotonic()
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+        return max(0.0, -self.level / self.rate)
+
+    def refund(self, amount: float) -> None:
+        self._refill(time.monotonic())
+        self.level = min(self.capacity, self.level + amount)
+
+
+class RateLimiter:
+    """Requests/min and tokens/min shared by every LLM call of the process (0 = no limit)"""
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.paused_until = 0.0
+
+    async def acquire(self, tokens: int = 0) -> float:
+        """Wait for a request slot and `tokens` of budget; returns the seconds waited"""
+        delay = max(0.0, self.paused_until - time.monotonic())
+        if self.requests:
+            delay = max(delay, self.requests.reserve(1))
+        if self.tokens and tokens:
+            delay = max(delay, self.tokens.reserve(tokens))
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                self.release(tokens)
+                raise
+        return delay
+
+    def release(self, tokens: int = 0) -> None:
+        """Give back a reservation that was never sent"""
+        if self.requests:
+            self.requests.refund(1)
+        if self.tokens and tokens:
+            self.tokens.refund(tokens)
+
+    def settle(self, estimated: int, used: int) -> None:
+        """Correct the token budget once the response reports actual usage"""
+        if self.tokens and used:
+            self.tokens.refund(estimated - used)
+
+    def pause(self, seconds: float) -> None:
+        """Hold every caller back, e.g. for the Retry-After of a 429"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class CircuitBreaker:
+    """closed -> open after `failure_threshold` consecutive failures (0 = never);
+    open -> half-open after `reset_seconds`, when one probe call is let through;
+    the probe's success closes the circuit, its failure opens it again."""
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_at = 0.0
+        self.opened = 0
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        now = time.monotonic()
+        if self.state == "open" and now - self.opened_at < self.reset_seconds:
+            return False
+        # Одна пробная попытка; если она зависла или отменена - следующая через reset_seconds
+        if self.state == "half_open" and now - self.probe_at < self.reset_seconds:
+            return False
+        self.state = "half_open"
+        self.probe_at = now
+        return True
+
+    def retry_in(self) -> float:
+        if self.state == "closed":
+            return 0.0
+        since = self.probe_at if self.state == "half_open" else self.opened_at
+        return max(0.0, self.reset_seconds - (time.monotonic() - since))
+
+    def record_success(self) -> None:
+        if self.state != "closed":
+            logger.info("LLM circuit closed: provider is answering again")
+        self.state = "closed"
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failure_threshold <= 0:
+            return
+        if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+            if self.state == "closed":
+                logger.warning(f"LLM circuit open after {self.failures} consecutive failures, "
+                               f"shedding calls for {self.reset_seconds:.0f} s")
+                self.opened += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds from the Retry-After (or retry-after-ms) header of an API error"""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _error_kind(error: Exception) -> Optional[str]:
+    """Counter name of a retryable error, None for errors a retry will not fix"""
+    if isinstance(error, RateLimitError):
+        return "rate_limited"
+    if isinstance(error, APITimeoutError):
+        return "timeouts"
+    if isinstance(error, APIConnectionError):
+        return "connection_errors"
+    if isinstance(error, APIStatusError) and (error.status_code >= 500 or error.status_code in (408, 409)):
+        return "server_errors"
+    return None
+
+
+def estimate_tokens(messages: List[Dict], max_tokens: int = 0) -> int:
+    """Rough prompt + completion size for the tokens/min budget (~3 chars per token)"""
+    return sum(len(m.get("content") or "") for m in messages) // 3 + max_tokens
+
+
+class LLMGuard:
+    """Client-side protection wrapped around every LLM call of the process:
+    a shared rate limiter, retries with exponential jittered backoff that
+    honour Retry-After, and a circuit breaker. Counters are kept per endpoint.
+
+    `Unavailable` and `estimate_tokens` are exposed on the guard so callers
+    that get it injected (resume_analysis) classify sheds and charge the
+    tokens/min budget the same way as the interview side."""
+
+    Unavailable = LLMUnavailable
+    estimate_tokens = staticmethod(estimate_tokens)
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0, max_attempts: int = 3,
+                 base_delay: float = 0.5, max_delay: float = 20.0,
+                 failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.breaker = CircuitBreaker(failure_threshold, reset_seconds)
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._endpoints: Dict[str, Dict] = {}
+
+    def _counters(self, endpoint: str) -> Dict:
+        counters = self._endpoints.get(endpoint)
+        if counters is None:
+            counters = self._endpoints[endpoint] = {
+                "calls": 0, "attempts": 0, "succeeded": 0, "failed": 0, "shed": 0, "retries": 0,
+                "rate_limited": 0, "server_errors": 0, "timeouts": 0, "connection_errors": 0,
+                "tokens": 0, "throttled_seconds": 0.0, "backoff_seconds": 0.0, "latency_seconds": 0.0,
+            }
+        return counters
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        if retry_after is not None:
+            # Сервер назвал срок; небольшой разброс, чтобы ожидающие не вернулись разом
+            return retry_after + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def retry_in(self) -> float:
+        """Seconds until calls are let through again (0 while the circuit is closed)"""
+        return self.breaker.retry_in()
+
+    async def call(self, endpoint: str, request: Callable[[], Awaitable], tokens: int = 0):
+        """Run `request` (a fresh API call per attempt) under the limiter, retries and breaker.
+
+        Raises LLMUnavailable while the circuit is open, otherwise the last
+        error once attempts are exhausted or the error is not retryable.
+        """
+        counters = self._counters(endpoint)
+        counters["calls"] += 1
+        for attempt in range(1, self.max_attempts + 1):
+            if not self.breaker.allow():
+                counters["shed"] += 1
+                raise LLMUnavailable(f"LLM provider unavailable, retry in {self.breaker.retry_in():.0f} s")
+            counters["throttled_seconds"] += await self.limiter.acquire(tokens)
+            counters["attempts"] += 1
+            started = time.perf_counter()
+            try:
+                result = await request()
+            except Exception as e:
+                counters["latency_seconds"] += time.perf_counter() - started
+                kind = _error_kind(e)
+                if kind is None:
+                    if isinstance(e, APIStatusError):
+                        self.breaker.record_success()  # провайдер ответил, дело в запросе
+                    counters["failed"] += 1
+                    raise
+                counters[kind] += 1
+                retry_after = _retry_after(e)
+                if kind == "rate_limited":
+                    # 429 - не поломка провайдера: притормаживаем всех, а не размыкаем цепь
+                    self.limiter.pause(retry_after if retry_after is not None else self.base_delay)
+                else:
+                    self.breaker.record_failure()
+                delay = self._backoff(attempt, retry_after)
+                if attempt == self.max_attempts or delay > self.max_delay:
+                    counters["failed"] += 1
+                    raise
+                counters["retries"] += 1
+                counters["backoff_seconds"] += delay
+                logger.warning(f"LLM {endpoint} attempt {attempt} failed ({kind}: {e}), retrying in {delay:.1f} s")
+                await asyncio.sleep(delay)
+                continue
+            counters["latency_seconds"] += time.perf_counter() - started
+            self.breaker.record_success()
+            counters["succeeded"] += 1
+            usage = getattr(result, "usage", None)
+            used = getattr(usage, "total_tokens", 0) or 0
+            counters["tokens"] += used or tokens
+            self.limiter.settle(tokens, used)
+            return result
+
+    def stats(self) -> Dict:
+        endpoints = {}
+        for name, counters in self._endpoints.items():
+            stats = {k: round(v, 3) if isinstance(v, float) else v for k, v in counters.items()}
+            stats["avg_latency_ms"] = (
+                round(counters["latency_seconds"] / counters["attempts"] * 1000, 1) if counters["attempts"] else None
+            )
+            endpoints[name] = stats
+        return {
+            "requests_per_minute": self.requests_per_minute or None,
+            "tokens_per_minute": self.tokens_per_minute or None,
+            "max_attempts": self.max_attempts,
+            "circuit": {
+                "state": self.breaker.state,
+                "consecutive_failures": self.breaker.failures,
+                "times_opened": self.breaker.opened,
+                "retry_in": round(self.breaker.retry_in(), 1),
+            },
+            "endpoints": endpoints,
+        }
@@ -1,25 +1,56 @@
 import asyncio
 import logging
-from openai import AsyncOpenAI
 from . import settings
 from .hr_prompts import HRPrompts
+from .llm_client import get_llm_client, get_llm_guard, llm_timeout
+from .llm_guard import estimate_tokens
 
 logger = logging.getLogger(__name__)
 
 class OpenRouterProcessor:
     def __init__(self):
         self.api_key = settings.OPENROUTER_API_KEY
-        if self.api_key and self.api_key != "your_openrouter_api_key_here":
-            self.client = AsyncOpenAI(
-                base_url="https://openrouter.ai/api/v1",
-                api_key=self.api_key,
-            )
+        # Общий клиент процесса: сессии не заводят свои пулы соединений
+        self.client = get_llm_client()
+        self.guard = get_llm_guard()
+        if self.client:
             self.model = settings.OPENROUTER_MODEL
             logger.info("OpenRouter initialized")
         else:
-            self.client = None
             logger.warning("OpenRouter API key not configured, using fallback mode")
     
+    async def _complete(self, messages: list, max_tokens: int, temperature: float, kind: str, on_delta=None) -> str:
+        """Chat completion text with the per-call timeout of `kind`; with on_delta
+        (async callable) the completion is streamed and every content delta is
+        passed on as it arrives. Calls go through the shared LLMGuard (rate
+        limits, retries, circuit breaker) under the endpoint name `kind`;
+        a stream is retried only until it has been opened."""
+        stream = on_delta is not None and settings.LLM_STREAMING
+        
+        def request():
+            return self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                stream=stream,
+                timeout=llm_timeout(kind)
+            )
+        
+        response = await self.guard.call(kind, request, tokens=estimate_tokens(messages, max_tokens))
+        if not stream:
+            return response.choices[0].message.content.strip()
+        
+        parts = []
+        async for chunk in response:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                await on_delta(delta)
+        return "".join(parts).strip()
+    
     async def process_text(self, text: str) -> str:
         """Process text through OpenRouter API"""
         if not text or not text.strip():
@@ -32,16 +63,9 @@ class OpenRouterProcessor:
         try:
             prompt = settings.OPENROUTER_PROMPT.format(text=text)
             
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=1000,
-                temperature=0.3
+            improved_text = await self._complete(
+                [{"role": "user", "content": prompt}], max_tokens=1000, temperature=0.3, kind="cleanup"
             )
-            
-            improved_text = response.choices[0].message.content.strip()
             # logger.info(f"OpenRouter processed text: {len(text)} -> {len(improved_text)} chars")
             return improved_text
             
@@ -69,24 +93,16 @@ class OpenRouterProcessor:
 
 Ответь только текстом вопроса без дополнительных комментариев."""
 
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=200,
-                temperature=0.7
+            return await self._complete(
+                [{"role": "user", "content": prompt}], max_tokens=200, temperature=0.7, kind="question"
             )
             
-            question = response.choices[0].message.content.strip()
-            return question
-            
         except Exception as e:
             logger.error(f"OpenRouter question generation error: {e}")
             return HRPrompts.get_fallback_question(question_number)
     
-    async def generate_hr_interaction(self, job_profile: str, conversation_history: list, current_topic: str = None, is_clarification: bool = False) -> str:
-        """Generate HR interaction based on conversation history"""
+    async def generate_hr_interaction(self, job_profile: str, conversation_history: list, current_topic: str = None, is_clarification: bool = False, on_delta=None) -> str:
+        """Generate HR interaction based on conversation history (streamed to on_delta if given)"""
         if not self.client:
             return "Следующий вопрос будет сгенерирован"
         
@@ -122,14 +138,7 @@ class OpenRouterProcessor:
                 {"role": "user", "content": HRPrompts.HR_INTERACTION_USER.format(context=context)}
             ]
             
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                max_tokens=150,
-                temperature=0.8
-            )
-            
-            return response.choices[0].message.content.strip()
+            return await self._complete(messages, max_tokens=150, temperature=0.8, kind="question", on_delta=on_delta)
             
         except Exception as e:
             logger.error(f"OpenRouter HR interaction error: {e}")
@@ -152,14 +161,7 @@ class OpenRouterProcessor:
                 {"role": "user", "content": user_prompt}
             ]
             
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                max_tokens=120,
-                temperature=0.2
-            )
-            
-            response_text = response.choices[0].message.content.strip()
+            response_text = await self._complete(messages, max_tokens=120, temperature=0.2, kind="evaluation")
             try:
                 json_part = response_text[response_text.find('{'):response_text.rfind('}')+1]
                 import json
@@ -171,8 +173,8 @@ class OpenRouterProcessor:
             logger.error(f"OpenRouter evaluation error: {e}")
             return {"score": 0, "feedback": "Не удалось обработать оценку"}
 
-    async def generate_final_feedback(self, conversation_history: list, job_profile: str) -> str:
-        """Generate final interview feedback"""
+    async def generate_final_feedback(self, conversation_history: list, job_profile: str, on_delta=None) -> str:
+        """Generate final interview feedback (streamed to on_delta if given)"""
         if not self.client:
             return "Итоговый отчет недоступен"
         
@@ -198,14 +200,7 @@ class OpenRouterProcessor:
                 {"role": "user", "content": user_prompt}
             ]
             
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                max_tokens=600,
-                temperature=0.4
-            )
-            
-            return response.choices[0].message.content.strip()
+            return await self._complete(messages, max_tokens=600, temperature=0.4, kind="report", on_delta=on_delta)
             
         except Exception as e:
             logger.error(f"OpenRouter final feedback error: {e}")
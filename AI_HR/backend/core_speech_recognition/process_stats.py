@@ -0,0 +1,59 @@
+import os
+import resource
+import time
+from typing import Dict, Optional, Union
+
+_IMPORTED_AT = time.time()
+
+
+def process_uptime() -> float:
+    """Seconds since this process started (from /proc; falls back to module import time)"""
+    try:
+        with open("/proc/self/stat") as f:
+            # Поле 22 - время старта в тиках с загрузки системы; имя процесса может содержать пробелы
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return time.time() - _IMPORTED_AT
+
+
+def memory_usage(pid: Union[int, str] = "self") -> Optional[Dict]:
+    """RSS of a process in MB, split into private (anon) and file-backed/shared pages.
+
+    Pages inherited through fork and not written since are counted in every
+    process's RSS, but physically exist once; on Linux `shared_mb` of the
+    workers shows how much of the model they actually share.
+    """
+    fields = _read_kb_fields(f"/proc/{pid}/status", ("VmRSS", "RssAnon", "VmHWM"))
+    if not fields:
+        if pid != "self":
+            return None
+        return {"pid": os.getpid(), "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+    usage = {
+        "pid": os.getpid() if pid == "self" else int(pid),
+        "rss_mb": round(fields.get("VmRSS", 0.0), 1),
+        "max_rss_mb": round(fields.get("VmHWM", 0.0), 1),
+        "private_mb": round(fields.get("RssAnon", 0.0), 1),
+    }
+    rollup = _read_kb_fields(f"/proc/{pid}/smaps_rollup", ("Pss", "Shared_Clean", "Shared_Dirty"))
+    if "Pss" in rollup:
+        # Pss делит общие страницы между процессами - честная доля этого воркера
+        usage["pss_mb"] = round(rollup["Pss"], 1)
+        usage["shared_mb"] = round(rollup.get("Shared_Clean", 0.0) + rollup.get("Shared_Dirty", 0.0), 1)
+    return usage
+
+
+def _read_kb_fields(path: str, keys) -> Dict[str, float]:
+    """'Key:   123 kB' lines of a /proc file -> {key: MB}"""
+    fields = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in keys:
+                    fields[key] = int(value.split()[0]) / 1024
+    except (OSError, ValueError):
+        pass
+    return fields
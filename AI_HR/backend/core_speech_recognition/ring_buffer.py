@@ -0,0 +1,154 @@
+import numpy as np
+
+
+class PCMRingBuffer:
+    """Fixed-size int16 ring buffer for one producer and one consumer.
+
+    The producer (the ffmpeg reader task, or feed_audio for pcm16/opus
+    frames) copies each chunk in with at most two slice assignments and
+    then publishes it by bumping the absolute write counter; the consumer
+    (processing coroutine or decoder worker process) only moves its own
+    read counter. Neither side takes a lock: each counter has a single
+    writer, and data is published only after it is in place.
+
+    Views returned by `peek`/`latest` point into the buffer and stay valid
+    until the producer laps them (capacity samples later).
+
+    With `buffer` (e.g. SharedMemory.buf of `nbytes(capacity)` bytes) the
+    counters live in the buffer header, so producer and consumer may be in
+    different processes.
+    """
+
+    HEADER_BYTES = 24  # три int64: write, read и dropped счётчики
+
+    def __init__(self, capacity: int, dtype=np.int16, buffer=None):
+        self.capacity = int(capacity)
+        if buffer is None:
+            buffer = bytearray(self.nbytes(self.capacity, dtype))
+        # [written (producer), read (consumer), dropped (consumer): перезаписаны до чтения или пропущены]
+        self._pos = np.ndarray(3, dtype=np.int64, buffer=buffer)
+        self._data = np.ndarray(self.capacity, dtype=dtype, buffer=buffer, offset=self.HEADER_BYTES)
+
+    @classmethod
+    def nbytes(cls, capacity: int, dtype=np.int16) -> int:
+        return cls.HEADER_BYTES + int(capacity) * np.dtype(dtype).itemsize
+
+    @property
+    def _written(self) -> int:
+        return int(self._pos[0])
+
+    @_written.setter
+    def _written(self, value: int) -> None:
+        self._pos[0] = value
+
+    @property
+    def _read(self) -> int:
+        return int(self._pos[1])
+
+    @_read.setter
+    def _read(self, value: int) -> None:
+        self._pos[1] = value
+
+    @property
+    def dropped(self) -> int:
+        return int(self._pos[2])
+
+    @dropped.setter
+    def dropped(self, value: int) -> None:
+        self._pos[2] = value
+
+    # producer side
+
+    def write(self, chunk) -> int:
+        """Append samples (bytes or array); if the chunk exceeds capacity only its tail is kept."""
+        samples = np.frombuffer(chunk, dtype=self._data.dtype) if isinstance(chunk, (bytes, bytearray, memoryview)) else chunk
+        n = len(samples)
+        if n == 0:
+            return 0
+        if n > self.capacity:
+            samples = samples[-self.capacity:]
+        m = len(samples)
+        start = (self._written + n - m) % self.capacity
+        first = min(m, self.capacity - start)
+        self._data[start:start + first] = samples[:first]
+        if first < m:
+            self._data[:m - first] = samples[first:]
+        self._written += n
+        return n
+
+    # consumer side
+
+    @property
+    def samples_written(self) -> int:
+        return self._written
+
+    def available(self) -> int:
+        """Unread samples (lapped ones are skipped and counted in `dropped`)."""
+        written = self._written
+        if written - self._read > self.capacity:
+            self.dropped += written - self._read - self.capacity
+            self._read = written - self.capacity
+        return written - self._read
+
+    def peek(self, max_samples: int = 0):
+        """Oldest unread samples as one or two zero-copy views, without consuming them."""
+        n = self.available()
+        if max_samples:
+            n = min(n, max_samples)
+        return self._views(self._read, n)
+
+    def consume(self, n: int) -> None:
+        self._read += min(n, self.available())
+
+    def skip(self, n: int) -> None:
+        """Consume without reading, counted as dropped (catch-up after falling behind)."""
+        n = min(n, self.available())
+        self._read += n
+        self.dropped += n
+
+    def pending(self) -> int:
+        """Unread samples still held; read-only, safe to call from the producer side."""
+        return min(self._written - self._read, self.capacity)
+
+    def read(self, max_samples: int = 0) -> np.ndarray:
+        """Consume unread samples; a view when contiguous, a copy only across the wrap point."""
+        views = self.peek(max_samples)
+        n = sum(len(v) for v in views)
+        start = self._read
+        if len(views) == 1:
+            out = views[0]
+        elif views:
+            out = np.concatenate(views)
+        else:
+            out = self._data[:0]
+        self._read = start + n
+        if self._written - start > self.capacity:
+            # Producer lapped the region while it was read; the samples are not trustworthy
+            self.dropped += n
+            return self._data[:0]
+        return out
+
+    def latest(self, n: int):
+        """Last n written samples as one or two zero-copy views (regardless of the read position)."""
+        n = min(n, self._written, self.capacity)
+        return self._views(self._written - n, n)
+
+    def clear(self) -> None:
+        """Mark everything written so far as consumed."""
+        self._read = self._written
+
+    def release(self) -> None:
+        """Drop the array views so an external buffer (shared memory) can be closed."""
+        self._pos = self._data = None
+
+    def __len__(self) -> int:
+        return min(self._written, self.capacity)
+
+    def _views(self, start: int, n: int):
+        if n <= 0:
+            return ()
+        pos = start % self.capacity
+        first = min(n, self.capacity - pos)
+        if first == n:
+            return (self._data[pos:pos + n],)
+        return (self._data[pos:], self._data[:n - first])
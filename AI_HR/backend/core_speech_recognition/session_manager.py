@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import Dict, Optional
+
+import vosk
+
+from . import settings
+from .decoder_pool import DecoderPool
+from .process_stats import memory_usage, process_uptime
+from .stream_decoder import warm_up
+from .vosk_handler import VoskHandler
+
+logger = logging.getLogger(__name__)
+
+
+class SessionLimitReached(RuntimeError):
+    """All session slots are taken"""
+
+
+class SessionManager:
+    """Per-WebSocket STT/interview sessions on top of one shared vosk.Model.
+
+    Each connection gets its own VoskHandler (ffmpeg pipe, PCM buffer,
+    recognizer, HRInterviewer, timers); only the model is shared. A session
+    whose interview is still running is kept detached for `resume_ttl`
+    seconds after the socket closes, so the client can reconnect with
+    ?session_id=... and continue the same interview.
+
+    With decoder_workers > 0 the model is loaded by DecoderPool worker
+    processes instead and sessions decode there.
+
+    The model is loaded in the background (`start_loading`): the server
+    accepts requests at once and `state` goes loading -> ready | failed.
+    `preload` loads it synchronously before workers are forked.
+    """
+
+    def __init__(self, model_path: str = settings.MODEL_PATH, max_sessions: int = settings.MAX_SESSIONS,
+                 resume_ttl: float = settings.SESSION_RESUME_TTL, decoder_workers: int = settings.DECODER_WORKERS):
+        self.model_path = model_path
+        self.max_sessions = max_sessions
+        self.resume_ttl = resume_ttl
+        self.vosk_model = None
+        self.decoder_pool = DecoderPool(model_path, decoder_workers) if decoder_workers > 0 else None
+        self._active: Dict[str, VoskHandler] = {}
+        self._detached: Dict[str, tuple] = {}  # session_id -> (handler, detached_at)
+        self.total_created = 0
+        self.total_rejected = 0
+        self.state = "idle"  # idle -> loading -> ready | failed
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self.warmup_seconds: Optional[float] = None
+        self.cold_start_seconds: Optional[float] = None
+        self.preloaded = False
+        self._load_task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        # С пулом декодеров готовность пропадает, если не осталось живых воркеров
+        return self.state == "ready" and self.is_model_loaded()
+
+    def preload(self) -> bool:
+        """Load the model now, in the importing process (before fork), so workers inherit it"""
+        if not os.path.exists(self.model_path):
+            logger.error(f"Model not found: {self.model_path}")
+            return False
+        started = time.perf_counter()
+        if self.decoder_pool:
+            self.decoder_pool.preload()
+        else:
+            self.vosk_model = vosk.Model(self.model_path)
+        self.load_seconds = round(time.perf_counter() - started, 3)
+        self.preloaded = True
+        logger.info(f"Vosk model preloaded in {self.load_seconds}s (pid {os.getpid()})")
+        return True
+
+    def start_loading(self) -> asyncio.Task:
+        """Load and warm up the model in the background; returns the loading task"""
+        if self._load_task is None:
+            self.state = "loading"
+            self._load_task = asyncio.create_task(self._load())
+        return self._load_task
+
+    async def initialize(self) -> bool:
+        """Load and wait until ready"""
+        await self.start_loading()
+        return self.ready
+
+    async def _load(self) -> None:
+        try:
+            if not os.path.exists(self.model_path):
+                raise FileNotFoundError(f"Model not found: {self.model_path}")
+            if self.decoder_pool:
+                # Воркеры сами загружают (или наследуют) модель и прогревают её перед "ready"
+                self.decoder_pool.start()
+                while not self.decoder_pool.stats()["ready"]:
+                    if self.decoder_pool.failed():
+                        raise RuntimeError("All decoder workers exited before becoming ready")
+                    await asyncio.sleep(0.1)
+            else:
+                if self.vosk_model is None:
+                    started = time.perf_counter()
+                    self.vosk_model = await asyncio.to_thread(vosk.Model, self.model_path)
+                    self.load_seconds = round(time.perf_counter() - started, 3)
+                self.warmup_seconds = round(await asyncio.to_thread(warm_up, self.vosk_model), 3)
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            logger.error(f"Failed to initialize Vosk STT: {e}")
+            return
+        self.state = "ready"
+        self.cold_start_seconds = round(process_uptime(), 3)
+        memory = memory_usage() or {}
+        logger.info(f"Vosk STT ready {self.cold_start_seconds}s after process start "
+                    f"(load {self.load_seconds}s, warm-up {self.warmup_seconds}s, "
+                    f"RSS {memory.get('rss_mb')} MB, shared {memory.get('shared_mb')} MB, pid {os.getpid()})")
+
+    def readiness(self) -> Dict:
+        return {
+            "state": self.state,
+            "ready": self.ready,
+            "error": self.error,
+            "preloaded": self.preloaded,
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "cold_start_seconds": self.cold_start_seconds,
+        }
+
+    def shutdown(self) -> None:
+        if self._load_task and not self._load_task.done():
+            self._load_task.cancel()
+        if self.decoder_pool:
+            self.decoder_pool.stop()
+
+    def is_model_loaded(self) -> bool:
+        if self.decoder_pool:
+            return self.decoder_pool.stats()["ready"] > 0
+        return self.vosk_model is not None
+
+    def open_session(self, session_id: Optional[str] = None) -> VoskHandler:
+        """Attach a new session, or resume a detached one by id.
+
+        Raises SessionLimitReached when max_sessions sessions are attached.
+        """
+        self._expire_detached()
+        if self.max_sessions and len(self._active) >= self.max_sessions:
+            self.total_rejected += 1
+            raise SessionLimitReached(f"Session limit reached ({self.max_sessions})")
+        if session_id and session_id in self._detached:
+            handler, _ = self._detached.pop(session_id)
+            logger.info(f"Session {session_id} resumed")
+        else:
+            decoder = self.decoder_pool.open_stream() if self.decoder_pool else None
+            handler = VoskHandler(self.model_path, vosk_model=self.vosk_model, decoder=decoder)
+            handler.session_id = uuid.uuid4().hex[:16]
+            self.total_created += 1
+            logger.info(f"Session {handler.session_id} opened ({len(self._active) + 1}/{self.max_sessions or '∞'})")
+        self._active[handler.session_id] = handler
+        return handler
+
+    def close_session(self, handler: VoskHandler) -> None:
+        """Detach a session after its socket closed; keep it only while the interview can be resumed."""
+        self._active.pop(handler.session_id, None)
+        handler.session_active = False
+        handler.stop_ffmpeg_stream()
+        if handler.hr_interviewer.interview_active and self.resume_ttl > 0:
+            handler.segments = []
+            handler.accumulated = ""
+            self._detached[handler.session_id] = (handler, time.time())
+            logger.info(f"Session {handler.session_id} detached, interview kept for {self.resume_ttl:.0f}s")
+        else:
+            self._dispose(handler)
+            logger.info(f"Session {handler.session_id} closed")
+
+    def stats(self) -> Dict:
+        self._expire_detached()
+        return {
+            "active": len(self._active),
+            "detached": len(self._detached),
+            "max_sessions": self.max_sessions,
+            "total_created": self.total_created,
+            "total_rejected": self.total_rejected,
+            "decoder_pool": self.decoder_pool.stats() if self.decoder_pool else None,
+        }
+
+    def session_stats(self) -> Dict[str, Dict]:
+        return {session_id: handler.audio_stats() for session_id, handler in self._active.items()}
+
+    def _expire_detached(self) -> None:
+        deadline = time.time() - self.resume_ttl
+        for session_id, (handler, detached_at) in list(self._detached.items()):
+            if detached_at < deadline:
+                del self._detached[session_id]
+                self._dispose(handler)
+
+    def _dispose(self, handler: VoskHandler) -> None:
+        handler.hr_interviewer.cancel_speculation()
+        handler.reset_session()
+        if handler.decoder:
+            handler.decoder.close()
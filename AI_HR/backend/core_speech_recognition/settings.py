@@ -7,19 +7,51 @@ load_dotenv()
 # Audio Settings
 SAMPLE_RATE = 16000  # Hz - частота дискретизации
 CHUNK_DURATION = 3.0  # секунд - интервал обработки
+DECODE_INTERVAL = 0.1  # секунд - как часто новое аудио подаётся в распознаватель
+PARTIAL_INTERVAL = 0.3  # секунд - минимальный интервал между промежуточными (partial) результатами
 BUFFER_DURATION = 30  # секунд - размер буфера
-PCM_CHUNK_SIZE = 1024  # байт - размер чанка PCM
+PCM_CHUNK_SIZE = 4096  # байт - максимальный размер чтения PCM из ffmpeg
+FFMPEG_INPUT_QUEUE = int(os.getenv("FFMPEG_INPUT_QUEUE", "64"))  # чанков WebM в очереди на запись в ffmpeg
+FFMPEG_WRITE_TIMEOUT = 2.0  # секунд ожидания места в очереди, затем чанк отбрасывается
+MAX_DECODER_LAG = float(os.getenv("MAX_DECODER_LAG", "3.0"))  # секунд неразобранного аудио, после которых декодер догоняет поток (0 = никогда)
+CATCHUP_KEEP = 0.5  # секунд самого свежего аудио, оставляемых при догоне
 
 # Audio Processing
 AUDIO_AMPLIFICATION_THRESHOLD = 16000  # усиление слабого сигнала до этого уровня
-MAX_OVERLAP_WORDS = 5  # максимум слов для дедупликации
+AGC_ENABLED = os.getenv("AGC_ENABLED", "true").lower() == "true"  # автоматическая регулировка усиления перед распознаванием
+AGC_MAX_GAIN = 20.0  # максимальное усиление (тихий шум не раздувается до уровня речи)
+AGC_ATTACK_MS = 10.0  # мс - как быстро оценка пика растёт на громком звуке
+AGC_RELEASE_MS = 2000.0  # мс - как медленно оценка пика спадает в тишине
+DC_REMOVAL_MS = 1000.0  # мс - постоянная времени оценки постоянной составляющей (0 = не убирать)
 SILENCE_THRESHOLD = 6.0  # секунд тишины для автоматической обработки ответа
 PROCESSING_INTERVAL = 1.0  # секунд - интервал отправки результатов
 SILENCE_TIMEOUT = 3.0  # секунд - таймаут молчания для финализации
 
+# Voice Activity Detection (кадры без речи не подаются в распознаватель)
+VAD_ENABLED = os.getenv("VAD_ENABLED", "true").lower() == "true"
+VAD_FRAME_MS = 20  # мс - длина кадра анализа
+VAD_HANGOVER_MS = 300  # мс - сколько продолжаем подавать аудио после последнего речевого кадра (конец фразы)
+VAD_PREROLL_MS = 200  # мс - аудио перед началом речи, подаваемое вместе с фразой
+VAD_MIN_RMS = 100.0  # минимальный RMS речи (int16), ниже - всегда тишина
+VAD_NOISE_RATIO = 3.0  # речь - кадр громче оценки шума во столько раз
+VAD_ZCR_MAX = 0.25  # доля пересечений нуля, выше которой тихий кадр считается шумом
+VAD_END_OF_TURN = float(os.getenv("VAD_END_OF_TURN", "4.0"))  # секунд без речи (по VAD) до автоматической обработки ответа
+
 # Model Settings
 MODEL_PATH = os.getenv("MODEL_PATH", "./models/vosk-model-ru-0.10")  # путь к модели Vosk
 
+PRELOAD_MODEL = os.getenv("PRELOAD_MODEL", "false").lower() == "true"  # загрузить модель при импорте main (gunicorn --preload: воркеры делят страницы модели)
+WARMUP_SECONDS = 1.0  # секунд синтетического аудио для прогрева распознавателя после загрузки
+LLM_PRECONNECT_TIMEOUT = 5.0  # секунд на установку соединения с OpenRouter при старте
+
+# Session Settings
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "32"))  # одновременных WebSocket-сессий на процесс (0 = без лимита)
+SESSION_RESUME_TTL = float(os.getenv("SESSION_RESUME_TTL", "300"))  # секунд хранения незавершённого интервью после разрыва соединения
+DECODER_WORKERS = int(os.getenv("DECODER_WORKERS", "0"))  # процессов-декодеров, каждый со своей копией модели (0 = декодирование в основном процессе)
+DECODER_POLL_INTERVAL = 0.01  # секунд - пауза воркера, когда нового аудио нет
+DECODER_FLUSH_TIMEOUT = 5.0  # секунд ожидания финального результата от воркера
+DECODER_HEALTH_INTERVAL = 1.0  # секунд между проверками, живы ли воркеры-декодеры
+
 # Server Settings
 HOST = os.getenv("HOST", "0.0.0.0")
 PORT = int(os.getenv("PORT", "8007"))
@@ -38,6 +70,24 @@ FFMPEG_ARGS = [
     'pipe:1'
 ]
 
+# Файлы целиком (пакетная расшифровка записей): контейнер определяет сам ffmpeg
+FFMPEG_FILE_ARGS = [
+    'ffmpeg',
+    '-nostdin',
+    '-v', 'error',
+    '-i', 'pipe:0',
+    '-ar', str(SAMPLE_RATE),
+    '-ac', '1',
+    '-f', 's16le',
+    'pipe:1'
+]
+
+# Batch Transcription Settings
+TRANSCRIBE_WORKERS = int(os.getenv("TRANSCRIBE_WORKERS", "0"))  # процессов пакетной расшифровки (0 = по числу ядер)
+TRANSCRIBE_PIECE_SECONDS = float(os.getenv("TRANSCRIBE_PIECE_SECONDS", "30"))  # секунд - длина кусков, расшифровываемых параллельно
+TRANSCRIBE_SPLIT_SEARCH = 5.0  # секунд - окно поиска паузы вокруг границы куска
+TRANSCRIBE_MAX_FILE_MB = int(os.getenv("TRANSCRIBE_MAX_FILE_MB", "200"))  # максимальный размер загружаемой записи
+
 # Text Processing
 TEXT_SEPARATOR = " | "  # разделитель между сегментами текста
 
@@ -46,11 +96,60 @@ LOG_LEVEL = "INFO"
 
 # OpenRouter Settings
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")  # можно указать локальную заглушку (tools/llm_stub.py)
 OPENROUTER_MODEL = "anthropic/claude-3.5-sonnet"
 OPENROUTER_ENABLED = True
+SPECULATION_ENABLED = os.getenv("SPECULATION_ENABLED", "true").lower() == "true"  # генерировать следующий вопрос, пока кандидат ещё отвечает
+SPECULATION_MIN_WORDS = int(os.getenv("SPECULATION_MIN_WORDS", "12"))  # слов в ответе, после которых запускается спекулятивная генерация
+SPECULATION_RESTART_RATIO = 0.3  # перезапуск, если ответ вырос больше чем на эту долю
+LLM_STREAMING = os.getenv("LLM_STREAMING", "true").lower() == "true"  # вопросы и итоговый отчёт приходят клиенту по мере генерации (question_delta / report_delta)
 OPENROUTER_PROMPT = """Исправь этот текст из распознавания речи для HR-интервью:
 - Убери повторы, паузы и ошибки распознавания
 - Сделай текст профессиональным и структурированным
 - Отвечай только исправленным текстом без комментариев
 
 Текст: {text}"""
+
+# Resume Analysis Settings
+RESUME_CONCURRENCY = int(os.getenv("RESUME_CONCURRENCY", "8"))  # параллельных резюме на один запрос (по умолчанию и максимум)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))  # одновременных LLM-запросов на весь процесс
+
+# LLM Client Settings (один пул соединений на процесс для интервью и анализа резюме)
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "32"))  # соединений к LLM API на весь процесс
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "16"))  # простаивающих соединений, которые держим открытыми
+LLM_KEEPALIVE_EXPIRY = 60.0  # секунд, после которых простаивающее соединение закрывается
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "true").lower() == "true"  # HTTP/2 (мультиплексирование), если установлен пакет h2
+LLM_CONNECT_TIMEOUT = 5.0  # секунд на установку соединения
+LLM_TIMEOUTS = {  # таймаут запроса по типу вызова, секунд
+    "default": 60.0,
+    "cleanup": 20.0,  # очистка распознанного текста
+    "question": 20.0,  # следующий вопрос интервью
+    "evaluation": 20.0,  # оценка ответа
+    "report": 90.0,  # итоговый отчёт
+    "resume": 120.0,  # анализ резюме
+}
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))  # лимит запросов к LLM в минуту на процесс (0 = без лимита)
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))  # лимит токенов (промпт + ответ) в минуту (0 = без лимита)
+LLM_RETRY_ATTEMPTS = int(os.getenv("LLM_RETRY_ATTEMPTS", "3"))  # попыток на вызов при 429/5xx/таймауте (1 = без повторов)
+LLM_RETRY_BASE_DELAY = 0.5  # секунд, база экспоненциальной паузы с разбросом между попытками
+LLM_RETRY_MAX_DELAY = 20.0  # секунд; если Retry-After больше, вызов сразу завершается ошибкой
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))  # ошибок подряд (5xx/таймауты), после которых вызовы отклоняются (0 = выкл.)
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))  # секунд до пробного вызова после размыкания
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", "0"))  # процессов для разбора документов (0 = по числу ядер)
+SHORTLIST_K = int(os.getenv("SHORTLIST_K", "0"))  # сколько резюме после BM25 отправлять в LLM (0 = все)
+MATCH_BATCH_ENABLED = os.getenv("MATCH_BATCH_ENABLED", "false").lower() == "true"  # несколько кандидатов в одном matching-запросе
+MATCH_BATCH_TOKEN_BUDGET = int(os.getenv("MATCH_BATCH_TOKEN_BUDGET", "12000"))  # бюджет токенов на один пакетный запрос
+PREPROCESS_ENABLED = os.getenv("PREPROCESS_ENABLED", "true").lower() == "true"  # локальная очистка текста перед LLM
+RESUME_TOKEN_BUDGET = int(os.getenv("RESUME_TOKEN_BUDGET", "3000"))  # лимит токенов резюме в промпте (0 = без обрезки)
+JOB_TOKEN_BUDGET = int(os.getenv("JOB_TOKEN_BUDGET", "1500"))  # лимит токенов вакансии в промпте (0 = без обрезки)
+STREAM_TOP_K = 5  # размер текущего топа в потоковом ранжировании
+BATCH_QUEUE_PATH = os.getenv("BATCH_QUEUE_PATH", "./data/batch_queue.sqlite3")  # очередь фоновых пакетов
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4"))  # воркеров, разбирающих очередь
+BATCH_MAX_ATTEMPTS = int(os.getenv("BATCH_MAX_ATTEMPTS", "5"))  # попыток на резюме при временных ошибках LLM
+BATCH_RETRY_DELAY = 30.0  # секунд до первой повторной попытки (далее удваивается)
+
+# Result Cache Settings (пустой путь = только память)
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", "./cache/analysis_cache.sqlite3")
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "2048"))  # записей в памяти
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))  # байт в памяти
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", str(7 * 24 * 3600)))  # секунд жизни записи
@@ -0,0 +1,135 @@
+import json
+import logging
+import time
+from typing import List, Tuple
+
+import numpy as np
+import vosk
+
+from . import settings
+from .audio_frontend import AudioFrontEnd
+from .ring_buffer import PCMRingBuffer
+from .vad import FrameVAD
+
+logger = logging.getLogger(__name__)
+
+# ("partial", text) | ("final", vosk result dict) | ("speech", None) - VAD услышал речь
+Event = Tuple[str, object]
+
+
+class StreamDecoder:
+    """One persistent KaldiRecognizer fed with consecutive PCM chunks.
+
+    Used directly in the event loop (LocalDecoderStream) and inside
+    decoder worker processes (decoder_pool). With VAD only voiced runs
+    reach the recognizer, and the end of each run closes the phrase.
+    """
+
+    def __init__(self, model, sample_rate: int = settings.SAMPLE_RATE,
+                 partial_interval: float = settings.PARTIAL_INTERVAL, vad: bool = settings.VAD_ENABLED):
+        self.model = model
+        self.sample_rate = sample_rate
+        self.partial_interval = partial_interval
+        self.vad = FrameVAD(sample_rate) if vad else None
+        self.frontend = AudioFrontEnd(sample_rate)
+        self.recognizer = None
+        self.reset()
+
+    def reset(self) -> None:
+        self.recognizer = vosk.KaldiRecognizer(self.model, self.sample_rate)
+        self.recognizer.SetWords(True)
+        self.partial_text = ""
+        self.last_partial_time = 0.0
+        self.frontend.reset()
+        if self.vad:
+            self.vad.reset()
+
+    def feed(self, audio: np.ndarray) -> List[Event]:
+        if not len(audio):
+            return []
+        if self.vad is None:
+            return self._decode(audio)
+        runs, speech = self.vad.process(audio)
+        events: List[Event] = [("speech", None)] if speech else []
+        for voiced, ended in runs:
+            events += self._decode(voiced)
+            if ended:
+                # Конец фразы по VAD (после hangover): тишину в распознаватель не подаём, закрываем фразу сами
+                events += self.flush()
+        return events
+
+    def _decode(self, audio: np.ndarray) -> List[Event]:
+        if not len(audio):
+            return []
+        if self.recognizer.AcceptWaveform(self.frontend.process(audio).tobytes()):
+            # Конец фразы (endpoint) - финальный результат
+            self.partial_text = ""
+            return [("final", json.loads(self.recognizer.Result()))]
+        now = time.time()
+        if now - self.last_partial_time < self.partial_interval:
+            return []
+        self.last_partial_time = now
+        partial = json.loads(self.recognizer.PartialResult()).get("partial", "").strip()
+        if partial and partial != self.partial_text:
+            self.partial_text = partial
+            return [("partial", partial)]
+        return []
+
+    def flush(self) -> List[Event]:
+        """Close the open phrase (FinalResult) and start a new one"""
+        result = json.loads(self.recognizer.FinalResult())
+        self.recognizer.Reset()
+        self.partial_text = ""
+        return [("final", result)]
+
+
+def warm_up(model, sample_rate: int = settings.SAMPLE_RATE, seconds: float = settings.WARMUP_SECONDS) -> float:
+    """Decode a short synthetic signal so the first real session does not pay
+    for lazy graph/page loading; returns the time it took."""
+    started = time.perf_counter()
+    t = np.arange(int(seconds * sample_rate), dtype=np.float32) / sample_rate
+    rng = np.random.default_rng(0)
+    audio = (3000 * np.sin(2 * np.pi * 220 * t) * (np.sin(2 * np.pi * 2 * t) > 0) + rng.normal(0, 100, len(t)))
+    recognizer = vosk.KaldiRecognizer(model, sample_rate)
+    recognizer.AcceptWaveform(audio.astype(np.int16).tobytes())
+    recognizer.FinalResult()
+    return time.perf_counter() - started
+
+
+def take_audio(ring: PCMRingBuffer, sample_rate: int = settings.SAMPLE_RATE) -> np.ndarray:
+    """Unread PCM from the ring, logging audio lost to decoder lag.
+
+    When more than MAX_DECODER_LAG seconds are waiting, the stale part is
+    skipped and only the last CATCHUP_KEEP seconds are decoded: late
+    transcripts are worth less than current ones in a live interview.
+    """
+    dropped = ring.dropped
+    max_lag = int(settings.MAX_DECODER_LAG * sample_rate)
+    backlog = ring.available()
+    if max_lag and backlog > max_lag:
+        ring.skip(backlog - int(settings.CATCHUP_KEEP * sample_rate))
+    audio = ring.read()
+    if ring.dropped != dropped:
+        logger.warning(f"Decoder lagging, skipped {ring.dropped - dropped} samples")
+    return audio
+
+
+class LocalDecoderStream:
+    """Decoding in the calling process: the ring is read and decoded on each events() call."""
+
+    def __init__(self, model, ring: PCMRingBuffer):
+        self.ring = ring
+        self.decoder = StreamDecoder(model)
+
+    async def reset(self) -> None:
+        self.ring.clear()
+        self.decoder.reset()
+
+    async def events(self) -> List[Event]:
+        return self.decoder.feed(take_audio(self.ring))
+
+    async def flush(self) -> List[Event]:
+        return self.decoder.feed(take_audio(self.ring)) + self.decoder.flush()
+
+    def close(self) -> None:
+        pass
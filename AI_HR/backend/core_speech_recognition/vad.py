@@ -0,0 +1,99 @@
+from typing import List, Tuple
+
+import numpy as np
+
+from . import settings
+
+
+class FrameVAD:
+    """Energy/zero-crossing voice activity detector over fixed frames.
+
+    Each call classifies all complete frames of the chunk at once (NumPy),
+    carrying the incomplete tail to the next call. A frame is speech when
+    its RMS is above an adaptive noise floor and its zero-crossing rate is
+    not noise-like. Voiced runs are extended by `hangover_ms` after the last
+    speech frame and by `preroll_ms` before the first one, so word edges
+    are not clipped.
+    """
+
+    def __init__(self, sample_rate: int = settings.SAMPLE_RATE, frame_ms: int = settings.VAD_FRAME_MS,
+                 hangover_ms: int = settings.VAD_HANGOVER_MS, preroll_ms: int = settings.VAD_PREROLL_MS,
+                 min_rms: float = settings.VAD_MIN_RMS, noise_ratio: float = settings.VAD_NOISE_RATIO,
+                 zcr_max: float = settings.VAD_ZCR_MAX):
+        self.frame = sample_rate * frame_ms // 1000
+        self.hangover = max(0, hangover_ms // frame_ms)
+        self.preroll = max(0, preroll_ms // frame_ms)
+        self.min_rms = min_rms
+        self.noise_ratio = noise_ratio
+        self.zcr_max = zcr_max
+        self.reset()
+
+    def reset(self) -> None:
+        self._rest = np.zeros(0, dtype=np.int16)
+        self._tail = np.zeros(0, dtype=np.int16)  # последние preroll кадров для начала фразы
+        self._since_speech = 1 << 30  # кадров с последнего речевого
+        self._noise = None
+        self.in_speech = False
+        self.frames_total = 0
+        self.frames_voiced = 0
+
+    def classify(self, frames: np.ndarray) -> np.ndarray:
+        """Speech flag per frame (rows of int16 samples)."""
+        x = frames.astype(np.float32)
+        rms = np.sqrt(np.mean(x * x, axis=1))
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / float(frames.shape[1])
+        if self._noise is None:
+            self._noise = float(np.percentile(rms, 10))
+        threshold = max(self.min_rms, self._noise * self.noise_ratio)
+        speech = (rms > threshold) & ((zcr < self.zcr_max) | (rms > 2 * threshold))
+        if not speech.all():
+            # Уровень шума подстраивается только по неречевым кадрам
+            self._noise = 0.9 * self._noise + 0.1 * float(np.median(rms[~speech]))
+        return speech
+
+    def process(self, audio: np.ndarray) -> Tuple[List[Tuple[np.ndarray, bool]], bool]:
+        """Split a chunk into voiced runs.
+
+        Returns ([(run audio, run ended in this chunk)], any speech frame).
+        """
+        data = np.concatenate([self._rest, audio]) if len(self._rest) else audio
+        n = len(data) // self.frame
+        self._rest = data[n * self.frame:].copy()
+        if n == 0:
+            return [], False
+        body = data[:n * self.frame]
+        speech = self.classify(body.reshape(n, self.frame))
+
+        # Кадров с последнего речевого для каждого кадра (с учётом прошлых чанков) -> hangover
+        idx = np.arange(n)
+        last = np.maximum.accumulate(np.where(speech, idx, -1))
+        since = np.where(last >= 0, idx - last, self._since_speech + idx + 1)
+        voiced = since <= self.hangover
+        self._since_speech = int(since[-1])
+
+        padded = np.concatenate(([False], voiced, [False]))
+        starts = np.flatnonzero(~padded[:-1] & padded[1:])
+        ends = np.flatnonzero(padded[:-1] & ~padded[1:])
+        runs = []
+        if self.in_speech and not voiced[0]:
+            # Фраза из прошлого чанка закончилась ровно на его границе
+            runs.append((body[:0], True))
+        for start, end in zip(starts, ends):
+            run = body[start * self.frame:end * self.frame]
+            if start > 0 or not self.in_speech:
+                # Новая фраза: добавляем preroll перед первым речевым кадром
+                pre = max(0, start - self.preroll)
+                run = body[pre * self.frame:end * self.frame]
+                missing = (self.preroll - (start - pre)) * self.frame
+                if missing and len(self._tail):
+                    run = np.concatenate([self._tail[-missing:], run])
+            runs.append((run, bool(end < n)))
+
+        self.in_speech = bool(voiced[-1])
+        if self.preroll:
+            keep = self.preroll * self.frame
+            self._tail = body[-keep:].copy() if len(body) >= keep else np.concatenate([self._tail, body])[-keep:]
+        self.frames_total += n
+        self.frames_voiced += int(np.count_nonzero(voiced))
+        return runs, bool(speech.any())
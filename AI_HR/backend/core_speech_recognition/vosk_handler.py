@@ -3,20 +3,25 @@ import time
 import json
 import logging
 import vosk
-import numpy as np
 from fastapi import WebSocket
 from .base_stt import BaseSTT
 from .openrouter_processor import OpenRouterProcessor
 from .hr_interviewer import HRInterviewer
+from .stream_decoder import LocalDecoderStream
 from . import settings
 
 logger = logging.getLogger(__name__)
 
 class VoskHandler(BaseSTT):
-    def __init__(self, model_path=settings.MODEL_PATH, chunk_duration=settings.CHUNK_DURATION):
-        super().__init__(chunk_duration)
+    def __init__(self, model_path=settings.MODEL_PATH, chunk_duration=settings.CHUNK_DURATION, vosk_model=None, decoder=None):
+        super().__init__(chunk_duration, pcm_buffer=decoder.ring if decoder else None)
         self.model_path = model_path
-        self.vosk_model = None
+        self.session_id = None
+        # Модель может быть общей для всех сессий (SessionManager)
+        self.vosk_model = vosk_model
+        # Декодер читает pcm_buffer: в этом процессе или в процессе-воркере (DecoderPool)
+        self.decoder = decoder or (LocalDecoderStream(vosk_model, self.pcm_buffer) if vosk_model else None)
+        self.partial_text = ""
         self.openrouter = OpenRouterProcessor()
         self.hr_interviewer = HRInterviewer()
         self.last_speech_time = time.time()  # Инициализируем время последней речи
@@ -30,79 +35,84 @@ class VoskHandler(BaseSTT):
             return False
         
         self.vosk_model = vosk.Model(self.model_path)
+        self.decoder = LocalDecoderStream(self.vosk_model, self.pcm_buffer)
         logger.info("Vosk model loaded")
         return True
     
+    async def _add_final(self, websocket: WebSocket, result: dict):
+        """Recognizer reached an endpoint: append the utterance as a segment"""
+        text = result.get("text", "").strip()
+        if not text:
+            return
+        words = result.get("result") or []
+        segment = {
+            "text": text,
+            "timestamp": time.time(),
+            "duration": round(words[-1]["end"] - words[0]["start"], 2) if words else 0.0,
+            "confidence": round(sum(w.get("conf", 0.8) for w in words) / len(words), 3) if words else 0.8,
+        }
+        self.segments.append(segment)
+        self.partial_text = ""
+        await self.send_result(websocket, segment, "vosk")
+
+        # Накапливаем для OpenRouter
+        if self.accumulated:
+            self.accumulated += settings.TEXT_SEPARATOR + text
+        else:
+            self.accumulated = text
+        self.last_speech_time = time.time()
+        # Следующий вопрос начинает генерироваться, пока кандидат ещё говорит
+        if self.hr_interviewer.interview_active:
+            self.hr_interviewer.speculate(self.accumulated)
+
+    async def _handle_events(self, websocket: WebSocket, events):
+        for kind, payload in events:
+            if kind == "final":
+                await self._add_final(websocket, payload)
+            elif kind == "partial":
+                self.partial_text = payload
+                self.last_speech_time = time.time()
+                await self.send_partial(websocket, payload, "vosk")
+            elif kind == "speech":
+                # VAD: речь в аудио, независимо от того, появился ли уже текст
+                self.last_speech_time = time.time()
+
+    async def flush_recognizer(self, websocket: WebSocket):
+        """Decode buffered audio and close the current utterance (before answer processing)"""
+        if not self.decoder:
+            return
+        await self._handle_events(websocket, await self.decoder.flush())
+
     async def process_stream(self, websocket: WebSocket):
         logger.info(f"Starting process_stream, session_active={self.session_active}")
-        last_processed_time = time.time()
         self.last_speech_time = time.time()  # Используем атрибут класса 
+        # Один распознаватель на сессию: состояние декодера сохраняется между порциями аудио
+        await self.decoder.reset()
+        self.partial_text = ""
         
         while self.session_active:
             try:
                 current_time = time.time()
-                
-                if (current_time - last_processed_time) >= self.chunk_duration:
-                    chunk_samples = int(self.sample_rate * self.chunk_duration)
-                    
-                    if len(self.pcm_buffer) >= chunk_samples:
-                        audio_data = list(self.pcm_buffer)[-chunk_samples:]
-                        
-                        recognizer = vosk.KaldiRecognizer(self.vosk_model, self.sample_rate)
-                        
-                        audio_array = np.array(audio_data)
-                        max_val = np.max(np.abs(audio_array))
-                        
-                        if max_val > 0:
-                            if max_val < settings.AUDIO_AMPLIFICATION_THRESHOLD:
-                                amplification = settings.AUDIO_AMPLIFICATION_THRESHOLD / max_val
-                                audio_array = audio_array * amplification
-                        
-                        audio_bytes = (audio_array).astype(np.int16).tobytes()
-                        
-                        recognizer.AcceptWaveform(audio_bytes)
-                        final_result = json.loads(recognizer.FinalResult())
-                        
-                        text = final_result.get("text", "").strip()
-                        
-                        if text:
-                            new_text = self.deduplicate_text(text, self.segments)
-                            
-                            if new_text:
-                                segment = {
-                                    "text": new_text,
-                                    "timestamp": current_time,
-                                    "duration": self.chunk_duration,
-                                    "confidence": final_result.get("confidence", 0.8)
-                                }
-                                
-                                self.segments.append(segment)
-                                
-                                # Отправляем только новый сегмент
-                                await self.send_result(websocket, segment, "vosk")
-                                
-                                # Накапливаем для OpenRouter
-                                if self.accumulated:
-                                    self.accumulated += settings.TEXT_SEPARATOR + new_text
-                                else:
-                                    self.accumulated = new_text
-                                
-                                # Обновляем время последней речи
-                                self.last_speech_time = current_time
-                        
-                        last_processed_time = current_time
+                await self._handle_events(websocket, await self.decoder.events())
+                if getattr(self.decoder, "failed", False):
+                    # Все воркеры-декодеры умерли: распознавания не будет, клиент переподключится позже
+                    logger.error(f"Session {self.session_id}: decoder stream failed, closing")
+                    await websocket.close(code=1011, reason="Speech decoder unavailable")
+                    return
                 
                 # Проверяем тишину для автоматической обработки
                 silence_duration = current_time - self.last_speech_time
+                # С VAD last_speech_time обновляется по звуку речи, а не только по тексту распознавателя
+                silence_threshold = settings.VAD_END_OF_TURN if settings.VAD_ENABLED else settings.SILENCE_THRESHOLD
                 # logger.debug(f"Checking silence: accumulated='{self.accumulated}', silence={silence_duration:.1f}s, interview_active={self.hr_interviewer.interview_active}")
                 
                 # Обработка молчания в интервью: 5 сек молчания → спиннер + обработка
                 # Выполняется только если включен gate (активируется нажатием кнопки на 2+ вопросах)
-                if (silence_duration >= settings.SILENCE_THRESHOLD and
+                if (silence_duration >= silence_threshold and
                     self.hr_interviewer.interview_active and
                     self.silence_gate_enabled):
                     
-                    logger.info(f"Silence detected ({settings.SILENCE_THRESHOLD}s), processing answer...")
+                    logger.info(f"Silence detected ({silence_threshold}s), processing answer...")
                     logger.info(f"Sending processing_started message")
 
                     # Показываем спиннер
@@ -129,7 +139,7 @@ class VoskHandler(BaseSTT):
                     self.segments = []
                     self.last_speech_time = time.time()
                 
-                await asyncio.sleep(0.1)
+                await asyncio.sleep(settings.DECODE_INTERVAL)
                 
             except Exception as e:
                 logger.error(f"Processing error: {e}")
@@ -140,15 +150,15 @@ class VoskHandler(BaseSTT):
     
     async def finalize_session(self, websocket: WebSocket):
         """Финализация сессии - обработка ответа в HR интервью"""
+        # Незавершённая фраза из распознавателя тоже входит в ответ
+        await self.flush_recognizer(websocket)
         if self.accumulated and self.accumulated.strip():
             if self.hr_interviewer.interview_active:
                 # Обрабатываем ответ в рамках интервью
                 logger.info(f"Processing answer for question {self.hr_interviewer.current_question + 1}")
-                result = await self.hr_interviewer.process_answer(self.accumulated)
-                
-                # Отправляем результат на фронтенд
+                # Следующий вопрос уходит на фронтенд сразу, оценка - отдельным сообщением answer_evaluated
                 try:
-                    await websocket.send_json(result)
+                    await self.hr_interviewer.process_answer(self.accumulated, send=websocket.send_json)
                     logger.info("Answer processed, result sent")
                 except Exception as e:
                     logger.error(f"Error sending result: {e}")
@@ -170,9 +180,8 @@ class VoskHandler(BaseSTT):
             if self.hr_interviewer.interview_active:
                 # Пользователь молчал - обрабатываем как пустой ответ
                 logger.info("Processing silence as empty answer in interview")
-                result = await self.hr_interviewer.process_answer("Кандидат промолчал")
                 try:
-                    await websocket.send_json(result)
+                    await self.hr_interviewer.process_answer("Кандидат промолчал", send=websocket.send_json)
                     logger.info("Silence processed, result sent")
                 except Exception as e:
                     logger.error(f"Error sending silence result: {e}")
@@ -1,20 +1,39 @@
 import asyncio
 import json
 import logging
-import threading
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File, Form
+from fastapi.responses import FileResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from core_speech_recognition.vosk_handler import VoskHandler
+from core_speech_recognition.batch_transcriber import BatchTranscriber
+from core_speech_recognition.hr_interviewer import speculation_stats
+from core_speech_recognition.llm_client import (
+    close_llm_client,
+    get_llm_client,
+    get_llm_guard,
+    llm_client_stats,
+    preconnect as _preconnect_llm,
+)
+from core_speech_recognition.process_stats import memory_usage
+from core_speech_recognition.session_manager import SessionLimitReached, SessionManager
 import core_speech_recognition.settings as settings
 from pydantic import BaseModel
 from typing import List, Dict, Optional
 from resume_analysis import (
+    BatchQueue,
     init_llm_client,
-    analyze_candidate as _analyze_candidate,
-    analyze_job as _analyze_job,
-    analyze_matching as _analyze_matching,
-    parse_upload_to_text as _parse_upload_to_text,
+    init_result_cache,
+    close_result_cache,
+    init_preprocessing,
+    cache_stats as _cache_stats,
+    preprocess_stats as _preprocess_stats,
+    get_job as _get_job,
+    register_job as _register_job,
+    init_parse_pool,
+    shutdown_parse_pool,
+    parse_upload_async as _parse_upload_async,
+    rank_resumes as _rank_resumes,
+    shortlist_resumes as _shortlist_resumes,
+    stream_ranking as _stream_ranking,
 )
 
 logging.basicConfig(level=getattr(logging, settings.LOG_LEVEL))
@@ -30,46 +49,255 @@ app.add_middleware(
     allow_credentials=True
 )
 
-# Инициализируем Vosk обработчик
-vosk_handler = VoskHandler()
+# Одна модель Vosk на процесс, отдельная сессия на каждое WebSocket-соединение
+session_manager = SessionManager(settings.MODEL_PATH, max_sessions=settings.MAX_SESSIONS)
+if settings.PRELOAD_MODEL:
+    # Загрузка при импорте: под gunicorn --preload это мастер-процесс, воркеры наследуют модель через fork
+    session_manager.preload()
+# Расшифровка записей целиком; пул процессов создаётся при первом запросе
+batch_transcriber = BatchTranscriber(settings.MODEL_PATH, workers=settings.TRANSCRIBE_WORKERS)
 
-init_llm_client(settings.OPENROUTER_API_KEY)
+init_llm_client(
+    settings.OPENROUTER_API_KEY,
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    base_url=settings.OPENROUTER_BASE_URL,
+    client=get_llm_client(),  # тот же пул соединений, что и у интервью
+    timeout=settings.LLM_TIMEOUTS["resume"],
+    guard=get_llm_guard(),  # общие лимиты, повторы и circuit breaker
+)
+init_result_cache(
+    settings.RESULT_CACHE_PATH,
+    max_entries=settings.RESULT_CACHE_MAX_ENTRIES,
+    max_bytes=settings.RESULT_CACHE_MAX_BYTES,
+    ttl=settings.RESULT_CACHE_TTL,
+)
+init_preprocessing(
+    settings.PREPROCESS_ENABLED,
+    resume_budget=settings.RESUME_TOKEN_BUDGET,
+    job_budget=settings.JOB_TOKEN_BUDGET,
+)
+init_parse_pool(settings.PARSE_WORKERS)
+batch_queue = BatchQueue(
+    settings.BATCH_QUEUE_PATH,
+    workers=settings.BATCH_WORKERS,
+    max_attempts=settings.BATCH_MAX_ATTEMPTS,
+    retry_delay=settings.BATCH_RETRY_DELAY,
+)
 
 
 
 class AnalysisRequest(BaseModel):
-    job_description: str
+    job_description: Optional[str] = None
+    job_id: Optional[str] = None
     resumes: List[str]
+    concurrency: Optional[int] = None
+    shortlist_k: Optional[int] = None
+    batch_matching: Optional[bool] = None
+
+
+class JobRequest(BaseModel):
+    job_description: str
+
+
+def _request_concurrency(requested: Optional[int]) -> int:
+    """Per-request fan-out, capped by settings.RESUME_CONCURRENCY"""
+    if not requested or requested < 1:
+        return settings.RESUME_CONCURRENCY
+    return min(requested, settings.RESUME_CONCURRENCY)
+
+
+async def _resolve_job(job_id: Optional[str], job_text: Optional[str]) -> Dict:
+    """Parsed job by registry id, or register the given text (shares in-flight analysis)"""
+    if job_id:
+        job = _get_job(job_id)
+        if job is None:
+            raise LookupError(f"Unknown job_id: {job_id}")
+        return job
+    return await _register_job(job_text)
+
+
+async def _resolve_upload_job(job: Optional[UploadFile], job_id: Optional[str]):
+    """Parsed job from an uploaded file or a registry id -> (job, error)"""
+    job_text = None
+    if not job_id:
+        if job is None:
+            return None, "Job file or job_id is required"
+        job_text, _ = await _parse_upload_async(job)
+        if not job_text:
+            logger.warning(f"Could not extract text from job file: {job.filename}")
+            return None, f"Could not extract text from job file: {job.filename}"
+    try:
+        return await _resolve_job(job_id, job_text), None
+    except LookupError as e:
+        return None, str(e)
+
+
+async def _parse_resume_uploads(resumes: List[UploadFile]):
+    """Extract text from uploaded resumes in the parser pool -> (failed entries, batch, parse ms per file).
+
+    parse ms is a list aligned with `resumes` (None where parsing raised), so
+    uploads sharing a filename keep their own timings.
+    """
+    resumes = resumes or []
+    parsed = await asyncio.gather(*[_parse_upload_async(f) for f in resumes], return_exceptions=True)
+    failed: List[Dict] = []
+    batch: List[Dict] = []
+    parse_ms: List[Optional[float]] = [None] * len(resumes)
+    for i, (f, res) in enumerate(zip(resumes, parsed)):
+        if isinstance(res, Exception):
+            logger.error(f"Error parsing resume file {i+1} ({f.filename}): {res}")
+            cv_text = ""
+        else:
+            cv_text, elapsed = res
+            parse_ms[i] = round(elapsed * 1000, 1)
+        if not cv_text:
+            logger.warning(f"Could not extract text from resume file: {f.filename}")
+            failed.append({"name": f"{f.filename} (Error)", "score": 0.0})
+            continue
+        batch.append({"text": cv_text, "name": f.filename, "error_name": f"{f.filename} (Error)"})
+    return failed, batch, parse_ms
+
+
+def _match_batch_tokens(batch_matching: Optional[bool]) -> int:
+    """Token budget for batched matching, 0 = one matching call per resume"""
+    enabled = settings.MATCH_BATCH_ENABLED if batch_matching is None else batch_matching
+    return settings.MATCH_BATCH_TOKEN_BUDGET if enabled else 0
+
+
+def _shortlist(job: Dict, batch: List[Dict], shortlist_k: Optional[int]):
+    """Optional BM25 pre-ranking -> (resumes for the LLM, results for the rest)"""
+    k = shortlist_k if shortlist_k is not None else settings.SHORTLIST_K
+    if not k or k <= 0:
+        return batch, []
+    return _shortlist_resumes(job.get("job_description") or "", job["requirements"], batch, k)
+
+
+def _text_batch(resumes: List[str]) -> List[Dict]:
+    return [
+        {"text": cv_text, "name": f"Резюме {i+1}", "error_name": f"Резюме {i+1} (Ошибка)", "use_candidate_name": True}
+        for i, cv_text in enumerate(resumes)
+        if cv_text
+    ]
+
+
+def _ranking_stream_response(events, stream_format: str) -> StreamingResponse:
+    """Wrap ranking events as NDJSON (default) or Server-Sent Events"""
+    sse = stream_format == "sse"
+
+    async def body():
+        async for event in events:
+            payload = json.dumps(event, ensure_ascii=False)
+            if sse:
+                yield f"event: {event['type']}\ndata: {payload}\n\n"
+            else:
+                yield payload + "\n"
+
+    media_type = "text/event-stream" if sse else "application/x-ndjson"
+    return StreamingResponse(body(), media_type=media_type, headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+llm_preconnect: Dict = {"connected": None, "seconds": None}
+
+
+async def _preconnect_llm_client():
+    """TCP/TLS to the LLM API is set up during startup, not on the first interview turn"""
+    started = asyncio.get_running_loop().time()
+    llm_preconnect["connected"] = await _preconnect_llm()
+    llm_preconnect["seconds"] = round(asyncio.get_running_loop().time() - started, 3)
+
 
 @app.on_event("startup")
 async def startup():
-    """Инициализация при запуске приложения"""
-    if not await vosk_handler.initialize():
-        logger.error("Failed to initialize Vosk STT")
-        exit(1)
+    """Инициализация при запуске приложения: модель грузится в фоне, сервер сразу принимает запросы"""
+    session_manager.start_loading()
+    asyncio.create_task(_preconnect_llm_client())
+    await batch_queue.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Остановка фоновых пулов"""
+    await batch_queue.stop()
+    shutdown_parse_pool()
+    close_result_cache()
+    session_manager.shutdown()
+    batch_transcriber.shutdown()
+    await close_llm_client()
 
 @app.get("/health")
 async def health():
     """Проверка состояния сервера"""
+    readiness = session_manager.readiness()
     return {
-        "status": "ok", 
+        "status": {"ready": "ok", "failed": "error"}.get(readiness["state"], "loading"),
         "message": "Server is running",
-        "vosk_enabled": vosk_handler.is_model_loaded()
+        "ready": readiness["ready"],
+        "vosk_enabled": session_manager.is_model_loaded(),
+        "model": readiness,
+        "llm_preconnect": llm_preconnect,
+        "memory": memory_usage(),
+        "sessions": session_manager.stats()
     }
 
+@app.get("/sessions")
+async def sessions():
+    """Active interview sessions with audio backlog and decoder lag"""
+    return {**session_manager.stats(), "speculation": speculation_stats(), "sessions": session_manager.session_stats()}
+
 @app.get("/")
 async def root():
     """API status"""
     return {"status": "AI HR Backend is running", "version": "1.0"}
 
 
+@app.get("/llm/stats")
+async def llm_stats():
+    """Shared LLM connection pool plus rate limits, circuit state and per-endpoint counters"""
+    return llm_client_stats()
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss counters and stored bytes of the analysis result cache"""
+    return _cache_stats()
+
+
+@app.get("/preprocess/stats")
+async def preprocess_stats():
+    """Prompt tokens before/after local preprocessing"""
+    return _preprocess_stats()
+
+
+@app.post("/jobs")
+async def create_job(req: JobRequest):
+    """Parse a job description once; later ranking requests can pass the returned job_id"""
+    try:
+        if not req.job_description:
+            return {"error": "Job description is required"}
+        if not settings.OPENROUTER_API_KEY:
+            logger.error("OpenRouter API key not configured")
+            return {"error": "API key not configured"}
+        return await _register_job(req.job_description)
+    except Exception as e:
+        logger.error(f"Error in create_job: {e}")
+        return {"error": str(e)}
+
+
+@app.get("/jobs/{job_id}")
+async def read_job(job_id: str):
+    """Parsed requirements of a registered job"""
+    job = _get_job(job_id)
+    if job is None:
+        return {"error": f"Unknown job_id: {job_id}"}
+    return job
+
+
 @app.post("/analyze_resumes")
 async def analyze_resumes(req: AnalysisRequest):
     """Analyze job description against multiple resumes and return name+score list."""
     try:
         logger.info(f"Analyzing {len(req.resumes)} resumes against job description")
         
-        if not req.job_description or not req.resumes:
+        if not (req.job_description or req.job_id) or not req.resumes:
             logger.warning("Empty job description or resumes list")
             return {"results": [], "error": "Job description and resumes are required"}
         
@@ -77,28 +305,18 @@ async def analyze_resumes(req: AnalysisRequest):
             logger.error("OpenRouter API key not configured")
             return {"results": [], "error": "API key not configured"}
         
-        job = _analyze_job(req.job_description)
-        results: List[Dict] = []
-        
-        for i, cv_text in enumerate(req.resumes):
-            if not cv_text:
-                continue
-            try:
-                logger.info(f"Processing resume {i+1}/{len(req.resumes)}")
-                cand = _analyze_candidate(cv_text)
-                match = _analyze_matching(job, cand)
-                name = cand.get("candidate_name") or f"Резюме {i+1}"
-                score = match.get("score", 0.0)
-                results.append({"name": name, "score": score})
-                logger.info(f"Resume {i+1} processed: {name} - score: {score}")
-            except Exception as e:
-                logger.error(f"Error processing resume {i+1}: {e}")
-                results.append({"name": f"Резюме {i+1} (Ошибка)", "score": 0.0})
+        try:
+            job = await _resolve_job(req.job_id, req.job_description)
+        except LookupError as e:
+            return {"results": [], "error": str(e)}
+        batch, skipped = _shortlist(job, _text_batch(req.resumes), req.shortlist_k)
+        results = await _rank_resumes(
+            job["requirements"], batch, _request_concurrency(req.concurrency), _match_batch_tokens(req.batch_matching)
+        )
+        results.extend(skipped)
         
-        # sort by score desc
-        results.sort(key=lambda x: x.get("score", 0.0), reverse=True)
         logger.info(f"Analysis completed. {len(results)} results returned")
-        return {"results": results}
+        return {"results": results, "job_id": job["job_id"]}
         
     except Exception as e:
         logger.error(f"Error in analyze_resumes: {e}")
@@ -106,60 +324,233 @@ async def analyze_resumes(req: AnalysisRequest):
 
 
 @app.post("/upload_analyze")
-async def upload_analyze(job: UploadFile = File(...), resumes: List[UploadFile] = File(...)):
-    """Upload job description file and multiple resume files. Returns name+score list."""
+async def upload_analyze(
+    job: Optional[UploadFile] = File(None),
+    resumes: List[UploadFile] = File(...),
+    job_id: Optional[str] = Form(None),
+    concurrency: Optional[int] = Form(None),
+    shortlist_k: Optional[int] = Form(None),
+    batch_matching: Optional[bool] = Form(None),
+):
+    """Upload job description file (or pass job_id) and multiple resume files. Returns name+score list."""
     try:
-        logger.info(f"Analyzing uploaded files: job={job.filename}, resumes={len(resumes)} files")
+        logger.info(f"Analyzing uploaded files: job={job.filename if job else job_id}, resumes={len(resumes)} files")
         
         if not settings.OPENROUTER_API_KEY:
             logger.error("OpenRouter API key not configured")
             return {"results": [], "error": "API key not configured"}
         
-        job_text = _parse_upload_to_text(job)
-        if not job_text:
-            logger.warning(f"Could not extract text from job file: {job.filename}")
-            return {"results": [], "error": f"Could not extract text from job file: {job.filename}"}
-        
-        job_info = _analyze_job(job_text)
-        out: List[Dict] = []
-        
-        for i, f in enumerate(resumes or []):
-            try:
-                logger.info(f"Processing resume file {i+1}/{len(resumes)}: {f.filename}")
-                cv_text = _parse_upload_to_text(f)
-                if not cv_text:
-                    logger.warning(f"Could not extract text from resume file: {f.filename}")
-                    out.append({"name": f"{f.filename} (Error)", "score": 0.0})
-                    continue
-                
-                cand = _analyze_candidate(cv_text)
-                match = _analyze_matching(job_info, cand)
-                name = f.filename
-                score = match.get("score", 0.0)
-                out.append({"name": name, "score": score})
-                logger.info(f"Resume file {i+1} processed: {name} - score: {score}")
-                
-            except Exception as e:
-                logger.error(f"Error processing resume file {i+1} ({f.filename}): {e}")
-                out.append({"name": f"{f.filename} (Error)", "score": 0.0})
-        
+        job_info, error = await _resolve_upload_job(job, job_id)
+        if error:
+            return {"results": [], "error": error}
+        out, batch, parse_ms = await _parse_resume_uploads(resumes)
+        batch, skipped = _shortlist(job_info, batch, shortlist_k)
+        out.extend(await _rank_resumes(
+            job_info["requirements"], batch, _request_concurrency(concurrency), _match_batch_tokens(batch_matching)
+        ))
+        out.extend(skipped)
         out.sort(key=lambda x: x.get("score", 0.0), reverse=True)
         logger.info(f"File analysis completed. {len(out)} results returned")
-        return {"results": out}
+        return {"results": out, "job_id": job_info["job_id"], "parse_ms": parse_ms}
         
     except Exception as e:
         logger.error(f"Error in upload_analyze: {e}")
         return {"results": [], "error": str(e)}
 
+@app.post("/analyze_resumes/stream")
+async def analyze_resumes_stream(req: AnalysisRequest, format: str = "ndjson", top_k: int = settings.STREAM_TOP_K):
+    """Streaming /analyze_resumes: one event per scored resume, then a sorted summary (NDJSON or SSE)"""
+    try:
+        if not (req.job_description or req.job_id) or not req.resumes:
+            return {"results": [], "error": "Job description and resumes are required"}
+        if not settings.OPENROUTER_API_KEY:
+            logger.error("OpenRouter API key not configured")
+            return {"results": [], "error": "API key not configured"}
+        try:
+            job = await _resolve_job(req.job_id, req.job_description)
+        except LookupError as e:
+            return {"results": [], "error": str(e)}
+        batch, skipped = _shortlist(job, _text_batch(req.resumes), req.shortlist_k)
+        events = _stream_ranking(
+            job["requirements"], batch, _request_concurrency(req.concurrency), top_k=top_k, failed=skipped,
+            match_batch_tokens=_match_batch_tokens(req.batch_matching),
+        )
+        return _ranking_stream_response(events, format)
+    except Exception as e:
+        logger.error(f"Error in analyze_resumes_stream: {e}")
+        return {"results": [], "error": str(e)}
+
+
+@app.post("/upload_analyze/stream")
+async def upload_analyze_stream(
+    job: Optional[UploadFile] = File(None),
+    resumes: List[UploadFile] = File(...),
+    job_id: Optional[str] = Form(None),
+    concurrency: Optional[int] = Form(None),
+    shortlist_k: Optional[int] = Form(None),
+    batch_matching: Optional[bool] = Form(None),
+    format: str = "ndjson",
+    top_k: int = settings.STREAM_TOP_K,
+):
+    """Streaming /upload_analyze: one event per scored file, then a sorted summary (NDJSON or SSE)"""
+    try:
+        if not settings.OPENROUTER_API_KEY:
+            logger.error("OpenRouter API key not configured")
+            return {"results": [], "error": "API key not configured"}
+        job_info, error = await _resolve_upload_job(job, job_id)
+        if error:
+            return {"results": [], "error": error}
+        # Uploads are parsed before the response starts: the files are closed once the handler returns
+        failed, batch, _ = await _parse_resume_uploads(resumes)
+        batch, skipped = _shortlist(job_info, batch, shortlist_k)
+        events = _stream_ranking(
+            job_info["requirements"], batch, _request_concurrency(concurrency), top_k=top_k, failed=failed + skipped,
+            match_batch_tokens=_match_batch_tokens(batch_matching),
+        )
+        return _ranking_stream_response(events, format)
+    except Exception as e:
+        logger.error(f"Error in upload_analyze_stream: {e}")
+        return {"results": [], "error": str(e)}
+
+@app.post("/batches")
+async def submit_batch(req: AnalysisRequest):
+    """Queue a large resume set for background scoring; returns batch_id right away"""
+    try:
+        if not (req.job_description or req.job_id) or not req.resumes:
+            return {"error": "Job description and resumes are required"}
+        if not settings.OPENROUTER_API_KEY:
+            logger.error("OpenRouter API key not configured")
+            return {"error": "API key not configured"}
+        job = _get_job(req.job_id) if req.job_id else None
+        if req.job_id and job is None:
+            return {"error": f"Unknown job_id: {req.job_id}"}
+        batch_id = await batch_queue.submit(_text_batch(req.resumes), job_description=req.job_description, job=job)
+        return await batch_queue.status(batch_id)
+    except Exception as e:
+        logger.error(f"Error in submit_batch: {e}")
+        return {"error": str(e)}
+
+
+@app.post("/batches/upload")
+async def submit_batch_upload(
+    job: Optional[UploadFile] = File(None),
+    resumes: List[UploadFile] = File(...),
+    job_id: Optional[str] = Form(None),
+):
+    """Queue uploaded resumes for background scoring; returns batch_id after parsing, before any LLM call"""
+    try:
+        if not settings.OPENROUTER_API_KEY:
+            logger.error("OpenRouter API key not configured")
+            return {"error": "API key not configured"}
+        job_info = None
+        job_text = None
+        if job_id:
+            job_info = _get_job(job_id)
+            if job_info is None:
+                return {"error": f"Unknown job_id: {job_id}"}
+        elif job is not None:
+            job_text, _ = await _parse_upload_async(job)
+        if not job_info and not job_text:
+            return {"error": "Job file or job_id is required"}
+        failed, batch, _ = await _parse_resume_uploads(resumes)
+        batch_id = await batch_queue.submit(batch, job_description=job_text, job=job_info, failed=failed)
+        return await batch_queue.status(batch_id)
+    except Exception as e:
+        logger.error(f"Error in submit_batch_upload: {e}")
+        return {"error": str(e)}
+
+
+@app.get("/batches/{batch_id}")
+async def batch_status(batch_id: str, top_k: int = 10):
+    """Progress, throughput and partial top of a queued batch"""
+    status = await batch_queue.status(batch_id, top_k=top_k)
+    if status is None:
+        return {"error": f"Unknown batch_id: {batch_id}"}
+    return status
+
+
+@app.get("/batches/{batch_id}/results")
+async def batch_results(batch_id: str):
+    """Ranking of everything scored so far in a batch"""
+    results = await batch_queue.results(batch_id)
+    if results is None:
+        return {"results": [], "error": f"Unknown batch_id: {batch_id}"}
+    return {"results": results, "status": (await batch_queue.status(batch_id, top_k=0))["status"]}
+
+@app.post("/transcribe")
+async def transcribe(files: List[UploadFile] = File(...)):
+    """Transcribe recorded interviews (WebM/WAV/MP3/...) -> timestamped segments per file"""
+    try:
+        if not session_manager.ready:
+            return {"error": f"Speech model is not ready ({session_manager.state})"}
+        # Воркеры расшифровки унаследуют уже загруженную модель (fork), а не будут читать её заново
+        batch_transcriber.vosk_model = batch_transcriber.vosk_model or session_manager.vosk_model
+        uploads = []
+        for f in files:
+            data = await f.read()
+            if len(data) > settings.TRANSCRIBE_MAX_FILE_MB * 1024 * 1024:
+                return {"error": f"File too large: {f.filename} (max {settings.TRANSCRIBE_MAX_FILE_MB} MB)"}
+            uploads.append((f.filename, data))
+        if not uploads:
+            return {"error": "No audio files"}
+        return await batch_transcriber.transcribe(uploads)
+    except Exception as e:
+        logger.error(f"Error in transcribe: {e}")
+        return {"error": str(e)}
+
+
+@app.get("/transcribe/stats")
+async def transcribe_stats():
+    """Files transcribed so far and throughput in audio-hours per wall-clock hour"""
+    return batch_transcriber.stats()
+
+async def _configure_input(vosk_handler, input_format: str, sample_rate) -> tuple:
+    """Negotiate the audio ingest format; unsupported formats fall back to webm (ffmpeg)"""
+    error = None
+    try:
+        started = await vosk_handler.configure_input(input_format, int(sample_rate))
+    except ValueError as e:
+        logger.warning(f"Input format {input_format!r} rejected: {e}; using webm")
+        error = str(e)
+        started = await vosk_handler.configure_input("webm")
+    message = {
+        "type": "input_format",
+        "format": vosk_handler.input_format,
+        "sample_rate": settings.SAMPLE_RATE,
+    }
+    if error:
+        message["error"] = error
+    return started, message
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint для real-time обработки аудио"""
     await websocket.accept()
+    if not session_manager.ready:
+        await websocket.close(code=1013, reason=f"Speech model is {session_manager.state}")
+        return
+    try:
+        vosk_handler = session_manager.open_session(websocket.query_params.get("session_id"))
+    except SessionLimitReached as e:
+        logger.warning(str(e))
+        await websocket.close(code=1013, reason="Too many active sessions")
+        return
     vosk_handler.session_active = True
     
-    if not vosk_handler.start_ffmpeg_stream():
+    # Формат аудио: ?format=webm (по умолчанию, через ffmpeg) | pcm16 | opus
+    started, input_message = await _configure_input(
+        vosk_handler,
+        websocket.query_params.get("format", "webm"),
+        websocket.query_params.get("sample_rate", settings.SAMPLE_RATE),
+    )
+    if not started:
+        session_manager.close_session(vosk_handler)
         await websocket.close(code=1000, reason="Failed to start FFmpeg")
         return
+    # id для переподключения к тому же интервью (?session_id=...)
+    await websocket.send_json({"type": "session", "session_id": vosk_handler.session_id})
+    await websocket.send_json(input_message)
     
     # НЕ запускаем process_stream сразу - только при команде start_recording
     processing_task = None
@@ -176,19 +567,35 @@ async def websocket_endpoint(websocket: WebSocket):
                 break
             elif data["type"] == "websocket.receive":
                 if "bytes" in data:
-                    # Отправляем аудио данные в FFmpeg
-                    if vosk_handler.ffmpeg_process and vosk_handler.ffmpeg_process.stdin:
-                        try:
-                            vosk_handler.ffmpeg_process.stdin.write(data["bytes"])
-                            vosk_handler.ffmpeg_process.stdin.flush()
-                        except Exception as e:
-                            logger.error(f"Error writing to FFmpeg: {e}")
+                    # Аудио: PCM/Opus сразу в буфер, WebM - в FFmpeg
+                    try:
+                        await vosk_handler.feed_audio(data["bytes"])
+                    except Exception as e:
+                        logger.error(f"Error feeding {vosk_handler.input_format} audio: {e}")
+                    input_error = vosk_handler.pop_input_error()
+                    if input_error:
+                        # ffmpeg умер: аудио отбрасывается, пока клиент не пришлёт configure (перезапуск)
+                        await websocket.send_json({
+                            "type": "input_format",
+                            "format": vosk_handler.input_format,
+                            "sample_rate": settings.SAMPLE_RATE,
+                            "error": f"FFmpeg stopped: {input_error}",
+                        })
                 elif "text" in data:
                     # Обрабатываем текстовые команды
                     try:
                         message = json.loads(data["text"])
                         logger.info(f"Received message: {message}")
-                        if message.get("action") == "start_interview":
+                        if message.get("action") == "configure":
+                            started, input_message = await _configure_input(
+                                vosk_handler,
+                                message.get("format", "webm"),
+                                message.get("sample_rate", settings.SAMPLE_RATE),
+                            )
+                            if not started:
+                                input_message["error"] = "; ".join(filter(None, [input_message.get("error"), "Failed to start FFmpeg"]))
+                            await websocket.send_json(input_message)
+                        elif message.get("action") == "start_interview":
                             logger.info("Starting HR interview")
                             result = vosk_handler.hr_interviewer.start_interview()
                             await websocket.send_json(result)
@@ -201,13 +608,10 @@ async def websocket_endpoint(websocket: WebSocket):
                                 # Активируем сессию
                                 vosk_handler.session_active = True
                                 
-                                # Очищаем буферы для нового сеанса записи
-                                vosk_handler.pcm_buffer.clear()
+                                # Очищаем буферы для нового сеанса записи (аудиобуфер сбрасывает process_stream)
                                 vosk_handler.accumulated = ""
                                 vosk_handler.segments = []
                                 
-                                # Запускаем чтение PCM потока
-                                threading.Thread(target=vosk_handler.read_pcm_stream, daemon=True).start()
                                 # Запускаем обработку потока
                                 processing_task = asyncio.create_task(vosk_handler.process_stream(websocket))
                             
@@ -237,17 +641,8 @@ async def websocket_endpoint(websocket: WebSocket):
                 processing_task.cancel()
         except Exception as e:
             logger.warning(f"Failed to cancel processing task: {e}")
-        vosk_handler.session_active = False
-        
-        # В режиме интервью не сбрасываем сессию полностью
-        if not vosk_handler.hr_interviewer.interview_active:
-            vosk_handler.reset_session()
-        else:
-            # Только очищаем текущие сегменты, но сохраняем состояние интервью
-            vosk_handler.segments.clear()
-            vosk_handler.accumulated = ""
-        
-        vosk_handler.stop_ffmpeg_stream()
+        # Незавершённое интервью сохраняется для переподключения, остальное освобождается
+        session_manager.close_session(vosk_handler)
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,16 +1,62 @@
 from .analyzer import (
+    TransientLLMError,
+    LLMShedError,
     init_llm_client,
+    init_result_cache,
+    close_result_cache,
+    init_preprocessing,
+    cache_stats,
     analyze_candidate,
     analyze_job,
     analyze_matching,
+    analyze_candidate_async,
+    analyze_job_async,
+    analyze_matching_async,
+    analyze_matching_batch_async,
+)
+from .preprocess import preprocess_job, preprocess_resume, preprocess_stats
+from .parsing import (
+    init_parse_pool,
+    parse_document,
+    parse_upload_async,
     parse_upload_to_text,
+    shutdown_parse_pool,
 )
+from .batch_queue import BatchQueue
+from .job_registry import get_job, register_job
+from .lexical import BM25Index, lexical_shortlist
+from .pipeline import iter_scores, rank_resumes, shortlist_resumes, stream_ranking
 
 __all__ = [
+    "TransientLLMError",
+    "LLMShedError",
     "init_llm_client",
+    "init_result_cache",
+    "close_result_cache",
+    "init_preprocessing",
+    "cache_stats",
+    "preprocess_resume",
+    "preprocess_job",
+    "preprocess_stats",
     "analyze_candidate",
     "analyze_job",
     "analyze_matching",
+    "analyze_candidate_async",
+    "analyze_job_async",
+    "analyze_matching_async",
+    "analyze_matching_batch_async",
     "parse_upload_to_text",
+    "parse_document",
+    "parse_upload_async",
+    "init_parse_pool",
+    "shutdown_parse_pool",
+    "BatchQueue",
+    "register_job",
+    "get_job",
+    "BM25Index",
+    "lexical_shortlist",
+    "shortlist_resumes",
+    "iter_scores",
+    "rank_resumes",
+    "stream_ranking",
 ]
-
@@ -1,45 +1,97 @@
+import asyncio
+import hashlib
 import json
 import logging
-import os
 import re
-import tempfile
-import urllib.parse
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
-from openai import OpenAI
+from openai import NOT_GIVEN, APIConnectionError, APIStatusError, AsyncOpenAI, OpenAI, RateLimitError
 
-logger = logging.getLogger(__name__)
-
-try:
-    import pymupdf4llm  # PDF extractor
-except Exception:
-    pymupdf4llm = None
-try:
-    import docx  # python-docx
-except Exception:
-    docx = None
-try:
-    from striprtf.striprtf import rtf_to_text  # RTF parser
-except Exception:
-    rtf_to_text = None
-try:
-    from bs4 import BeautifulSoup  # HTML parser
-except Exception:
-    BeautifulSoup = None
-try:
-    import chardet  # Character encoding detection
-except Exception:
-    chardet = None
+from .cache import ResultCache, make_key
+from .preprocess import count_tokens, preprocess_job, preprocess_resume
 
+logger = logging.getLogger(__name__)
 
 LLM_MODEL = "anthropic/claude-3.5-sonnet"
 _client: Optional[OpenAI] = None
+_async_client: Optional[AsyncOpenAI] = None
+_credentials: Optional[Dict] = None
+_timeout: Optional[float] = None
+_guard = None
+_max_concurrency = 16
+_llm_slots: Optional[asyncio.Semaphore] = None
+_cache: Optional[ResultCache] = None
+_preprocess = {"enabled": False, "resume_budget": 0, "job_budget": 0}
+# Ответ не ограничен max_tokens: закладываем типичный размер JSON-оценки в бюджет tokens/min
+_COMPLETION_TOKENS = 800
 
+class TransientLLMError(RuntimeError):
+    """The LLM call failed for a reason a later retry may fix (429, 5xx, timeout, connection)."""
+
+
+class LLMShedError(TransientLLMError):
+    """The guard refused the call without sending it (circuit open); see llm_retry_in()."""
+
+
+_EMPTY_JOB = {"degree": [], "experience": [], "technical_skill": [], "responsibility": [], "certificate": [], "soft_skill": []}
+
+
+def init_llm_client(api_key: Optional[str], max_concurrency: int = 16,
+                    base_url: str = "https://openrouter.ai/api/v1",
+                    client: Optional[AsyncOpenAI] = None, timeout: Optional[float] = None,
+                    guard=None) -> None:
+    """Configure LLM access. max_concurrency caps in-flight async calls process-wide.
+
+    Pass `client` to share an existing AsyncOpenAI (and its connection pool)
+    instead of opening a separate one; `timeout` applies to every async call.
+    `guard` is an optional LLMGuard-like object (`async call(endpoint, request,
+    tokens)`, `retry_in()`, `estimate_tokens(messages, max_tokens)` and the
+    `Unavailable` exception it raises when shedding) that wraps every async call.
+    The sync client behind analyze_* is only created on first use.
+    """
+    global _client, _async_client, _credentials, _timeout, _guard, _max_concurrency, _llm_slots
+    _max_concurrency = max(1, int(max_concurrency))
+    _llm_slots = None
+    _timeout = timeout
+    _guard = guard
+    _client = None
+    _credentials = {"base_url": base_url, "api_key": api_key} if api_key else None
+    if client is not None:
+        _async_client = client
+    elif api_key:
+        _async_client = AsyncOpenAI(base_url=base_url, api_key=api_key)
+
+
+def init_result_cache(path: Optional[str], max_entries: int = 2048,
+                      max_bytes: int = 64 * 1024 * 1024, ttl: float = 7 * 24 * 3600) -> None:
+    """Enable result caching. An empty path keeps only the in-memory tier."""
+    global _cache
+    _cache = ResultCache(path or None, max_entries=max_entries, max_bytes=max_bytes, ttl=ttl)
 
-def init_llm_client(api_key: Optional[str]) -> None:
-    global _client
-    if api_key:
-        _client = OpenAI(base_url="https://openrouter.ai/api/v1", api_key=api_key)
+
+def close_result_cache() -> None:
+    """Commit pending cache writes to disk (called on shutdown)."""
+    if _cache:
+        _cache.close()
+
+
+def init_preprocessing(enabled: bool = True, resume_budget: int = 3000, job_budget: int = 1500) -> None:
+    """Local text cleanup before candidate/job prompts; budgets are in tokens (0 = no trimming)."""
+    _preprocess.update(enabled=enabled, resume_budget=resume_budget, job_budget=job_budget)
+
+
+def cache_stats() -> Dict:
+    if not _cache:
+        return {"enabled": False}
+    return {"enabled": True, **_cache.stats()}
+
+
+def _get_llm_slots() -> asyncio.Semaphore:
+    # Created lazily so the semaphore binds to the running event loop
+    global _llm_slots
+    if _llm_slots is None:
+        _llm_slots = asyncio.Semaphore(_max_concurrency)
+    return _llm_slots
 
 
 def detect_language(text: str) -> str:
@@ -66,6 +118,14 @@ prompts = {
         "user_matching": (
             "JOB REQUIREMENTS: {job_json}\nCANDIDATE PROFILE: {candidate_json}\nReturn ONLY JSON."
         ),
+        "system_matching_batch": (
+            "Compare each candidate with the job independently. Return ONLY a JSON object keyed by candidate id; "
+            "each value has sections degree, experience, technical_skill, responsibility, certificate, soft_skill "
+            "(each has score from 0 to 100 and comment), and summary_comment."
+        ),
+        "user_matching_batch": (
+            "JOB REQUIREMENTS: {job_json}\nCANDIDATE PROFILES BY ID: {candidates_json}\nReturn ONLY JSON."
+        ),
     },
     "ru": {
         "system_candidate": "Давай рассуждать по шагам. Верни ТОЛЬКО JSON.",
@@ -85,6 +145,14 @@ prompts = {
         "user_matching": (
             "ТРЕБОВАНИЯ ВАКАНСИИ: {job_json}\nПРОФИЛЬ КАНДИДАТА: {candidate_json}\nВерни ТОЛЬКО JSON."
         ),
+        "system_matching_batch": (
+            "Сравни каждого кандидата с вакансией независимо. Верни ТОЛЬКО JSON-объект с ключами-id кандидатов; "
+            "значение для каждого — разделы degree, experience, technical_skill, responsibility, certificate, soft_skill "
+            "(каждый со score от 0 до 100 и comment), и summary_comment."
+        ),
+        "user_matching_batch": (
+            "ТРЕБОВАНИЯ ВАКАНСИИ: {job_json}\nПРОФИЛИ КАНДИДАТОВ ПО ID: {candidates_json}\nВерни ТОЛЬКО JSON."
+        ),
     },
 }
 
@@ -102,48 +170,99 @@ def _extract_json(content: str) -> Dict:
         return {}
 
 
-def analyze_candidate(cv_content: str) -> Dict:
-    if not _client:
-        return {"comment": "LLM not configured"}
+def _prompt_version(lang: str, kind: str) -> str:
+    """Short hash of the prompt templates, so editing a prompt invalidates cached results."""
+    templates = prompts[lang][f"system_{kind}"] + "\x1f" + prompts[lang][f"user_{kind}"]
+    return hashlib.sha256(templates.encode("utf-8")).hexdigest()[:12]
+
+
+def _cache_key(kind: str, text: str, lang: Optional[str] = None) -> Optional[str]:
+    if not _cache:
+        return None
+    lang = lang or detect_language(text)
+    return make_key(kind, LLM_MODEL, lang, _prompt_version(lang, kind), text)
+
+
+def _cache_get(key: Optional[str]) -> Optional[Dict]:
+    return _cache.get(key) if key else None
+
+
+async def _cache_get_async(key: Optional[str]) -> Optional[Dict]:
+    # Disk lookups run in a thread so a cold cache does not stall the event loop
+    return await _cache.get_async(key) if key else None
+
+
+def _cache_put(key: Optional[str], result: Dict) -> None:
+    # Empty dicts are parse failures and must not be pinned
+    if key and result:
+        _cache.put(key, result)
+
+
+def _matching_cache_text(job: Dict, candidate: Dict) -> str:
+    return json.dumps({"job": job, "candidate": candidate}, ensure_ascii=False, sort_keys=True)
+
+
+def _candidate_messages(cv_content: str) -> List[Dict]:
     lang = detect_language(cv_content)
     system_prompt = prompts[lang]["system_candidate"]
     user_prompt = prompts[lang]["user_candidate"].format(cv_content=cv_content)
-    completion = _client.chat.completions.create(
-        model=LLM_MODEL,
-        messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
-        temperature=0.1,
-    )
-    return _extract_json(completion.choices[0].message.content) or {}
+    return [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}]
 
 
-def analyze_job(job_description: str) -> Dict:
-    if not _client:
-        return {"degree": [], "experience": [], "technical_skill": [], "responsibility": [], "certificate": [], "soft_skill": []}
+def _job_messages(job_description: str) -> List[Dict]:
     lang = detect_language(job_description)
     system_prompt = prompts[lang]["system_job"]
     user_prompt = prompts[lang]["user_job"].format(job_description=job_description)
-    completion = _client.chat.completions.create(
-        model=LLM_MODEL,
-        messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
-        temperature=0.1,
-    )
-    return _extract_json(completion.choices[0].message.content) or {}
+    return [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}]
 
 
-def analyze_matching(job: Dict, candidate: Dict) -> Dict:
-    if not _client:
-        return {"score": 0.0, "summary_comment": "LLM not configured"}
-    lang = detect_language(json.dumps(candidate, ensure_ascii=False))
+def _matching_language(candidate: Dict) -> str:
+    return detect_language(json.dumps(candidate, ensure_ascii=False))
+
+
+def _matching_messages(job: Dict, candidate: Dict) -> List[Dict]:
+    lang = _matching_language(candidate)
     system_prompt = prompts[lang]["system_matching"]
     user_prompt = prompts[lang]["user_matching"].format(
         job_json=json.dumps(job, ensure_ascii=False), candidate_json=json.dumps(candidate, ensure_ascii=False)
     )
-    completion = _client.chat.completions.create(
-        model=LLM_MODEL,
-        messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
-        temperature=0.1,
+    return [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}]
+
+
+def _matching_batch_messages(job: Dict, candidates: Dict[str, Dict], lang: str) -> List[Dict]:
+    system_prompt = prompts[lang]["system_matching_batch"]
+    user_prompt = prompts[lang]["user_matching_batch"].format(
+        job_json=json.dumps(job, ensure_ascii=False), candidates_json=json.dumps(candidates, ensure_ascii=False)
     )
-    result = _extract_json(completion.choices[0].message.content) or {}
+    return [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}]
+
+
+def matching_prompt_tokens(value: Dict) -> int:
+    return count_tokens(json.dumps(value, ensure_ascii=False))
+
+
+def _prepare_candidate(cv_content: str):
+    """CV text for the prompt plus regex-extracted contacts"""
+    if not _preprocess["enabled"]:
+        return cv_content, {}
+    prepared, contacts, _ = preprocess_resume(cv_content, _preprocess["resume_budget"])
+    return prepared, contacts
+
+
+def _prepare_job(job_description: str) -> str:
+    if not _preprocess["enabled"]:
+        return job_description
+    return preprocess_job(job_description, _preprocess["job_budget"])[0]
+
+
+def _with_contacts(result: Dict, contacts: Dict) -> Dict:
+    # Contacts never reach the prompt when preprocessing is on; fill them from the regex pass
+    if contacts:
+        result = {**result, **contacts}
+    return result
+
+
+def _apply_weights(result: Dict) -> Dict:
     weights = {"degree": 0.1, "experience": 0.2, "technical_skill": 0.3, "responsibility": 0.25, "certificate": 0.1, "soft_skill": 0.05}
     try:
         weighted = sum((result.get(k, {}).get("score", 0) or 0) * w for k, w in weights.items())
@@ -153,131 +272,166 @@ def analyze_matching(job: Dict, candidate: Dict) -> Dict:
     return result
 
 
-def _clean_text(raw_text: str) -> str:
-    text = urllib.parse.unquote(raw_text or "")
-    text = text.replace('\\n', '\n').replace('\u200b', '')
-    text = re.sub(r'\[(https?://.*?)\]\(.*?\)', r'\1', text)
-    text = re.sub(r'^\s*[●*]\s*', '- ', text, flags=re.MULTILINE)
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    return '\n'.join([line.strip() for line in text.split('\n')]).strip()
+def _get_client() -> Optional[OpenAI]:
+    global _client
+    if _client is None and _credentials:
+        _client = OpenAI(**_credentials)
+    return _client
 
 
-def parse_upload_to_text(upload) -> str:
-    filename = getattr(upload, 'filename', 'unknown')
-    suffix = os.path.splitext(filename or '')[1].lower()
-    logger.info(f"Parsing file: {filename}, detected extension: {suffix}")
-    tmp_path = None
-    try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            data = upload.file.read()
-            tmp.write(data)
-            tmp_path = tmp.name
-        
-        # PDF files
-        if suffix == '.pdf' and pymupdf4llm:
-            txt = pymupdf4llm.to_markdown(tmp_path)
-            return _clean_text(txt)
-        
-        # Word documents
-        if suffix in ('.docx', '.doc') and docx:
-            try:
-                logger.info(f"Attempting to parse DOCX file: {getattr(upload, 'filename', 'unknown')}")
-                d = docx.Document(tmp_path)
-                paragraphs = [p.text for p in d.paragraphs if p.text.strip()]
-                txt = '\n'.join(paragraphs)
-                logger.info(f"Successfully extracted {len(txt)} characters from DOCX")
-                if txt.strip():
-                    return _clean_text(txt)
-                else:
-                    logger.warning("DOCX file appears to be empty or contains no readable text")
-            except Exception as e:
-                logger.error(f"Error parsing DOCX file: {e}")
-                # Try alternative approach for corrupted DOCX files
-                try:
-                    import zipfile
-                    with zipfile.ZipFile(tmp_path, 'r') as zip_file:
-                        # Try to extract text from document.xml
-                        if 'word/document.xml' in zip_file.namelist():
-                            xml_content = zip_file.read('word/document.xml').decode('utf-8', errors='ignore')
-                            # Simple regex to extract text between XML tags
-                            import re
-                            text_matches = re.findall(r'<w:t[^>]*>([^<]*)</w:t>', xml_content)
-                            if text_matches:
-                                txt = ' '.join(text_matches)
-                                logger.info(f"Extracted text from DOCX XML: {len(txt)} characters")
-                                return _clean_text(txt)
-                except Exception as e2:
-                    logger.error(f"Alternative DOCX parsing also failed: {e2}")
-        
-        # RTF files
-        if suffix == '.rtf' and rtf_to_text:
-            try:
-                with open(tmp_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    rtf_content = f.read()
-                txt = rtf_to_text(rtf_content)
-                return _clean_text(txt)
-            except Exception:
-                # Try with different encodings
-                try:
-                    if chardet:
-                        detected = chardet.detect(data)
-                        encoding = detected.get('encoding') if detected else None
-                        if not encoding or encoding is None:
-                            encoding = 'utf-8'
-                    else:
-                        encoding = 'utf-8'
-                    
-                    rtf_content = data.decode(encoding, errors='ignore')
-                    txt = rtf_to_text(rtf_content)
-                    return _clean_text(txt)
-                except Exception:
-                    pass
-        
-        # HTML files
-        if suffix in ('.html', '.htm') and BeautifulSoup:
-            try:
-                if chardet:
-                    detected = chardet.detect(data)
-                    encoding = detected.get('encoding') if detected else None
-                    if not encoding or encoding is None:
-                        encoding = 'utf-8'
-                else:
-                    encoding = 'utf-8'
-                
-                html_content = data.decode(encoding, errors='ignore')
-                soup = BeautifulSoup(html_content, 'html.parser')
-                txt = soup.get_text(separator='\n')
-                return _clean_text(txt)
-            except Exception:
-                pass
-        
-        # Plain text files with encoding detection
+def _complete(messages: List[Dict]) -> str:
+    completion = _get_client().chat.completions.create(model=LLM_MODEL, messages=messages, temperature=0.1)
+    return completion.choices[0].message.content
+
+
+def llm_retry_in() -> float:
+    """Seconds until the guard lets LLM calls through again (0 when calls are accepted)"""
+    return _guard.retry_in() if _guard else 0.0
+
+
+def _is_transient(error: Exception) -> bool:
+    if isinstance(error, (RateLimitError, APIConnectionError)):
+        return True
+    return isinstance(error, APIStatusError) and (error.status_code >= 500 or error.status_code in (408, 409))
+
+
+async def _complete_async(messages: List[Dict], endpoint: str) -> str:
+    """Async completion text; transient provider failures are raised as TransientLLMError."""
+    def request():
+        return _async_client.chat.completions.create(
+            model=LLM_MODEL, messages=messages, temperature=0.1,
+            timeout=_timeout if _timeout is not None else NOT_GIVEN
+        )
+
+    # Global cap on in-flight LLM calls shared by every request in the process
+    async with _get_llm_slots():
         try:
-            if chardet:
-                detected = chardet.detect(data)
-                encoding = detected.get('encoding') if detected else None
-                # Ensure encoding is not None
-                if not encoding or encoding is None:
-                    encoding = 'utf-8'
-                logger.info(f"Detected encoding: {encoding}")
-                txt = data.decode(encoding, errors='ignore')
+            if _guard is None:
+                completion = await request()
             else:
-                txt = data.decode('utf-8', errors='ignore')
-            
-            if txt.strip():
-                logger.info(f"Successfully extracted {len(txt)} characters as plain text")
-                return _clean_text(txt)
-            else:
-                logger.warning("File appears to be empty")
-                return ''
+                tokens = _guard.estimate_tokens(messages, _COMPLETION_TOKENS)
+                completion = await _guard.call(endpoint, request, tokens=tokens)
         except Exception as e:
-            logger.error(f"Error parsing as plain text: {e}")
-            return ''
-    finally:
-        if tmp_path:
-            try:
-                os.unlink(tmp_path)
-            except Exception:
-                pass
+            # Only the guard's own refusal is a shed (nothing was sent); a 4xx stays permanent
+            if _guard is not None and isinstance(e, _guard.Unavailable):
+                raise LLMShedError(f"{endpoint}: {e}") from e
+            if _is_transient(e):
+                raise TransientLLMError(f"{endpoint}: {e}") from e
+            raise
+    return completion.choices[0].message.content
 
 
+def analyze_candidate(cv_content: str) -> Dict:
+    if not _credentials:
+        return {"comment": "LLM not configured"}
+    cv_content, contacts = _prepare_candidate(cv_content)
+    key = _cache_key("candidate", cv_content)
+    cached = _cache_get(key)
+    if cached is not None:
+        return _with_contacts(cached, contacts)
+    result = _extract_json(_complete(_candidate_messages(cv_content))) or {}
+    _cache_put(key, result)
+    return _with_contacts(result, contacts)
+
+
+def analyze_job(job_description: str) -> Dict:
+    if not _credentials:
+        return dict(_EMPTY_JOB)
+    job_description = _prepare_job(job_description)
+    key = _cache_key("job", job_description)
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+    result = _extract_json(_complete(_job_messages(job_description))) or {}
+    _cache_put(key, result)
+    return result
+
+
+def analyze_matching(job: Dict, candidate: Dict) -> Dict:
+    if not _credentials:
+        return {"score": 0.0, "summary_comment": "LLM not configured"}
+    key = _cache_key("matching", _matching_cache_text(job, candidate), _matching_language(candidate))
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+    result = _extract_json(_complete(_matching_messages(job, candidate))) or {}
+    result = _apply_weights(result)
+    _cache_put(key, result)
+    return result
+
+
+async def analyze_candidate_async(cv_content: str) -> Dict:
+    if not _async_client:
+        return {"comment": "LLM not configured"}
+    cv_content, contacts = _prepare_candidate(cv_content)
+    key = _cache_key("candidate", cv_content)
+    cached = await _cache_get_async(key)
+    if cached is not None:
+        return _with_contacts(cached, contacts)
+    result = _extract_json(await _complete_async(_candidate_messages(cv_content), "resume_candidate")) or {}
+    _cache_put(key, result)
+    return _with_contacts(result, contacts)
+
+
+async def analyze_job_async(job_description: str) -> Dict:
+    if not _async_client:
+        return dict(_EMPTY_JOB)
+    job_description = _prepare_job(job_description)
+    key = _cache_key("job", job_description)
+    cached = await _cache_get_async(key)
+    if cached is not None:
+        return cached
+    result = _extract_json(await _complete_async(_job_messages(job_description), "resume_job")) or {}
+    _cache_put(key, result)
+    return result
+
+
+async def analyze_matching_async(job: Dict, candidate: Dict) -> Dict:
+    if not _async_client:
+        return {"score": 0.0, "summary_comment": "LLM not configured"}
+    key = _cache_key("matching", _matching_cache_text(job, candidate), _matching_language(candidate))
+    cached = await _cache_get_async(key)
+    if cached is not None:
+        return cached
+    result = _extract_json(await _complete_async(_matching_messages(job, candidate), "resume_matching")) or {}
+    result = _apply_weights(result)
+    _cache_put(key, result)
+    return result
+
+
+async def analyze_matching_batch_async(job: Dict, candidates: Dict[str, Dict]) -> Dict[str, Dict]:
+    """Score several parsed candidates against one job in a single call.
+
+    candidates: {candidate_id: profile}. Returns {candidate_id: result} with the
+    weighted score applied per candidate. Candidates missing from the reply
+    fall back to analyze_matching_async.
+    """
+    if not _async_client:
+        return {cid: {"score": 0.0, "summary_comment": "LLM not configured"} for cid in candidates}
+    results: Dict[str, Dict] = {}
+    keys: Dict[str, Optional[str]] = {}
+    pending: Dict[str, Dict] = {}
+    for cid, candidate in candidates.items():
+        lang = _matching_language(candidate)
+        keys[cid] = _cache_key("matching_batch", _matching_cache_text(job, candidate), lang)
+        cached = await _cache_get_async(keys[cid])
+        if cached is not None:
+            results[cid] = cached
+        else:
+            pending[cid] = candidate
+    if len(pending) == 1:
+        cid, candidate = next(iter(pending.items()))
+        results[cid] = await analyze_matching_async(job, candidate)
+        return results
+    if pending:
+        lang = detect_language(json.dumps(pending, ensure_ascii=False))
+        reply = _extract_json(await _complete_async(_matching_batch_messages(job, pending, lang), "resume_matching_batch")) or {}
+        for cid, candidate in pending.items():
+            section = reply.get(cid)
+            if isinstance(section, dict) and section:
+                results[cid] = _apply_weights(section)
+                _cache_put(keys[cid], results[cid])
+            else:
+                logger.warning(f"Batched matching reply has no entry for candidate {cid}, scoring it alone")
+                results[cid] = await analyze_matching_async(job, candidate)
+    return results
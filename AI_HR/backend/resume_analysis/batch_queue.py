@@ -0,0 +1,356 @@
+import asyncio
+import json
+import logging
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+from .analyzer import LLMShedError, TransientLLMError, llm_retry_in
+from .job_registry import register_job
+from .pipeline import score_resume
+
+logger = logging.getLogger(__name__)
+
+_COMMIT_EVERY = 50  # checkpoint writes per transaction
+_COMMIT_INTERVAL = 1.0  # seconds an idle DB thread keeps writes uncommitted
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS batches (
+    id TEXT PRIMARY KEY,
+    job_id TEXT,
+    job_description TEXT,
+    requirements TEXT,
+    status TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS batch_items (
+    batch_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    resume TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    finished_at REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    retry_at REAL,
+    PRIMARY KEY (batch_id, idx)
+);
+CREATE INDEX IF NOT EXISTS batch_items_status ON batch_items (status, batch_id, idx);
+"""
+
+
+def _sort_results(results: List[Dict]) -> List[Dict]:
+    return sorted(results, key=lambda x: x.get("score", 0.0), reverse=True)
+
+
+class BatchQueue:
+    """SQLite-backed queue of resume scoring work drained by in-process workers.
+
+    Every resume is a row; a worker marks it running, scores it and stores
+    the result, so each finished resume is a checkpoint. On start, rows
+    left running by a previous process go back to pending and only the
+    unfinished resumes are scored again.
+
+    A transient LLM failure (429, 5xx, timeout, provider unavailable) is
+    not a result: the resume goes back to pending with exponential backoff
+    and is marked failed only after `max_attempts` tries.
+
+    All SQLite work runs on one dedicated thread, so the event loop never
+    waits on the disk. Claims and checkpoints are committed in groups of
+    _COMMIT_EVERY writes, or after _COMMIT_INTERVAL seconds without new
+    work; a crash loses at most that window, and those resumes are scored
+    again. submit() commits at once.
+    """
+
+    def __init__(self, path: str, workers: int = 4, max_attempts: int = 5, retry_delay: float = 30.0):
+        self.path = path
+        self.workers = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_delay = retry_delay
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(batch_items)")}
+        # Queues created before retries existed
+        if "attempts" not in columns:
+            self._db.execute("ALTER TABLE batch_items ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+        if "retry_at" not in columns:
+            self._db.execute("ALTER TABLE batch_items ADD COLUMN retry_at REAL")
+        self._db.commit()
+        self._uncommitted = 0
+        self._calls: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._db_thread: Optional[threading.Thread] = None
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    async def start(self) -> None:
+        self._db_thread = threading.Thread(target=self._db_loop, name="batch-queue-db", daemon=True)
+        self._db_thread.start()
+        requeued = await self._run(self._requeue_running)
+        if requeued:
+            logger.info(f"Batch queue: {requeued} interrupted resumes re-queued")
+        self._wakeup = asyncio.Event()
+        self._wakeup.set()
+        self._tasks = [asyncio.create_task(self._worker(n)) for n in range(self.workers)]
+        logger.info(f"Batch queue started with {self.workers} workers ({self.path})")
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Resumes interrupted mid-scoring are picked up again on next start
+        await self._run(self._requeue_running)
+        self._calls.put(None)  # commits what is left and ends the thread
+        await asyncio.to_thread(self._db_thread.join)
+        self._db_thread = None
+
+    async def _run(self, fn: Callable, *args):
+        """Run `fn(*args)` on the DB thread and wait for its result without blocking the loop"""
+        future: Future = Future()
+        self._calls.put((future, fn, args))
+        return await asyncio.wrap_future(future)
+
+    def _db_loop(self) -> None:
+        while True:
+            try:
+                # Есть незакоммиченные записи - ждём работу не дольше интервала, потом коммитим
+                item = self._calls.get(timeout=_COMMIT_INTERVAL if self._uncommitted else None)
+            except queue.Empty:
+                self._commit()
+                continue
+            if item is None:
+                self._commit()
+                return
+            future, fn, args = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+            if self._uncommitted >= _COMMIT_EVERY:
+                self._commit()
+
+    def _commit(self) -> None:
+        if self._uncommitted:
+            self._db.commit()
+            self._uncommitted = 0
+
+    def _requeue_running(self) -> int:
+        requeued = self._db.execute("UPDATE batch_items SET status = 'pending' WHERE status = 'running'").rowcount
+        self._db.commit()
+        self._uncommitted = 0
+        return requeued
+
+    async def submit(self, resumes: List[Dict], job_description: Optional[str] = None,
+               job: Optional[Dict] = None, failed: Optional[List[Dict]] = None) -> str:
+        """Queue resumes for scoring; returns the batch id immediately.
+
+        Either a registered job (with requirements) or the job text is
+        required; the text is analyzed by the first worker that needs it.
+        `failed` are final results known up front (e.g. unparsable uploads).
+        """
+        batch_id = await self._run(self._insert_batch, resumes, job_description, job, failed or [])
+        logger.info(f"Batch {batch_id} queued: {len(resumes)} resumes")
+        if self._wakeup:
+            self._wakeup.set()
+        return batch_id
+
+    def _insert_batch(self, resumes: List[Dict], job_description: Optional[str],
+                      job: Optional[Dict], failed: List[Dict]) -> str:
+        batch_id = uuid.uuid4().hex[:16]
+        now = time.time()
+        requirements = json.dumps(job["requirements"], ensure_ascii=False) if job else None
+        self._db.execute(
+            "INSERT INTO batches (id, job_id, job_description, requirements, status, total, created_at) "
+            "VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+            (batch_id, job["job_id"] if job else None, job_description, requirements, len(resumes) + len(failed), now),
+        )
+        rows = [(batch_id, i, json.dumps(r, ensure_ascii=False), "pending", None, None) for i, r in enumerate(resumes)]
+        rows += [
+            (batch_id, len(resumes) + i, json.dumps({}), "done", json.dumps(r, ensure_ascii=False), now)
+            for i, r in enumerate(failed)
+        ]
+        self._db.executemany(
+            "INSERT INTO batch_items (batch_id, idx, resume, status, result, finished_at) VALUES (?, ?, ?, ?, ?, ?)", rows
+        )
+        if not resumes:
+            self._db.execute("UPDATE batches SET status = 'done', finished_at = ? WHERE id = ?", (now, batch_id))
+        self._db.commit()
+        self._uncommitted = 0
+        return batch_id
+
+    async def status(self, batch_id: str, top_k: int = 10) -> Optional[Dict]:
+        return await self._run(self._status, batch_id, top_k)
+
+    async def results(self, batch_id: str) -> Optional[List[Dict]]:
+        return await self._run(self._results, batch_id)
+
+    def _status(self, batch_id: str, top_k: int) -> Optional[Dict]:
+        row = self._db.execute(
+            "SELECT job_id, status, total, created_at, started_at, finished_at FROM batches WHERE id = ?", (batch_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        job_id, status, total, created_at, started_at, finished_at = row
+        results = self._finished_results(batch_id)
+        failed, retrying = self._db.execute(
+            "SELECT COALESCE(SUM(status = 'failed'), 0), COALESCE(SUM(status = 'pending' AND attempts > 0), 0) "
+            "FROM batch_items WHERE batch_id = ?",
+            (batch_id,),
+        ).fetchone()
+        processed = self._db.execute(
+            "SELECT COUNT(*), MAX(finished_at) FROM batch_items WHERE batch_id = ? AND status = 'done' AND resume != '{}'",
+            (batch_id,),
+        ).fetchone()
+        throughput = 0.0
+        if started_at and processed[0] and processed[1] and processed[1] > started_at:
+            throughput = round(processed[0] / ((processed[1] - started_at) / 60.0), 2)
+        return {
+            "batch_id": batch_id,
+            "job_id": job_id,
+            "status": status,
+            "total": total,
+            "done": len(results),
+            "failed": failed,
+            "retrying": retrying,
+            "progress": round(len(results) / total, 4) if total else 1.0,
+            "resumes_per_minute": throughput,
+            "created_at": created_at,
+            "started_at": started_at,
+            "finished_at": finished_at,
+            "top": _sort_results(results)[:top_k],
+        }
+
+    def _results(self, batch_id: str) -> Optional[List[Dict]]:
+        if self._db.execute("SELECT 1 FROM batches WHERE id = ?", (batch_id,)).fetchone() is None:
+            return None
+        return _sort_results(self._finished_results(batch_id))
+
+    def _finished_results(self, batch_id: str) -> List[Dict]:
+        rows = self._db.execute(
+            "SELECT result FROM batch_items WHERE batch_id = ? AND status IN ('done', 'failed') ORDER BY idx",
+            (batch_id,),
+        ).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def _claim(self) -> Optional[tuple]:
+        row = self._db.execute(
+            "SELECT i.batch_id, i.idx, i.resume FROM batch_items i JOIN batches b ON b.id = i.batch_id "
+            "WHERE i.status = 'pending' AND (i.retry_at IS NULL OR i.retry_at <= ?) "
+            "ORDER BY b.created_at, i.idx LIMIT 1",
+            (time.time(),),
+        ).fetchone()
+        if row is None:
+            return None
+        batch_id, idx, _ = row
+        # Select and update run back to back on the single DB thread, so no other worker claims the row
+        self._db.execute("UPDATE batch_items SET status = 'running' WHERE batch_id = ? AND idx = ?", (batch_id, idx))
+        self._db.execute(
+            "UPDATE batches SET status = 'running', started_at = COALESCE(started_at, ?) WHERE id = ?",
+            (time.time(), batch_id),
+        )
+        self._uncommitted += 1
+        return row
+
+    async def _requirements(self, batch_id: str) -> Dict:
+        requirements, job_description = await self._run(self._load_requirements, batch_id)
+        if requirements is not None:
+            return json.loads(requirements)
+        # Workers of the same batch share one analysis through the registry's single-flight
+        job = await register_job(job_description or "")
+        if not job["requirements"]:
+            # Unparsable LLM reply: retry later instead of pinning {} to the batch
+            raise TransientLLMError("job description could not be analyzed")
+        await self._run(self._store_requirements, batch_id, job)
+        return job["requirements"]
+
+    def _load_requirements(self, batch_id: str) -> tuple:
+        return self._db.execute(
+            "SELECT requirements, job_description FROM batches WHERE id = ?", (batch_id,)
+        ).fetchone()
+
+    def _store_requirements(self, batch_id: str, job: Dict) -> None:
+        self._db.execute(
+            "UPDATE batches SET job_id = ?, requirements = ? WHERE id = ?",
+            (job["job_id"], json.dumps(job["requirements"], ensure_ascii=False), batch_id),
+        )
+        self._uncommitted += 1
+
+    def _release(self, batch_id: str, idx: int, retry_at: float) -> None:
+        self._db.execute(
+            "UPDATE batch_items SET status = 'pending', retry_at = ? WHERE batch_id = ? AND idx = ?",
+            (retry_at, batch_id, idx),
+        )
+        self._uncommitted += 1
+
+    def _retry_later(self, batch_id: str, idx: int, resume: Dict, error: Exception) -> None:
+        attempts = self._db.execute(
+            "SELECT attempts FROM batch_items WHERE batch_id = ? AND idx = ?", (batch_id, idx)
+        ).fetchone()[0] + 1
+        self._db.execute("UPDATE batch_items SET attempts = ? WHERE batch_id = ? AND idx = ?", (attempts, batch_id, idx))
+        if attempts >= self.max_attempts:
+            logger.error(f"Batch {batch_id}: resume {idx} failed after {attempts} attempts: {error}")
+            self._complete(batch_id, idx, {"name": resume.get("error_name", f"#{idx}"), "score": 0.0}, status="failed")
+            return
+        # Экспоненциальная пауза с разбросом, чтобы воркеры не вернулись к провайдеру разом
+        delay = self.retry_delay * 2 ** (attempts - 1) * random.uniform(0.5, 1.0)
+        logger.warning(f"Batch {batch_id}: resume {idx} attempt {attempts} failed ({error}), retrying in {delay:.0f} s")
+        self._release(batch_id, idx, time.time() + delay)
+
+    def _complete(self, batch_id: str, idx: int, result: Dict, status: str = "done") -> None:
+        now = time.time()
+        self._db.execute(
+            "UPDATE batch_items SET status = ?, result = ?, finished_at = ? WHERE batch_id = ? AND idx = ?",
+            (status, json.dumps(result, ensure_ascii=False), now, batch_id, idx),
+        )
+        remaining = self._db.execute(
+            "SELECT COUNT(*) FROM batch_items WHERE batch_id = ? AND status NOT IN ('done', 'failed')", (batch_id,)
+        ).fetchone()[0]
+        if not remaining:
+            self._db.execute("UPDATE batches SET status = 'done', finished_at = ? WHERE id = ?", (now, batch_id))
+            logger.info(f"Batch {batch_id} finished")
+        self._uncommitted += 1
+
+    async def _worker(self, n: int) -> None:
+        while True:
+            # While the LLM circuit is open, leave resumes pending instead of failing them one by one
+            pause = llm_retry_in()
+            if pause > 0:
+                await asyncio.sleep(min(pause, 5.0))
+                continue
+            claimed = await self._run(self._claim)
+            if claimed is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=5.0)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            batch_id, idx, resume_json = claimed
+            resume = json.loads(resume_json)
+            try:
+                requirements = await self._requirements(batch_id)
+                result = await score_resume(requirements, resume, raise_transient=True)
+            except asyncio.CancelledError:
+                raise
+            except LLMShedError:
+                # Not attempted: give the claim back until the circuit lets calls through
+                await self._run(self._release, batch_id, idx, time.time() + llm_retry_in())
+                continue
+            except TransientLLMError as e:
+                await self._run(self._retry_later, batch_id, idx, resume, e)
+                continue
+            except Exception as e:
+                logger.error(f"Batch worker {n}: resume {idx} of batch {batch_id} failed: {e}")
+                result = {"name": resume.get("error_name", f"#{idx}"), "score": 0.0}
+            await self._run(self._complete, batch_id, idx, result)
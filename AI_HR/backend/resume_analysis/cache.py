@@ -0,0 +1,211 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_EXPIRE_EVERY = 500  # disk writes between sweeps of expired rows
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form used for cache keys: NFC, collapsed whitespace, stripped."""
+    text = unicodedata.normalize("NFC", text or "")
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def make_key(kind: str, model: str, lang: str, prompt_version: str, text: str) -> str:
+    payload = "\x1f".join([kind, model, lang, prompt_version, normalize_text(text)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Two-tier cache of LLM analysis results.
+
+    Tier 1 is an in-memory LRU bounded by entry count and bytes, tier 2 an
+    optional SQLite file. Both tiers expire entries after `ttl` seconds.
+    Values are stored as JSON, so every hit returns a fresh copy.
+
+    Disk writes go through a background writer thread with its own
+    connection, so put() never waits on SQLite; queued writes are committed
+    in one transaction and expired rows are swept every _EXPIRE_EVERY writes.
+    Coroutines read through get_async(), which checks memory inline and
+    runs a disk lookup in a worker thread.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 2048,
+                 max_bytes: int = 64 * 1024 * 1024, ttl: float = 7 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Tuple[float, str, int]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._db: Optional[sqlite3.Connection] = None
+        self._writes: "queue.Queue[Optional[Tuple[str, str, float]]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+                )
+                self._db.execute("CREATE INDEX IF NOT EXISTS results_created_at ON results (created_at)")
+                self._db.commit()
+                self._writer = threading.Thread(target=self._write_loop, name="result-cache-writer", daemon=True)
+                self._writer.start()
+            except Exception as e:
+                logger.error(f"Result cache disk tier disabled ({path}): {e}")
+                self._db = None
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Look up both tiers; a memory miss blocks on SQLite, so coroutines use get_async()"""
+        value = self._get_memory(key)
+        return value if value is not None else self._get_disk(key)
+
+    async def get_async(self, key: str) -> Optional[Dict]:
+        value = self._get_memory(key)
+        if value is not None:
+            return value
+        if self._db is None:
+            return self._get_disk(key)  # без диска только учитывает промах
+        return await asyncio.to_thread(self._get_disk, key)
+
+    def _get_memory(self, key: str) -> Optional[Dict]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created_at, payload, _ = entry
+                if now - created_at < self.ttl:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return json.loads(payload)
+                self._evict(key)
+        return None
+
+    def _get_disk(self, key: str) -> Optional[Dict]:
+        now = time.time()
+        with self._lock:
+            if self._db is not None:
+                try:
+                    row = self._db.execute(
+                        "SELECT value, created_at FROM results WHERE key = ?", (key,)
+                    ).fetchone()
+                except Exception as e:
+                    logger.warning(f"Result cache read failed: {e}")
+                    row = None
+                if row and now - row[1] < self.ttl:
+                    self.disk_hits += 1
+                    self._remember(key, row[1], row[0])
+                    return json.loads(row[0])
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: Dict) -> None:
+        payload = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, payload)
+        if self._writer is not None:
+            self._writes.put((key, payload, now))
+
+    def flush(self) -> None:
+        """Wait until queued disk writes are committed"""
+        if self._writer is not None:
+            self._writes.join()
+
+    def close(self) -> None:
+        """Commit queued writes and stop the writer thread"""
+        if self._writer is not None:
+            self._writes.put(None)
+            self._writer.join()
+            self._writer = None
+
+    def _write_loop(self) -> None:
+        db = sqlite3.connect(self.path)
+        since_expire = 0
+        while True:
+            batch = [self._writes.get()]
+            while True:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            rows = [item for item in batch if item is not None]
+            try:
+                if rows:
+                    db.executemany("INSERT OR REPLACE INTO results (key, value, created_at) VALUES (?, ?, ?)", rows)
+                    since_expire += len(rows)
+                    if since_expire >= _EXPIRE_EVERY:
+                        db.execute("DELETE FROM results WHERE created_at < ?", (time.time() - self.ttl,))
+                        since_expire = 0
+                    db.commit()
+            except Exception as e:
+                logger.warning(f"Result cache write failed: {e}")
+            for _ in batch:
+                self._writes.task_done()
+            if len(rows) < len(batch):
+                db.close()
+                return
+
+    def clear(self) -> None:
+        self.flush()
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM results")
+                self._db.commit()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            disk_entries, disk_bytes = 0, 0
+            if self._db is not None:
+                try:
+                    disk_entries, disk_bytes = self._db.execute(
+                        "SELECT COUNT(*), COALESCE(SUM(LENGTH(CAST(value AS BLOB))), 0) FROM results"
+                    ).fetchone()
+                except Exception:
+                    pass
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_entries": disk_entries,
+                "disk_bytes": disk_bytes,
+            }
+
+    def _remember(self, key: str, created_at: float, payload: str) -> None:
+        self._evict(key)
+        size = len(payload.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        self._memory[key] = (created_at, payload, size)
+        self._memory_bytes += size
+        while self._memory and (len(self._memory) > self.max_entries or self._memory_bytes > self.max_bytes):
+            self._evict(next(iter(self._memory)))
+
+    def _evict(self, key: str) -> None:
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= entry[2]
@@ -0,0 +1,78 @@
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from .analyzer import analyze_job_async
+from .cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+
+def job_id_for(job_description: str) -> str:
+    """Stable id of a vacancy: hash of its normalized text."""
+    return hashlib.sha256(normalize_text(job_description).encode("utf-8")).hexdigest()[:16]
+
+
+class JobRegistry:
+    """Parsed vacancies addressable by id.
+
+    Concurrent registrations of the same text share one in-flight
+    analyze_job call (single-flight); the oldest jobs are dropped once
+    max_jobs is exceeded.
+    """
+
+    def __init__(self, max_jobs: int = 512):
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, Dict]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def register(self, job_description: str) -> Dict:
+        job_id = job_id_for(job_description)
+        known = self.get(job_id)
+        if known is not None:
+            return known
+        future = self._inflight.get(job_id)
+        if future is None:
+            future = asyncio.ensure_future(self._analyze(job_id, job_description))
+            self._inflight[job_id] = future
+            future.add_done_callback(lambda _: self._inflight.pop(job_id, None))
+        else:
+            logger.info(f"Joining in-flight analysis of job {job_id}")
+        # shield: one cancelled waiter must not cancel the call for the others
+        return await asyncio.shield(future)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        job = self._jobs.get(job_id)
+        if job is not None:
+            self._jobs.move_to_end(job_id)
+        return job
+
+    async def _analyze(self, job_id: str, job_description: str) -> Dict:
+        requirements = await analyze_job_async(job_description)
+        job = {
+            "job_id": job_id,
+            "requirements": requirements,
+            "job_description": job_description,
+            "created_at": time.time(),
+        }
+        # An empty dict means the LLM reply could not be parsed; do not pin it
+        if requirements:
+            self._jobs[job_id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        return job
+
+
+_registry = JobRegistry()
+
+
+async def register_job(job_description: str) -> Dict:
+    """Analyze (or reuse) a job description; returns {job_id, requirements, job_description, created_at}."""
+    return await _registry.register(job_description)
+
+
+def get_job(job_id: str) -> Optional[Dict]:
+    return _registry.get(job_id)
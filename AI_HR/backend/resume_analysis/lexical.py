@@ -0,0 +1,103 @@
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+# Words plus tech tokens such as c++, c#, node.js, 1c
+_TOKEN_RE = re.compile(r"[0-9a-zа-яё][0-9a-zа-яё+#.\-]*", re.IGNORECASE)
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for tok in _TOKEN_RE.findall((text or "").lower().replace("ё", "е")):
+        tok = tok.rstrip(".-")
+        if len(tok) > 1 or tok.isdigit():
+            tokens.append(tok)
+    return tokens
+
+
+def _flatten(value) -> Iterable[str]:
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for v in value.values():
+            yield from _flatten(v)
+    elif isinstance(value, (list, tuple)):
+        for v in value:
+            yield from _flatten(v)
+    elif value is not None:
+        yield str(value)
+
+
+class BM25Index:
+    """Inverted index over resume texts with vectorized Okapi BM25 scoring.
+
+    Postings are kept per term as parallel numpy arrays of document ids
+    and term frequencies, so a query touches only the documents that
+    contain its terms.
+    """
+
+    def __init__(self, documents: List[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.n_docs = len(documents)
+        self.vocab: Dict[str, int] = {}
+        postings_docs: List[List[int]] = []
+        postings_tfs: List[List[int]] = []
+        lengths = np.zeros(self.n_docs, dtype=np.float32)
+        for doc_id, text in enumerate(documents):
+            counts = Counter(tokenize(text))
+            lengths[doc_id] = sum(counts.values())
+            for term, tf in counts.items():
+                term_id = self.vocab.setdefault(term, len(self.vocab))
+                if term_id == len(postings_docs):
+                    postings_docs.append([])
+                    postings_tfs.append([])
+                postings_docs[term_id].append(doc_id)
+                postings_tfs[term_id].append(tf)
+        self._docs = [np.asarray(d, dtype=np.int32) for d in postings_docs]
+        self._tfs = [np.asarray(t, dtype=np.float32) for t in postings_tfs]
+        df = np.asarray([len(d) for d in postings_docs], dtype=np.float32)
+        self._idf = np.log1p((self.n_docs - df + 0.5) / (df + 0.5))
+        avg_len = float(lengths.mean()) if self.n_docs else 0.0
+        # Per-document length normalisation term of the BM25 denominator
+        self._norm = self.k1 * (1.0 - self.b + self.b * lengths / (avg_len or 1.0))
+
+    def score(self, query_weights: Dict[str, float]) -> np.ndarray:
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for term, weight in query_weights.items():
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            docs, tfs = self._docs[term_id], self._tfs[term_id]
+            contrib = self._idf[term_id] * tfs * (self.k1 + 1.0) / (tfs + self._norm[docs])
+            np.add.at(scores, docs, weight * contrib)
+        return scores
+
+
+def job_query(job_text: str, requirements: Dict, skill_boost: float = 2.0) -> Dict[str, float]:
+    """Query term weights: job text and parsed requirements, technical_skill terms boosted."""
+    weights: Dict[str, float] = {}
+    for term in tokenize(job_text) + tokenize(" ".join(_flatten(requirements))):
+        weights[term] = 1.0
+    for term in tokenize(" ".join(_flatten((requirements or {}).get("technical_skill")))):
+        weights[term] = skill_boost
+    return weights
+
+
+def lexical_shortlist(job_text: str, requirements: Dict, resumes: List[Dict], k: int) -> Tuple[List[Dict], List[Dict]]:
+    """Split resumes into the top-k by BM25 and the rest.
+
+    Every resume dict gets a "lexical_score"; both lists are ordered by it.
+    """
+    if not resumes:
+        return [], []
+    index = BM25Index([r["text"] for r in resumes])
+    scores = index.score(job_query(job_text, requirements))
+    # Stable descending order keeps submission order among equal scores
+    order = np.argsort(-scores, kind="stable")
+    for i, r in enumerate(resumes):
+        r["lexical_score"] = round(float(scores[i]), 4)
+    ranked = [resumes[i] for i in order]
+    return ranked[:k], ranked[k:]
@@ -0,0 +1,197 @@
+import asyncio
+import io
+import logging
+import os
+import re
+import tempfile
+import time
+import urllib.parse
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pymupdf4llm  # PDF extractor
+except Exception:
+    pymupdf4llm = None
+try:
+    import pymupdf  # opens PDFs from memory for pymupdf4llm
+except Exception:
+    pymupdf = None
+try:
+    import docx  # python-docx
+except Exception:
+    docx = None
+try:
+    from striprtf.striprtf import rtf_to_text  # RTF parser
+except Exception:
+    rtf_to_text = None
+try:
+    from bs4 import BeautifulSoup  # HTML parser
+except Exception:
+    BeautifulSoup = None
+try:
+    import chardet  # Character encoding detection
+except Exception:
+    chardet = None
+
+
+_parse_workers: Optional[int] = None
+_parse_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _clean_text(raw_text: str) -> str:
+    text = urllib.parse.unquote(raw_text or "")
+    text = text.replace('\\n', '\n').replace('\u200b', '')
+    text = re.sub(r'\[(https?://.*?)\]\(.*?\)', r'\1', text)
+    text = re.sub(r'^\s*[●*]\s*', '- ', text, flags=re.MULTILINE)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    return '\n'.join([line.strip() for line in text.split('\n')]).strip()
+
+
+def _decode(data: bytes) -> str:
+    encoding = None
+    if chardet:
+        detected = chardet.detect(data)
+        encoding = detected.get('encoding') if detected else None
+    return data.decode(encoding or 'utf-8', errors='ignore')
+
+
+def _pdf_to_markdown(data: bytes) -> str:
+    if pymupdf:
+        with pymupdf.open(stream=data, filetype="pdf") as doc:
+            return pymupdf4llm.to_markdown(doc)
+    # Old pymupdf4llm builds only take a path
+    tmp_path = None
+    try:
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp:
+            tmp.write(data)
+            tmp_path = tmp.name
+        return pymupdf4llm.to_markdown(tmp_path)
+    finally:
+        if tmp_path:
+            try:
+                os.unlink(tmp_path)
+            except Exception:
+                pass
+
+
+def _docx_to_text(data: bytes) -> str:
+    try:
+        d = docx.Document(io.BytesIO(data))
+        paragraphs = [p.text for p in d.paragraphs if p.text.strip()]
+        txt = '\n'.join(paragraphs)
+        logger.info(f"Successfully extracted {len(txt)} characters from DOCX")
+        if txt.strip():
+            return txt
+        logger.warning("DOCX file appears to be empty or contains no readable text")
+    except Exception as e:
+        logger.error(f"Error parsing DOCX file: {e}")
+        # Try alternative approach for corrupted DOCX files
+        try:
+            with zipfile.ZipFile(io.BytesIO(data), 'r') as zip_file:
+                # Try to extract text from document.xml
+                if 'word/document.xml' in zip_file.namelist():
+                    xml_content = zip_file.read('word/document.xml').decode('utf-8', errors='ignore')
+                    text_matches = re.findall(r'<w:t[^>]*>([^<]*)</w:t>', xml_content)
+                    if text_matches:
+                        txt = ' '.join(text_matches)
+                        logger.info(f"Extracted text from DOCX XML: {len(txt)} characters")
+                        return txt
+        except Exception as e2:
+            logger.error(f"Alternative DOCX parsing also failed: {e2}")
+    return ''
+
+
+def parse_document(filename: str, data: bytes) -> str:
+    """Extract clean text from an uploaded document held in memory.
+
+    Pure function of (filename, bytes), so it can run in a worker process.
+    """
+    suffix = os.path.splitext(filename or '')[1].lower()
+    logger.info(f"Parsing file: {filename}, detected extension: {suffix}")
+
+    # PDF files
+    if suffix == '.pdf' and pymupdf4llm:
+        return _clean_text(_pdf_to_markdown(data))
+
+    # Word documents
+    if suffix in ('.docx', '.doc') and docx:
+        txt = _docx_to_text(data)
+        if txt:
+            return _clean_text(txt)
+
+    # RTF files
+    if suffix == '.rtf' and rtf_to_text:
+        try:
+            return _clean_text(rtf_to_text(data.decode('utf-8', errors='ignore')))
+        except Exception:
+            # Try with detected encoding
+            try:
+                return _clean_text(rtf_to_text(_decode(data)))
+            except Exception:
+                pass
+
+    # HTML files
+    if suffix in ('.html', '.htm') and BeautifulSoup:
+        try:
+            soup = BeautifulSoup(_decode(data), 'html.parser')
+            return _clean_text(soup.get_text(separator='\n'))
+        except Exception:
+            pass
+
+    # Plain text files with encoding detection
+    try:
+        txt = _decode(data)
+        if txt.strip():
+            logger.info(f"Successfully extracted {len(txt)} characters as plain text")
+            return _clean_text(txt)
+        logger.warning("File appears to be empty")
+        return ''
+    except Exception as e:
+        logger.error(f"Error parsing as plain text: {e}")
+        return ''
+
+
+def parse_document_timed(filename: str, data: bytes) -> Tuple[str, float]:
+    started = time.perf_counter()
+    text = parse_document(filename, data)
+    return text, time.perf_counter() - started
+
+
+def parse_upload_to_text(upload) -> str:
+    """Synchronous parse of an UploadFile-like object (blocks the caller)."""
+    return parse_document(getattr(upload, 'filename', 'unknown'), upload.file.read())
+
+
+def init_parse_pool(workers: Optional[int] = None) -> None:
+    """Set the parser process count (0/None = one per CPU core). The pool starts lazily."""
+    global _parse_workers
+    shutdown_parse_pool()
+    _parse_workers = workers or None
+
+
+def _get_parse_pool() -> ProcessPoolExecutor:
+    global _parse_pool
+    if _parse_pool is None:
+        _parse_pool = ProcessPoolExecutor(max_workers=_parse_workers or os.cpu_count() or 1)
+    return _parse_pool
+
+
+def shutdown_parse_pool() -> None:
+    global _parse_pool
+    if _parse_pool is not None:
+        _parse_pool.shutdown(wait=False)
+        _parse_pool = None
+
+
+async def parse_upload_async(upload) -> Tuple[str, float]:
+    """Read an UploadFile and parse it in the process pool -> (text, parse seconds)."""
+    filename = getattr(upload, 'filename', 'unknown') or 'unknown'
+    data = await upload.read()
+    loop = asyncio.get_running_loop()
+    text, elapsed = await loop.run_in_executor(_get_parse_pool(), parse_document_timed, filename, data)
+    logger.info(f"Parsed {filename}: {len(data)} bytes -> {len(text)} chars in {elapsed * 1000:.1f} ms")
+    return text, elapsed
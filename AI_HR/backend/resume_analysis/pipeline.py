@@ -0,0 +1,209 @@
+import asyncio
+import heapq
+import logging
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from .analyzer import (
+    TransientLLMError,
+    analyze_candidate_async,
+    analyze_matching_async,
+    analyze_matching_batch_async,
+    matching_prompt_tokens,
+)
+from .lexical import lexical_shortlist
+
+logger = logging.getLogger(__name__)
+
+# Upper bound of candidates per batched matching call, whatever the token budget
+MAX_MATCH_BATCH = 16
+# Expected reply size per candidate (six sections with comments)
+MATCH_OUTPUT_TOKENS = 300
+
+
+def _extra(resume: Dict) -> Dict:
+    return {"lexical_score": resume["lexical_score"], "shortlisted": True} if "lexical_score" in resume else {}
+
+
+def _result(resume: Dict, cand: Dict, match: Dict) -> Dict:
+    name = resume["name"]
+    if resume.get("use_candidate_name"):
+        name = cand.get("candidate_name") or name
+    score = match.get("score", 0.0)
+    logger.info(f"Resume processed: {name} - score: {score}")
+    return {"name": name, "score": score, **_extra(resume)}
+
+
+def _error_result(resume: Dict) -> Dict:
+    return {"name": resume["error_name"], "score": 0.0, **_extra(resume)}
+
+
+async def score_resume(job: Dict, resume: Dict, raise_transient: bool = False) -> Dict:
+    """Score one resume against a parsed job.
+
+    resume: {"text", "name", "error_name", "use_candidate_name", "lexical_score"}.
+    Errors are isolated: a failing resume yields its error_name with score 0.0.
+    With raise_transient, TransientLLMError propagates instead, so a caller
+    that can retry later (the batch queue) does not record a final 0.0.
+    """
+    try:
+        cand = await analyze_candidate_async(resume["text"])
+        match = await analyze_matching_async(job, cand)
+        return _result(resume, cand, match)
+    except Exception as e:
+        if raise_transient and isinstance(e, TransientLLMError):
+            raise
+        logger.error(f"Error processing resume {resume['name']}: {e}")
+        return _error_result(resume)
+
+
+def shortlist_resumes(job_text: str, requirements: Dict, resumes: List[Dict], k: int) -> Tuple[List[Dict], List[Dict]]:
+    """Local BM25 pre-ranking: keep the top-k resumes for LLM scoring.
+
+    Returns (shortlisted resumes, final results for the rest with score 0.0).
+    """
+    shortlisted, rest = lexical_shortlist(job_text, requirements, resumes, k)
+    logger.info(f"Lexical shortlist: {len(shortlisted)} of {len(resumes)} resumes go to the LLM")
+    skipped = [
+        {"name": r["name"], "score": 0.0, "lexical_score": r["lexical_score"], "shortlisted": False}
+        for r in rest
+    ]
+    return shortlisted, skipped
+
+
+async def iter_scores(job: Dict, resumes: List[Dict], concurrency: int,
+                      match_batch_tokens: int = 0) -> AsyncIterator[Tuple[int, Dict]]:
+    """Score resumes with at most `concurrency` in flight, yielding (index, result) as they finish.
+
+    With match_batch_tokens > 0 candidates are matched several per call,
+    see _iter_scores_batched.
+    """
+    if match_batch_tokens > 0:
+        async for item in _iter_scores_batched(job, resumes, concurrency, match_batch_tokens):
+            yield item
+        return
+    limit = asyncio.Semaphore(max(1, concurrency))
+
+    async def _bounded(i: int, resume: Dict) -> Tuple[int, Dict]:
+        async with limit:
+            return i, await score_resume(job, resume)
+
+    tasks = [asyncio.create_task(_bounded(i, r)) for i, r in enumerate(resumes)]
+    try:
+        for fut in asyncio.as_completed(tasks):
+            yield await fut
+    finally:
+        for t in tasks:
+            if not t.done():
+                t.cancel()
+
+
+async def _iter_scores_batched(job: Dict, resumes: List[Dict], concurrency: int,
+                               token_budget: int) -> AsyncIterator[Tuple[int, Dict]]:
+    """Parse candidates concurrently, then match them against the job in batches.
+
+    Parsed candidates are grouped in completion order; a group is sent as
+    soon as the next candidate would overflow token_budget (job + profiles
+    + expected replies) or MAX_MATCH_BATCH, so the job JSON is sent once
+    per group instead of once per resume.
+    """
+    limit = asyncio.Semaphore(max(1, concurrency))
+    done: asyncio.Queue = asyncio.Queue()
+    budget = max(token_budget - matching_prompt_tokens(job), 0)
+    match_tasks: List[asyncio.Task] = []
+
+    async def _candidate(i: int) -> Tuple[int, Optional[Dict]]:
+        async with limit:
+            try:
+                return i, await analyze_candidate_async(resumes[i]["text"])
+            except Exception as e:
+                logger.error(f"Error processing resume {resumes[i]['name']}: {e}")
+                return i, None
+
+    async def _match(group: List[Tuple[int, Dict]]) -> None:
+        async with limit:
+            try:
+                matches = await analyze_matching_batch_async(job, {str(i): cand for i, cand in group})
+            except Exception as e:
+                logger.error(f"Error in batched matching of {len(group)} resumes: {e}")
+                matches = {}
+        for i, cand in group:
+            match = matches.get(str(i))
+            done.put_nowait((i, _result(resumes[i], cand, match) if match is not None else _error_result(resumes[i])))
+
+    async def _drive() -> None:
+        group: List[Tuple[int, Dict]] = []
+        group_tokens = 0
+        for fut in asyncio.as_completed(cand_tasks):
+            i, cand = await fut
+            if cand is None:
+                done.put_nowait((i, _error_result(resumes[i])))
+                continue
+            cost = matching_prompt_tokens(cand) + MATCH_OUTPUT_TOKENS
+            if group and (group_tokens + cost > budget or len(group) >= MAX_MATCH_BATCH):
+                match_tasks.append(asyncio.create_task(_match(group)))
+                group, group_tokens = [], 0
+            group.append((i, cand))
+            group_tokens += cost
+        if group:
+            match_tasks.append(asyncio.create_task(_match(group)))
+        await asyncio.gather(*match_tasks)
+
+    def _on_driver_done(task: asyncio.Task) -> None:
+        # Unexpected driver failure must not leave the consumer waiting forever
+        if not task.cancelled() and task.exception() is not None:
+            done.put_nowait(None)
+
+    cand_tasks = [asyncio.create_task(_candidate(i)) for i in range(len(resumes))]
+    driver = asyncio.create_task(_drive())
+    driver.add_done_callback(_on_driver_done)
+    try:
+        for _ in range(len(resumes)):
+            item = await done.get()
+            if item is None:
+                raise driver.exception()
+            yield item
+    finally:
+        for t in [driver, *cand_tasks, *match_tasks]:
+            if not t.done():
+                t.cancel()
+
+
+def _sort_key(item: Tuple[int, Dict]):
+    return (-item[1].get("score", 0.0), item[0])
+
+
+async def rank_resumes(job: Dict, resumes: List[Dict], concurrency: int, match_batch_tokens: int = 0) -> List[Dict]:
+    """Score all resumes concurrently and return them sorted by score desc."""
+    scored = [item async for item in iter_scores(job, resumes, concurrency, match_batch_tokens)]
+    # Ties keep submission order, as the sequential loop did
+    scored.sort(key=_sort_key)
+    return [r for _, r in scored]
+
+
+async def stream_ranking(job: Dict, resumes: List[Dict], concurrency: int, top_k: int = 5,
+                         failed: Optional[List[Dict]] = None, match_batch_tokens: int = 0) -> AsyncIterator[Dict]:
+    """Ranking as a stream of events.
+
+    Emits {"type": "result", name, score, done, total, top} per resume as soon
+    as it is scored (top is the running top_k), then {"type": "summary",
+    results} with everything sorted. `failed` are entries already known to
+    have score 0.0 (e.g. unparsable uploads); they are emitted first.
+    """
+    failed = failed or []
+    total = len(failed) + len(resumes)
+    scored: List[Tuple[int, Dict]] = []
+
+    def _event(result: Dict) -> Dict:
+        top = heapq.nsmallest(top_k, scored, key=_sort_key)
+        return {"type": "result", **result, "done": len(scored), "total": total, "top": [r for _, r in top]}
+
+    for result in failed:
+        scored.append((len(scored), result))
+        yield _event(result)
+    offset = len(failed)
+    async for i, result in iter_scores(job, resumes, concurrency, match_batch_tokens):
+        scored.append((offset + i, result))
+        yield _event(result)
+
+    scored.sort(key=_sort_key)
+    yield {"type": "summary", "results": [r for _, r in scored], "total": total}
@@ -0,0 +1,174 @@
+import logging
+import re
+import threading
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+_PHONE_RE = re.compile(r"(?<![\w+])(?:\+\d{1,3}|8)[\s\-]?\(?\d{3}\)?[\s\-]?\d{3}[\s\-]?\d{2}[\s\-]?\d{2}(?!\d)")
+_CYRILLIC_RE = re.compile("[\u0400-\u04FF]")
+_TABLE_SEPARATOR_RE = re.compile(r"^\|?\s*:?-{2,}:?\s*(\|\s*:?-{2,}:?\s*)*\|?$")
+_HEADING_MARKUP_RE = re.compile(r"^[#*_\s]+|[*_:\s]+$")
+
+# Lower value = kept first when the text has to be trimmed
+_SECTION_PRIORITY = [
+    (1, ("навык", "skill", "технолог", "technolog", "стек", "stack", "компетенц")),
+    (2, ("опыт", "experience", "employment", "work history", "места работы", "карьера")),
+    (3, ("о себе", "summary", "about", "profile", "цель", "objective", "требован", "requirement", "обязанност", "responsibilit")),
+    (4, ("образован", "education", "university", "университет")),
+    (5, ("сертификат", "certificat", "курсы", "courses", "training")),
+    (7, ("хобби", "hobb", "интерес", "interest", "рекомендац", "reference", "условия", "мы предлагаем", "we offer", "benefits")),
+]
+_HEADER_PRIORITY = 0
+_OTHER_PRIORITY = 6
+
+_stats_lock = threading.Lock()
+_stats = {"calls": 0, "tokens_before": 0, "tokens_after": 0, "contacts_extracted": 0}
+
+
+def count_tokens(text: str) -> int:
+    """Token estimate: ~2.5 chars per token for Cyrillic, ~4 for everything else."""
+    if not text:
+        return 0
+    cyrillic = len(_CYRILLIC_RE.findall(text))
+    return int(cyrillic / 2.5 + (len(text) - cyrillic) / 4.0) + 1
+
+
+def extract_contacts(text: str) -> Tuple[Dict[str, str], str]:
+    """Pull email and phone out of the text with regexes -> (contacts, text without them)."""
+    contacts: Dict[str, str] = {}
+    email = _EMAIL_RE.search(text)
+    if email:
+        contacts["email"] = email.group(0)
+    phone = _PHONE_RE.search(_EMAIL_RE.sub(" ", text))
+    if phone:
+        contacts["phone_number"] = re.sub(r"\s+", " ", phone.group(0)).strip()
+    text = _PHONE_RE.sub("", _EMAIL_RE.sub("", text)) if contacts else text
+    return contacts, text
+
+
+def collapse_tables(text: str) -> str:
+    """Markdown tables (pymupdf4llm output) -> one '; '-separated line per row."""
+    lines = []
+    for line in text.split("\n"):
+        stripped = line.strip()
+        if stripped.startswith("|") and stripped.count("|") >= 2:
+            if _TABLE_SEPARATOR_RE.match(stripped):
+                continue
+            cells = [c.strip() for c in stripped.strip("|").split("|")]
+            line = "; ".join(c for c in cells if c and c != "-")
+            if not line:
+                continue
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def dedupe_lines(text: str) -> str:
+    """Drop repeated non-empty lines (page headers/footers, copied blocks) and extra blank lines."""
+    seen = set()
+    lines = []
+    for line in text.split("\n"):
+        key = re.sub(r"\s+", " ", line).strip().lower()
+        if not key:
+            if lines and lines[-1]:
+                lines.append("")
+            continue
+        # Bare page numbers are footer noise
+        if re.fullmatch(r"(page|стр\.?|страница)?\s*\d+(\s*(of|из)\s*\d+)?", key):
+            continue
+        if key in seen:
+            continue
+        seen.add(key)
+        lines.append(line.strip())
+    return "\n".join(lines).strip()
+
+
+def _heading_priority(line: str) -> int:
+    stripped = line.strip()
+    if not stripped or len(stripped) > 40:
+        return -1
+    heading = _HEADING_MARKUP_RE.sub("", stripped).lower()
+    if not heading:
+        return -1
+    is_heading = stripped.startswith("#") or stripped.endswith(":") or stripped.startswith("**") or stripped.isupper()
+    for priority, keywords in _SECTION_PRIORITY:
+        if any(heading.startswith(k) or (is_heading and k in heading) for k in keywords):
+            return priority
+    return _OTHER_PRIORITY if stripped.startswith("#") else -1
+
+
+def split_sections(text: str) -> List[Tuple[int, List[str]]]:
+    """Split into (priority, lines) sections at recognisable headings."""
+    sections: List[Tuple[int, List[str]]] = [(_HEADER_PRIORITY, [])]
+    for line in text.split("\n"):
+        priority = _heading_priority(line)
+        if priority >= 0:
+            sections.append((priority, [line]))
+        else:
+            sections[-1][1].append(line)
+    return [s for s in sections if any(l.strip() for l in s[1])]
+
+
+def trim_to_budget(text: str, budget: int) -> str:
+    """Fill the token budget section by section in priority order (the last one may be cut).
+
+    Kept sections are emitted in document order.
+    """
+    if budget <= 0 or count_tokens(text) <= budget:
+        return text
+    sections = split_sections(text)
+    kept: Dict[int, List[str]] = {}
+    remaining = budget
+    for idx in sorted(range(len(sections)), key=lambda i: sections[i][0]):
+        lines = []
+        for line in sections[idx][1]:
+            cost = count_tokens(line) + 1
+            if cost > remaining:
+                break
+            lines.append(line)
+            remaining -= cost
+        kept[idx] = lines
+        if len(lines) < len(sections[idx][1]):
+            # Budget ran out inside this section
+            break
+    return "\n".join("\n".join(kept[i]) for i in sorted(kept) if kept[i]).strip()
+
+
+def _record(before: int, after: int, contacts: int) -> None:
+    with _stats_lock:
+        _stats["calls"] += 1
+        _stats["tokens_before"] += before
+        _stats["tokens_after"] += after
+        _stats["contacts_extracted"] += contacts
+
+
+def preprocess_resume(text: str, budget: int) -> Tuple[str, Dict[str, str], Dict[str, int]]:
+    """Local cleanup before the candidate prompt.
+
+    Returns (prompt text, regex contacts, {"tokens_before", "tokens_after"}).
+    """
+    before = count_tokens(text)
+    contacts, prepared = extract_contacts(text)
+    prepared = trim_to_budget(dedupe_lines(collapse_tables(prepared)), budget)
+    after = count_tokens(prepared)
+    _record(before, after, len(contacts))
+    logger.info(f"Resume preprocessed: {before} -> {after} tokens")
+    return prepared, contacts, {"tokens_before": before, "tokens_after": after}
+
+
+def preprocess_job(text: str, budget: int) -> Tuple[str, Dict[str, int]]:
+    """Local cleanup before the job prompt -> (prompt text, token counts)."""
+    before = count_tokens(text)
+    prepared = trim_to_budget(dedupe_lines(collapse_tables(text)), budget)
+    after = count_tokens(prepared)
+    _record(before, after, 0)
+    logger.info(f"Job description preprocessed: {before} -> {after} tokens")
+    return prepared, {"tokens_before": before, "tokens_after": after}
+
+
+def preprocess_stats() -> Dict:
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["tokens_saved"] = stats["tokens_before"] - stats["tokens_after"]
+    return stats
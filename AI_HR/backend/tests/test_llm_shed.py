@@ -0,0 +1,42 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from openai import BadRequestError
+
+from core_speech_recognition.llm_guard import LLMGuard
+from resume_analysis import analyzer
+from resume_analysis.analyzer import LLMShedError, TransientLLMError
+
+
+def _bad_request():
+    response = SimpleNamespace(status_code=400, headers={}, request=None)
+    return BadRequestError("invalid prompt", response=response, body=None)
+
+
+class _OpenGuard(LLMGuard):
+    """Breaker open the whole time; the call itself still reaches the provider and gets a 400"""
+
+    def retry_in(self):
+        return 30.0
+
+    async def call(self, endpoint, request, tokens=0):
+        raise _bad_request()
+
+
+def _complete(guard):
+    analyzer.init_llm_client(None, client=SimpleNamespace(), guard=guard)
+    return asyncio.run(analyzer._complete_async([{"role": "user", "content": "hi"}], "test"))
+
+
+def test_bad_request_with_open_breaker_is_not_shed():
+    with pytest.raises(BadRequestError) as excinfo:
+        _complete(_OpenGuard())
+    assert not isinstance(excinfo.value, TransientLLMError)
+
+
+def test_guard_refusal_is_shed():
+    guard = LLMGuard(failure_threshold=1, reset_seconds=60)
+    guard.breaker.record_failure()
+    with pytest.raises(LLMShedError):
+        _complete(guard)
@@ -0,0 +1,109 @@
+"""CPU and allocation benchmark of the audio front-end.
+
+Compares, on the same synthetic speech-like signal (quiet voiced bursts,
+noise, DC offset), the amplification used before the front-end module
+with core_speech_recognition.audio_frontend.AudioFrontEnd:
+
+    legacy   - list of samples -> default-dtype array -> float64 multiply -> int16 (original process_stream)
+    peak     - decaying peak + float64 multiply + int16 cast (StreamDecoder._amplify)
+    frontend - DC removal + smoothed AGC in a reused float32 buffer
+
+Reports CPU milliseconds per second of audio and the peak temporary
+allocation per chunk (tracemalloc, which numpy reports into).
+
+    python tools/audio_frontend_bench.py --seconds 60 --chunk-ms 100
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from collections import deque
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from core_speech_recognition import settings  # noqa: E402
+from core_speech_recognition.audio_frontend import AudioFrontEnd  # noqa: E402
+
+
+def make_signal(seconds: float, sample_rate: int) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    n = int(seconds * sample_rate)
+    t = np.arange(n) / sample_rate
+    envelope = (np.sin(2 * np.pi * 0.4 * t) > 0).astype(np.float64)
+    voice = np.sin(2 * np.pi * 180 * t) + 0.5 * np.sin(2 * np.pi * 360 * t)
+    audio = 1500 * envelope * voice + rng.normal(0, 40, n) + 300
+    return np.clip(audio, -32768, 32767).astype(np.int16)
+
+
+def legacy(pcm_buffer: deque, chunk_samples: int) -> bytes:
+    audio_data = list(pcm_buffer)[-chunk_samples:]
+    audio_array = np.array(audio_data)
+    max_val = np.max(np.abs(audio_array))
+    if max_val > 0 and max_val < settings.AUDIO_AMPLIFICATION_THRESHOLD:
+        audio_array = audio_array * (settings.AUDIO_AMPLIFICATION_THRESHOLD / max_val)
+    return audio_array.astype(np.int16).tobytes()
+
+
+class PeakAmplifier:
+    def __init__(self):
+        self.peak_level = 0.0
+
+    def __call__(self, audio_array: np.ndarray) -> bytes:
+        chunk_peak = int(np.max(np.abs(audio_array.astype(np.int32))))
+        self.peak_level = max(chunk_peak, self.peak_level * 0.95)
+        if 0 < self.peak_level < settings.AUDIO_AMPLIFICATION_THRESHOLD:
+            audio_array = audio_array * (settings.AUDIO_AMPLIFICATION_THRESHOLD / self.peak_level)
+        return audio_array.astype(np.int16).tobytes()
+
+
+def run(name: str, chunks, step, seconds: float) -> None:
+    start = time.process_time()
+    for chunk in chunks:
+        step(chunk)
+    cpu = time.process_time() - start
+
+    # Отдельный проход под tracemalloc: он сам замедляет выполнение
+    tracemalloc.start()
+    peaks = []
+    for chunk in chunks[:200]:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        step(chunk)
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    print(f"{name:<9} cpu {cpu / seconds * 1000:7.3f} ms per audio second   "
+          f"peak temporaries {np.mean(peaks) / 1024:8.1f} KiB per chunk")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=60.0)
+    parser.add_argument("--chunk-ms", type=int, default=100)
+    args = parser.parse_args()
+
+    sample_rate = settings.SAMPLE_RATE
+    audio = make_signal(args.seconds, sample_rate)
+    chunk_samples = sample_rate * args.chunk_ms // 1000
+    chunks = [audio[i:i + chunk_samples] for i in range(0, len(audio) - chunk_samples + 1, chunk_samples)]
+    print(f"{args.seconds:.0f} s of audio in {len(chunks)} chunks of {args.chunk_ms} ms")
+
+    pcm_buffer = deque(maxlen=sample_rate * settings.BUFFER_DURATION)
+
+    def legacy_step(chunk):
+        pcm_buffer.extend(chunk)
+        return legacy(pcm_buffer, chunk_samples)
+
+    frontend = AudioFrontEnd(sample_rate)
+    run("legacy", chunks, legacy_step, args.seconds)
+    run("peak", chunks, PeakAmplifier(), args.seconds)
+    run("frontend", chunks, lambda chunk: frontend.process(chunk).tobytes(), args.seconds)
+    run("frontend*", chunks, frontend.process, args.seconds)
+    print("frontend* = without the final tobytes() copy handed to Vosk")
+
+
+if __name__ == "__main__":
+    main()
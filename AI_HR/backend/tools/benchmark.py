@@ -0,0 +1,260 @@
+"""Throughput benchmark of the resume pipeline against a running backend.
+
+Generates synthetic resume corpora (mixed TXT/DOCX/PDF, unique text per
+run so the result cache does not hide LLM work) and drives
+/analyze_resumes, /upload_analyze and /upload_analyze/stream. Reports
+throughput, p50/p95/p99 per-resume latency (time until the resume's
+stream event), parse vs LLM time and the server's peak RSS.
+
+    # stub LLM + backend started by the script (the backend still needs MODEL_PATH)
+    python tools/benchmark.py --spawn --sizes 10,100,1000
+
+    # existing deployment; pass --stub-url to get LLM time, --pid for RSS
+    python tools/benchmark.py --url http://127.0.0.1:8007 --stub-url http://127.0.0.1:8100
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+try:
+    import docx  # python-docx
+except Exception:
+    docx = None
+try:
+    import pymupdf
+except Exception:
+    pymupdf = None
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SKILLS = ["Python", "FastAPI", "Django", "PostgreSQL", "Docker", "Kubernetes", "React", "TypeScript",
+          "Go", "Kafka", "Redis", "Airflow", "Spark", "Terraform", "Linux", "Git"]
+ROLES = ["Backend developer", "Data engineer", "Fullstack developer", "DevOps engineer", "QA engineer"]
+JOB_TEXT = (
+    "Senior Python developer. Requirements: 3+ years with Python, FastAPI or Django, PostgreSQL, "
+    "Docker, Kafka. Responsibilities: design and develop backend services, code review, mentoring."
+)
+
+
+def synthetic_resume(rng: random.Random) -> str:
+    role = rng.choice(ROLES)
+    skills = ", ".join(rng.sample(SKILLS, 6))
+    lines = [
+        f"Candidate {uuid.uuid4().hex[:8]}",
+        f"Email: c{rng.randint(1000, 9999)}@example.com  Phone: +7 9{rng.randint(10, 99)} {rng.randint(100, 999)}-00-00",
+        f"Position: {role}",
+        f"Skills: {skills}",
+        "Experience:",
+    ]
+    for _ in range(rng.randint(2, 5)):
+        lines.append(f"- {rng.randint(1, 6)} years as {rng.choice(ROLES)}, worked with {', '.join(rng.sample(SKILLS, 3))}.")
+    lines.append("Education: BSc in Computer Science")
+    return "\n".join(lines)
+
+
+def to_file(text: str, fmt: str) -> bytes:
+    if fmt == "docx" and docx:
+        d = docx.Document()
+        for line in text.split("\n"):
+            d.add_paragraph(line)
+        buf = io.BytesIO()
+        d.save(buf)
+        return buf.getvalue()
+    if fmt == "pdf" and pymupdf:
+        doc = pymupdf.open()
+        page = doc.new_page()
+        page.insert_text((50, 72), text, fontsize=10)
+        data = doc.tobytes()
+        doc.close()
+        return data
+    return text.encode("utf-8")
+
+
+def corpus(size: int, formats: List[str], seed: int) -> List[Tuple[str, str, bytes]]:
+    rng = random.Random(seed)
+    out = []
+    for i in range(size):
+        fmt = formats[i % len(formats)]
+        if (fmt == "docx" and not docx) or (fmt == "pdf" and not pymupdf):
+            fmt = "txt"
+        text = synthetic_resume(rng)
+        out.append((f"resume_{i}.{fmt}", text, to_file(text, fmt)))
+    return out
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+    p50, p95, p99 = np.percentile(np.asarray(values), [50, 95, 99])
+    return {"p50": round(float(p50), 3), "p95": round(float(p95), 3), "p99": round(float(p99), 3)}
+
+
+def peak_rss_mb(pid: Optional[int]) -> Optional[float]:
+    """Peak resident set size of a process (Linux VmHWM, psutil fallback)."""
+    if not pid:
+        return None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024.0, 1)
+    except OSError:
+        pass
+    try:
+        import psutil
+        return round(psutil.Process(pid).memory_info().rss / 1024.0 / 1024.0, 1)
+    except Exception:
+        return None
+
+
+async def stub_llm_seconds(client: httpx.AsyncClient, stub_url: Optional[str]) -> Optional[float]:
+    if not stub_url:
+        return None
+    try:
+        return (await client.get(f"{stub_url}/stats")).json()["latency_s"]
+    except Exception:
+        return None
+
+
+async def run_size(client: httpx.AsyncClient, args, size: int) -> Dict:
+    files = corpus(size, args.formats, seed=args.seed + size)
+    report: Dict = {"size": size}
+
+    # JSON endpoint: plain texts, no parsing
+    llm_before = await stub_llm_seconds(client, args.stub_url)
+    started = time.perf_counter()
+    resp = await client.post("/analyze_resumes", json={
+        "job_description": JOB_TEXT + f" #{uuid.uuid4().hex[:6]}",
+        "resumes": [text for _, text, _ in files],
+        "concurrency": args.concurrency,
+    })
+    elapsed = time.perf_counter() - started
+    resp.raise_for_status()
+    llm_after = await stub_llm_seconds(client, args.stub_url)
+    report["analyze_resumes"] = {
+        "wall_s": round(elapsed, 3),
+        "resumes_per_s": round(size / elapsed, 2),
+        "llm_s": round(llm_after - llm_before, 3) if llm_before is not None else None,
+    }
+
+    # Upload endpoint: parse time comes back as parse_ms
+    files = corpus(size, args.formats, seed=args.seed + size + 1)
+    upload = [("job", ("job.txt", (JOB_TEXT + f" #{uuid.uuid4().hex[:6]}").encode()))]
+    upload += [("resumes", (name, data)) for name, _, data in files]
+    llm_before = await stub_llm_seconds(client, args.stub_url)
+    started = time.perf_counter()
+    resp = await client.post("/upload_analyze", files=upload, data={"concurrency": str(args.concurrency)})
+    elapsed = time.perf_counter() - started
+    resp.raise_for_status()
+    llm_after = await stub_llm_seconds(client, args.stub_url)
+    parse_ms = [ms for ms in resp.json().get("parse_ms", []) if ms is not None]
+    report["upload_analyze"] = {
+        "wall_s": round(elapsed, 3),
+        "resumes_per_s": round(size / elapsed, 2),
+        "parse_s_total": round(sum(parse_ms) / 1000.0, 3),
+        "parse_ms": percentiles(parse_ms),
+        "llm_s": round(llm_after - llm_before, 3) if llm_before is not None else None,
+    }
+
+    # Streaming endpoint: per-resume latency = time until its result event
+    files = corpus(size, args.formats, seed=args.seed + size + 2)
+    upload = [("job", ("job.txt", (JOB_TEXT + f" #{uuid.uuid4().hex[:6]}").encode()))]
+    upload += [("resumes", (name, data)) for name, _, data in files]
+    latencies: List[float] = []
+    started = time.perf_counter()
+    async with client.stream("POST", "/upload_analyze/stream", files=upload,
+                             data={"concurrency": str(args.concurrency)}) as stream:
+        async for line in stream.aiter_lines():
+            if line and json.loads(line).get("type") == "result":
+                latencies.append(time.perf_counter() - started)
+    elapsed = time.perf_counter() - started
+    report["upload_analyze_stream"] = {
+        "wall_s": round(elapsed, 3),
+        "resumes_per_s": round(size / elapsed, 2),
+        "time_to_first_s": round(latencies[0], 3) if latencies else None,
+        "latency_s": percentiles(latencies),
+    }
+    report["peak_rss_mb"] = peak_rss_mb(args.pid)
+    return report
+
+
+async def wait_ready(url: str, timeout: float = 120.0) -> None:
+    deadline = time.time() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.time() < deadline:
+            try:
+                if (await client.get(url)).status_code < 500:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError(f"{url} did not come up in {timeout}s")
+
+
+async def main_async(args) -> List[Dict]:
+    procs: List[subprocess.Popen] = []
+    try:
+        if args.spawn:
+            stub_port, api_port = 8100, 8007
+            args.stub_url = f"http://127.0.0.1:{stub_port}"
+            procs.append(subprocess.Popen([
+                sys.executable, os.path.join(BACKEND_DIR, "tools", "llm_stub.py"),
+                "--port", str(stub_port), "--latency", args.stub_latency, "--error-rate", str(args.stub_error_rate),
+            ]))
+            env = dict(os.environ, OPENROUTER_API_KEY="stub", OPENROUTER_BASE_URL=f"{args.stub_url}/v1",
+                       PORT=str(api_port), RESULT_CACHE_PATH="")
+            procs.append(subprocess.Popen([sys.executable, "main.py"], cwd=BACKEND_DIR, env=env))
+            args.url = f"http://127.0.0.1:{api_port}"
+            args.pid = procs[-1].pid
+            await wait_ready(f"{args.stub_url}/stats")
+            await wait_ready(f"{args.url}/health")
+        reports = []
+        async with httpx.AsyncClient(base_url=args.url, timeout=None) as client:
+            for size in args.sizes:
+                report = await run_size(client, args, size)
+                reports.append(report)
+                print(json.dumps(report, ensure_ascii=False))
+        return reports
+    finally:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            try:
+                p.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                p.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8007")
+    parser.add_argument("--sizes", default="10,100,1000", type=lambda s: [int(x) for x in s.split(",")])
+    parser.add_argument("--formats", default="pdf,docx,txt", type=lambda s: s.split(","))
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--stub-url", default=None, help="llm_stub.py base URL, enables LLM time accounting")
+    parser.add_argument("--pid", type=int, default=None, help="backend PID for peak RSS")
+    parser.add_argument("--spawn", action="store_true", help="start llm_stub.py and main.py locally")
+    parser.add_argument("--stub-latency", default="lognormal:800,0.4")
+    parser.add_argument("--stub-error-rate", type=float, default=0.0)
+    parser.add_argument("--json", dest="json_path", default=None, help="write the report list to this file")
+    args = parser.parse_args()
+    reports = asyncio.run(main_async(args))
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
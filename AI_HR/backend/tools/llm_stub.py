@@ -0,0 +1,186 @@
+"""Offline OpenAI-compatible stand-in for OpenRouter.
+
+Answers /chat/completions with canned JSON for the resume prompts
+(candidate, job, matching, batched matching) and short text for the
+interview prompts, after a simulated latency, with optional injected
+errors. With "stream": true the reply comes as SSE chunks: the first one
+after --ttft of the latency, the rest spread over the remainder. Point
+the backend at it with
+
+    python tools/llm_stub.py --port 8100 --latency lognormal:800,0.5 --error-rate 0.02
+    OPENROUTER_BASE_URL=http://127.0.0.1:8100/v1 OPENROUTER_API_KEY=stub python main.py
+
+GET /stats returns request counts and the simulated latency spent.
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+SECTIONS = ["degree", "experience", "technical_skill", "responsibility", "certificate", "soft_skill"]
+SKILLS = ["Python", "FastAPI", "PostgreSQL", "Docker", "Kubernetes", "React", "TypeScript", "Go", "Kafka", "Redis"]
+
+app = FastAPI(title="LLM stub")
+config = {"latency": ("fixed", 0.0, 0.0), "error_rate": 0.0, "ttft": 0.2}
+stats = {"requests": 0, "errors": 0, "by_kind": {}, "latency_s": 0.0, "started_at": time.time()}
+
+
+def parse_latency(spec: str):
+    """fixed:MS | uniform:MIN_MS,MAX_MS | lognormal:MEDIAN_MS,SIGMA"""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v] or [0.0]
+    if kind == "fixed":
+        return kind, values[0] / 1000.0, 0.0
+    if kind == "uniform":
+        return kind, values[0] / 1000.0, values[1] / 1000.0
+    if kind == "lognormal":
+        return kind, values[0] / 1000.0, values[1] if len(values) > 1 else 0.5
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def sample_latency() -> float:
+    kind, a, b = config["latency"]
+    if kind == "uniform":
+        return random.uniform(a, b)
+    if kind == "lognormal":
+        return random.lognormvariate(0.0, b) * a
+    return a
+
+
+def classify(messages) -> str:
+    user = messages[-1].get("content", "") if messages else ""
+    if user.startswith(("JOB REQUIREMENTS:", "ТРЕБОВАНИЯ ВАКАНСИИ:")):
+        return "matching_batch" if ("BY ID:" in user or "ПО ID:" in user) else "matching"
+    if user.startswith(("Analyze this job description", "Проанализируй описание вакансии")):
+        return "job"
+    if user.startswith(("Analyze this CV", "Проанализируй резюме")):
+        return "candidate"
+    if any("JSON" in m.get("content", "") for m in messages):
+        return "evaluation"
+    return "text"
+
+
+def sections() -> dict:
+    return {k: {"score": random.randint(20, 95), "comment": "stub"} for k in SECTIONS}
+
+
+def canned_reply(kind: str, messages) -> str:
+    user = messages[-1].get("content", "")
+    if kind == "candidate":
+        return json.dumps({
+            "phone_number": "+7 900 000-00-00",
+            "email": "candidate@example.com",
+            "degree": ["BSc"],
+            "experience": [f"{random.randint(1, 10)} years"],
+            "technical_skill": random.sample(SKILLS, 4),
+            "responsibility": ["development"],
+            "certificate": [],
+            "soft_skill": ["communication"],
+            "comment": "stub",
+        })
+    if kind == "job":
+        return json.dumps({
+            "degree": ["BSc"], "experience": ["3+ years"], "technical_skill": random.sample(SKILLS, 5),
+            "responsibility": ["backend development"], "certificate": [], "soft_skill": ["teamwork"],
+        })
+    if kind == "matching":
+        return json.dumps({**sections(), "summary_comment": "stub"})
+    if kind == "matching_batch":
+        m = re.search(r"(?:BY ID|ПО ID): (\{.*\})\n", user, re.DOTALL)
+        ids = list(json.loads(m.group(1)).keys()) if m else []
+        return json.dumps({cid: {**sections(), "summary_comment": "stub"} for cid in ids})
+    if kind == "evaluation":
+        return json.dumps({"score": random.randint(30, 90), "feedback": "stub"})
+    return "Спасибо за ответ. Расскажите о самом сложном проекте, над которым вы работали."
+
+
+@app.post("/v1/chat/completions")
+@app.post("/api/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    messages = body.get("messages", [])
+    kind = classify(messages)
+    stats["requests"] += 1
+    stats["by_kind"][kind] = stats["by_kind"].get(kind, 0) + 1
+    delay = sample_latency()
+    stats["latency_s"] += delay
+    streaming = bool(body.get("stream"))
+    await asyncio.sleep(delay * config["ttft"] if streaming else delay)
+    if random.random() < config["error_rate"]:
+        stats["errors"] += 1
+        status = random.choice([429, 500, 502, 503])
+        headers = {"Retry-After": "1"} if status == 429 else {}
+        return JSONResponse({"error": {"message": "stub injected error", "code": status}}, status_code=status, headers=headers)
+    content = canned_reply(kind, messages)
+    if streaming:
+        return StreamingResponse(stream_reply(body, content, delay * (1 - config["ttft"])), media_type="text/event-stream")
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": sum(len(m.get("content", "")) for m in messages) // 3, "completion_tokens": len(content) // 3},
+    }
+
+
+async def stream_reply(body: dict, content: str, duration: float):
+    chunk_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    pieces = re.findall(r"\S+\s*", content) or [content]
+
+    def chunk(delta: dict, finish_reason=None) -> str:
+        payload = {
+            "id": chunk_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+    yield chunk({"role": "assistant", "content": ""})
+    for i, piece in enumerate(pieces):
+        if i:
+            await asyncio.sleep(duration / len(pieces))
+        yield chunk({"content": piece})
+    yield chunk({}, "stop")
+    yield "data: [DONE]\n\n"
+
+
+@app.get("/stats")
+async def get_stats():
+    return {**stats, "uptime_s": round(time.time() - stats["started_at"], 3)}
+
+
+@app.post("/stats/reset")
+async def reset_stats():
+    stats.update({"requests": 0, "errors": 0, "by_kind": {}, "latency_s": 0.0, "started_at": time.time()})
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", default="lognormal:800,0.4", help="fixed:MS | uniform:MIN,MAX | lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--ttft", type=float, default=0.2, help="share of the latency before the first streamed token")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 429/5xx")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    config["latency"] = parse_latency(args.latency)
+    config["error_rate"] = args.error_rate
+    config["ttft"] = args.ttft
+    if args.seed is not None:
+        random.seed(args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
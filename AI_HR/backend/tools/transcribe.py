@@ -0,0 +1,74 @@
+"""Offline transcription of recorded interviews from the command line.
+
+Same pipeline as POST /transcribe: ffmpeg decoding, split at pauses,
+Vosk over a process pool. Prints timestamped segments per file and the
+throughput in audio-hours per wall-clock hour.
+
+    python tools/transcribe.py interview1.webm interview2.mp3 --workers 8
+    python tools/transcribe.py records/*.wav --json transcripts.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from core_speech_recognition import settings  # noqa: E402
+from core_speech_recognition.batch_transcriber import BatchTranscriber  # noqa: E402
+
+
+def _timestamp(seconds: float) -> str:
+    minutes, seconds = divmod(seconds, 60)
+    return f"{int(minutes):02d}:{seconds:05.2f}"
+
+
+async def run(args) -> int:
+    transcriber = BatchTranscriber(args.model, workers=args.workers)
+    results, failed = [], 0
+    try:
+        # Файлы идут группами, чтобы не держать в памяти все записи сразу
+        for i in range(0, len(args.files), args.batch):
+            group = []
+            for path in args.files[i:i + args.batch]:
+                with open(path, "rb") as f:
+                    group.append((path, f.read()))
+            response = await transcriber.transcribe(group)
+            for entry in response["files"]:
+                results.append(entry)
+                if "error" in entry:
+                    failed += 1
+                    print(f"{entry['filename']}: ERROR {entry['error']}", file=sys.stderr)
+                    continue
+                if not args.quiet:
+                    print(f"== {entry['filename']} ({_timestamp(entry['duration'])})")
+                    for segment in entry["segments"]:
+                        print(f"[{_timestamp(segment['start'])} - {_timestamp(segment['end'])}] {segment['text']}")
+    finally:
+        transcriber.shutdown()
+
+    stats = transcriber.stats()
+    print(f"{stats['files']} files, {stats['audio_seconds'] / 3600:.3f} h of audio in {stats['wall_seconds']:.1f} s "
+          f"with {stats['workers']} workers: {stats['audio_hours_per_hour']:.1f} audio-hours per hour", file=sys.stderr)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"files": results, "stats": stats}, f, ensure_ascii=False, indent=2)
+    return 1 if failed else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--model", default=settings.MODEL_PATH)
+    parser.add_argument("--workers", type=int, default=settings.TRANSCRIBE_WORKERS, help="0 = one per core")
+    parser.add_argument("--batch", type=int, default=16, help="files decoded and scheduled together")
+    parser.add_argument("--json", help="write segments and stats to this file")
+    parser.add_argument("--quiet", action="store_true", help="only print the summary")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
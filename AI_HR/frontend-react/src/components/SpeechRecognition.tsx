@@ -3,6 +3,7 @@ import React, { useState, useRef, useCallback } from 'react';
 interface WebSocketMessage {
   type: string;
   segment_text?: string;
+  partial?: string;  // Промежуточная гипотеза текущей фразы
   improved_text?: string;
   question?: string;
   question_number?: number;
@@ -18,6 +19,8 @@ interface WebSocketMessage {
   total_answers?: number;
   summary?: string;
   evaluation?: string;
+  evaluation_pending?: boolean;  // Оценка придёт отдельным сообщением answer_evaluated
+  delta?: string;  // Очередной фрагмент вопроса (question_delta) или отчета (report_delta)
   message?: string;
   reset_timer?: boolean;  // Добавляем поле для сброса таймера
   final_report?: string;  // Добавляем поле для финального отчета
@@ -34,6 +37,7 @@ const SpeechRecognition: React.FC = () => {
   const [status, setStatus] = useState('Добро пожаловать в AI систему HR! Вам будет задано несколько вопросов. Для каждого вопроса у вас есть время внимательно его прочитать и подготовиться к ответу. Когда будете готовы, нажимайте кнопку "Начать запись".');
   const [statusType, setStatusType] = useState<'connected' | 'disconnected' | 'recording'>('connected');
   const [accumulatedText, setAccumulatedText] = useState('');
+  const [partialText, setPartialText] = useState('');
   const [improvedText, setImprovedText] = useState('Улучшенный текст(с помощью LLM) появится здесь...');
   const [currentQuestion, setCurrentQuestion] = useState<string>('');
   const [questionCounter, setQuestionCounter] = useState<string>('');
@@ -45,6 +49,7 @@ const SpeechRecognition: React.FC = () => {
   const wsRef = useRef<WebSocket | null>(null);
   const mediaRecorderRef = useRef<MediaRecorder | null>(null);
   const mediaStreamRef = useRef<MediaStream | null>(null);
+  const streamingQuestionRef = useRef<number | null>(null);  // Номер вопроса, который сейчас приходит по частям
 
   const updateStatus = useCallback((text: string, type: 'connected' | 'disconnected' | 'recording') => {
     setStatus(text);
@@ -55,8 +60,13 @@ const SpeechRecognition: React.FC = () => {
     console.log('Обрабатываем результат, тип:', data.type);
     console.log('Полные данные:', data);
     
+    if (data.type === 'partial') {
+      setPartialText(data.partial || '');
+    }
+    
     if (data.type === 'result') {
       console.log(' Обрабатываем результат распознавания');
+      setPartialText('');
       console.log(' Текст сегмента:', data.segment_text);
       
       if (data.segment_text) {
@@ -99,7 +109,25 @@ const SpeechRecognition: React.FC = () => {
       console.log(' Спиннер должен быть виден, запись остановлена');
     }
     
+    if (data.type === 'question_delta') {
+      // Вопрос показывается по мере генерации; answer_processed заменит его полным текстом
+      if (streamingQuestionRef.current !== data.question_number) {
+        streamingQuestionRef.current = data.question_number ?? null;
+        setShowSpinner(false);
+        setCurrentQuestion('');
+        setQuestionCounter(data.topic_display || `Вопрос ${data.question_number} (из 5-10)`);
+        setShowQuestion(true);
+      }
+      setCurrentQuestion(prev => prev + (data.delta || ''));
+    }
+    
+    if (data.type === 'report_delta') {
+      setShowSpinner(false);
+      setFinalReport(prev => (prev || '') + (data.delta || ''));
+    }
+    
     if (data.type === 'answer_processed') {
+      streamingQuestionRef.current = null;
       console.log(' Ответ обработан, показываем результат:', data);
       console.log(' WebSocket state после ответа:', wsRef.current?.readyState, 'isConnected:', isConnected);
       console.log(' Actual WebSocket connected:', wsRef.current?.readyState === WebSocket.OPEN);
@@ -114,6 +142,7 @@ const SpeechRecognition: React.FC = () => {
       
       // Очищаем предыдущий текст
       setAccumulatedText('');
+      setPartialText('');
       setImprovedText('Улучшенный текст(с помощью LLM) появится здесь...');
       
       // Показываем улучшенный ответ
@@ -160,6 +189,12 @@ const SpeechRecognition: React.FC = () => {
       }
     }
     
+    if (data.type === 'answer_evaluated') {
+      // Улучшенный текст и оценка предыдущего ответа приходят после следующего вопроса
+      console.log(' Оценка ответа на вопрос', data.question_number, data.evaluation);
+      setImprovedText(data.improved_answer || '');
+    }
+    
     if (data.type === 'interview_finished') {
       console.log(' Интервью завершено:', data);
       console.log(' Принудительно скрываем спиннер при завершении интервью');
@@ -175,6 +210,7 @@ const SpeechRecognition: React.FC = () => {
       setImprovedText('');
       setShowQuestion(false);
       setAccumulatedText('');
+      setPartialText('');
       setFeedbackMessage(''); // Очищаем сообщения о динамических вопросах
       
       // Сохраняем финальный отчет
@@ -457,9 +493,12 @@ const SpeechRecognition: React.FC = () => {
           )}
 
           <div className="results">
-            {accumulatedText ? (
+            {accumulatedText || partialText ? (
               <div style={{ fontSize: '20px', lineHeight: '1.6', padding: '20px' }}>
                 {accumulatedText}
+                {partialText && (
+                  <span style={{ color: '#888' }}>{accumulatedText ? ' | ' : ''}{partialText}</span>
+                )}
               </div>
             ) : (
               <p>Ваш ответ появится здесь...</p>